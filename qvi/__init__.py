@@ -0,0 +1,5 @@
+"""Reusable building blocks for the QVI transaction and customer analysis.
+
+The analysis scripts (``first_analize_project_en.py`` / ``_vi.py``) import
+from this package so the expensive parts of the pipeline can be shared.
+"""
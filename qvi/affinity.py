@@ -0,0 +1,92 @@
+"""Affinity of customer segments to a product dimension (section VIII).
+
+The affinity of a segment to a value of ``BRAND`` / ``PACK_SIZE`` (or any
+other categorical column) is the segment's share of units bought with that
+value divided by the same share in all other segments.  Every segment's
+affinities follow from one segment x value cross-tab of unit totals: the
+"other segments" row of a segment is the column totals minus its own row, so
+all deep dives come out of a few array operations without copying the data.
+Works on row-level merged data as well as on pre-aggregated frames (pass the
+summed quantity column as ``quantity``).
+"""
+import numpy as np
+import pandas as pd
+
+from qvi.segments import SEGMENT_COLUMNS
+
+AFFINITY_COLUMNS = {'BRAND': 'affinityToBrand', 'PACK_SIZE': 'affinityToPack'}
+
+
+def affinity_column(dimension):
+    """Name of the affinity column for ``dimension`` (``affinityToBrand`` for ``BRAND``)."""
+    return AFFINITY_COLUMNS.get(dimension, f'affinityTo{dimension}')
+
+
+def segment_crosstab(frame, dimension, quantity='PROD_QTY'):
+    """Units per segment (rows) and ``dimension`` value (columns), from one groupby.
+
+    Rows of customers without a segment are kept as a row with missing labels
+    so that they still count towards every segment's "other" share.
+    """
+    totals = frame.groupby(SEGMENT_COLUMNS + [dimension], observed=True, dropna=False)[quantity].sum()
+    totals = totals[totals.index.get_level_values(dimension).notna()]
+    return totals.unstack(dimension, fill_value=0)
+
+
+def crosstab_affinities(crosstab, dimension=None):
+    """Affinity of every segment of ``crosstab`` to every value of its columns.
+
+    Returns a long table indexed by segment and ``dimension`` value with the
+    ``targetSegment`` and ``other`` shares and their ratio, sorted by
+    descending affinity within each segment.  Values the other segments never
+    bought (infinite affinity) are dropped, as are segments that are the only
+    buyers or bought nothing and the row of unsegmented customers.
+    """
+    dimension = crosstab.columns.name if dimension is None else dimension
+    units = crosstab.to_numpy(dtype='float64')
+    segment_units = units.sum(axis=1, keepdims=True)
+    other_units = units.sum(axis=0, keepdims=True) - units
+    other_totals = segment_units.sum() - segment_units
+    with np.errstate(divide='ignore', invalid='ignore'):
+        target_share = units / segment_units
+        other_share = other_units / other_totals
+        affinity = target_share / other_share
+
+    n_segments, n_values = units.shape
+    index = pd.MultiIndex.from_arrays(
+        [crosstab.index.get_level_values(level).repeat(n_values) for level in range(crosstab.index.nlevels)]
+        + [np.tile(crosstab.columns.to_numpy(), n_segments)],
+        names=list(crosstab.index.names) + [dimension])
+    table = pd.DataFrame({'targetSegment': target_share.ravel(), 'other': other_share.ravel(),
+                          affinity_column(dimension): affinity.ravel()}, index=index)
+    keep = np.isfinite(affinity.ravel())
+    for level in range(crosstab.index.nlevels):
+        keep &= table.index.get_level_values(level).notna()
+    table = table[keep]
+
+    # Stable sort on (segment position, -affinity) keeps the segments in cross-tab order
+    segment_position = np.repeat(np.arange(n_segments), n_values)[keep]
+    order = np.lexsort((-table[affinity_column(dimension)].to_numpy(), segment_position))
+    return table.iloc[order]
+
+
+def segment_affinities(frame, dimension, quantity='PROD_QTY'):
+    """Affinity of all segments to ``dimension`` at once (see :func:`crosstab_affinities`)."""
+    return crosstab_affinities(segment_crosstab(frame, dimension, quantity), dimension)
+
+
+def select_segment(affinities, lifestage, premium_customer):
+    """Tables 8/9 layout for one segment of :func:`crosstab_affinities` output.
+
+    Returns an empty table when the segment has no affinities.
+    """
+    dimension = affinities.index.names[-1]
+    target = ((affinities.index.get_level_values('LIFESTAGE') == lifestage)
+              & (affinities.index.get_level_values('PREMIUM_CUSTOMER') == premium_customer))
+    table = affinities[target]
+    return table.set_axis(table.index.get_level_values(dimension), axis=0)
+
+
+def affinity_table(frame, dimension, lifestage, premium_customer, quantity='PROD_QTY'):
+    """Tables 8/9: target vs other share of units per ``dimension`` value and their ratio."""
+    return select_segment(segment_affinities(frame, dimension, quantity), lifestage, premium_customer)
@@ -0,0 +1,410 @@
+"""One computation engine for the English and Vietnamese analysis reports.
+
+:func:`compute_analysis` runs the pipeline once and keeps every table and
+value the report prints or plots; :func:`render_text` and the figure
+functions of :mod:`qvi.report` then format those results in any locale.
+Producing several language reports therefore costs one pipeline run plus
+cheap formatting.
+
+Usage::
+
+    python -m qvi.analysis --locale en vi --out reports
+"""
+import argparse
+import io
+import os
+import sys
+from functools import cached_property
+
+from qvi.affinity import select_segment
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE, load_customers, load_transactions
+from qvi.locales import DEFAULT_LOCALE, LOCALES, messages
+from qvi.lookup import CustomerIndex
+from qvi.outliers import DEFAULT_RULES
+from qvi.pipeline import (TARGET_LIFESTAGE, TARGET_PREMIUM, clean_stage, feature_stage, merge_stage,
+                          outlier_stage, segment_affinity_stage, segmentation_stage, significance_stage)
+from qvi.product_rules import ProductRules, load_product_rules
+from qvi.products import build_product_dimension, map_products
+from qvi.profiling import StageProfiler, add_profiling_arguments, finish_profiling, profiler_from_args
+from qvi.report import build_report_data, render_report, show_figures
+from qvi.result_cache import DEFAULT_MAX_BYTES, DEFAULT_RESULT_CACHE_DIR, ResultCache, input_fingerprint
+from qvi.schema import memory_report
+from qvi.timeseries import DailySeries
+
+# Pack size the R reference analysis found most favoured by the default target segment
+HIGH_AFFINITY_PACK_SIZE = 270
+
+
+def _info(frame):
+    buffer = io.StringIO()
+    frame.info(buf=buffer)
+    return buffer.getvalue().rstrip('\n')
+
+
+def _describe(frame):
+    # datetime_is_numeric only exists (and is needed) in older pandas versions
+    try:
+        return frame.describe(include='all', datetime_is_numeric=True)
+    except TypeError:
+        return frame.describe(include='all')
+
+
+class _AnalysisData:
+    """Intermediate frames of :func:`compute_analysis`, each computed on first use.
+
+    Only the stages behind result tables missing from the result cache are
+    run; :meth:`release` drops frames that no later table needs.
+    """
+
+    def __init__(self, transaction_path, customer_path, use_cache, profiler, product_rules):
+        self.transaction_path = transaction_path
+        self.customer_path = customer_path
+        self.use_cache = use_cache
+        self.profiler = profiler
+        self.product_rules = product_rules
+
+    def release(self, *names):
+        for name in names:
+            self.__dict__.pop(name, None)
+
+    @cached_property
+    def transactions(self):
+        with self.profiler.stage('load') as record:
+            transaction_data = load_transactions(self.transaction_path, use_cache=self.use_cache)
+            record['ROWS_OUT'] = len(transaction_data)
+        return transaction_data
+
+    @cached_property
+    def customers(self):
+        return load_customers(self.customer_path)
+
+    @cached_property
+    def products(self):
+        return build_product_dimension(self.transactions['PROD_NAME'], self.transactions['PROD_NBR'],
+                                       self.product_rules)
+
+    @cached_property
+    def salsa_free(self):
+        return self.profiler.run('salsa', clean_stage, self.transactions, self.products,
+                                 outlier_customer_ids=())
+
+    @cached_property
+    def outliers(self):
+        return self.profiler.run('outliers', outlier_stage, self.salsa_free)
+
+    @cached_property
+    def daily(self):
+        return DailySeries.from_frame(self.outliers[0])
+
+    @cached_property
+    def features(self):
+        return self.profiler.run('features', feature_stage, self.outliers[0], self.products)
+
+    @cached_property
+    def customer_index(self):
+        return CustomerIndex(self.customers)
+
+    @cached_property
+    def merged(self):
+        return self.profiler.run('merge', merge_stage, self.features, self.customers, self.customer_index)
+
+
+def _load_tables(data):
+    transaction_data, customer_data = data.transactions, data.customers
+    return {
+        'transactions_info': _info(transaction_data),
+        'transactions_head': transaction_data.head(),
+        'customers_info': _info(customer_data),
+        'customers_head': customer_data.head(),
+        'date_dtype': transaction_data['DATE'].dtype,
+        'date_head': transaction_data['DATE'].head(),
+        'product_counts': transaction_data['PROD_NAME'].value_counts().head(),
+    }
+
+
+def _cleaning_tables(data):
+    salsa_free = data.salsa_free
+    kept_data, outlier_audit = data.outliers
+    outlier_rows = salsa_free[~salsa_free.index.isin(kept_data.index)]
+    return {
+        'distinct_products': len(data.products),
+        'salsa_count': int(map_products(data.transactions['PROD_NAME'], data.products, 'EXCLUDED').sum()),
+        'rows_after_salsa': len(salsa_free),
+        'summary_before_outliers': salsa_free.describe(include='all'),
+        'outlier_audit': outlier_audit,
+        'outlier_transactions': dict(list(outlier_rows.groupby('LYLTY_CARD_NBR'))),
+        'rows_after_outliers': len(kept_data),
+        'table_1': _describe(kept_data),
+    }
+
+
+def _daily_tables(data):
+    missing_days = data.daily.gaps()
+    return {'missing_days': missing_days, 'days_with_transactions': len(data.daily) - len(missing_days)}
+
+
+def _merge_tables(data):
+    transaction_data, customer_data, merged_data = data.features, data.customers, data.merged
+    return {
+        'pack_size_head': transaction_data['PACK_SIZE'].head(),
+        'table_2': (transaction_data['BRAND'].value_counts().sort_index()
+                    .reset_index().rename(columns={'index': 'BRAND', 'BRAND': 'Count'})),
+        'customers_summary': customer_data.describe(include='all'),
+        'lifestage_counts': customer_data['LIFESTAGE'].value_counts(),
+        'premium_counts': customer_data['PREMIUM_CUSTOMER'].value_counts(),
+        'transaction_rows': len(transaction_data),
+        'merged_rows': len(merged_data),
+        'merged_memory': memory_report(merged_data),
+        'unmatched_cards': data.customer_index.unmatched(transaction_data),
+    }
+
+
+def _segment_tables(data):
+    segment_table = data.profiler.run('segments', segmentation_stage, data.merged)
+    return {'segment_table': segment_table,
+            'report_data': build_report_data(data.features, segment_table, data.daily)}
+
+
+def _ttest_tables(data):
+    return {'ttest': data.profiler.run('ttest', significance_stage, data.merged)}
+
+
+def _affinity_tables(data):
+    # Every segment at once, so changing the deep-dive segment is a cache hit
+    merged_data = data.merged
+    pack_brands = merged_data.groupby('PACK_SIZE', observed=True, sort=False)['BRAND'].unique()
+    return {'segment_affinities': data.profiler.run('affinity', segment_affinity_stage, merged_data),
+            'pack_brands': {pack_size: list(brands) for pack_size, brands in pack_brands.items()}}
+
+
+def compute_analysis(transaction_path=TRANSACTION_FILE, customer_path=CUSTOMER_FILE,
+                     lifestage=TARGET_LIFESTAGE, premium_customer=TARGET_PREMIUM, use_cache=True,
+                     profiler=None, result_cache=None, product_rules=None):
+    """Run the whole analysis once and return the results every report needs.
+
+    Only small objects are kept (info text, heads, summaries, aggregates), so
+    the raw and intermediate frames can be freed as the pipeline advances.
+    The pipeline stages are recorded by ``profiler`` when one is given, and
+    products are described by ``product_rules`` (a
+    :class:`qvi.product_rules.ProductRules`, the default rules when ``None``).
+
+    Each group of tables is looked up in ``result_cache`` (a
+    :class:`qvi.result_cache.ResultCache`) under the fingerprint of the
+    input files and the parameters it depends on; only the stages behind
+    missing tables are run.
+    """
+    profiler = StageProfiler(enabled=False) if profiler is None else profiler
+    result_cache = ResultCache(enabled=False) if result_cache is None else result_cache
+    product_rules = ProductRules() if product_rules is None else product_rules
+    data = _AnalysisData(transaction_path, customer_path, use_cache, profiler, product_rules)
+
+    inputs = {}
+    if result_cache.enabled:
+        inputs = {'transactions': input_fingerprint(transaction_path, result_cache.cache_dir),
+                  'customers': input_fingerprint(customer_path, result_cache.cache_dir)}
+    parameters = {'product_rules': product_rules.config, 'outlier_rules': DEFAULT_RULES}
+
+    results = {}
+    results.update(result_cache.fetch('load', [inputs], _load_tables, data))
+    results.update(result_cache.fetch('cleaning', [inputs, parameters], _cleaning_tables, data))
+    data.release('transactions', 'salsa_free')
+    results.update(result_cache.fetch('daily', [inputs, parameters], _daily_tables, data))
+    results.update(result_cache.fetch('merge', [inputs, parameters], _merge_tables, data))
+    results.update(result_cache.fetch('segments', [inputs, parameters], _segment_tables, data))
+    results.update(result_cache.fetch('ttest', [inputs, parameters], _ttest_tables, data))
+    affinity = result_cache.fetch('affinity', [inputs, parameters], _affinity_tables, data)
+
+    results['brand_affinity'] = select_segment(affinity['segment_affinities']['BRAND'],
+                                               lifestage, premium_customer)
+    results['pack_affinity'] = select_segment(affinity['segment_affinities']['PACK_SIZE'],
+                                              lifestage, premium_customer)
+    results['segment'] = (lifestage, premium_customer)
+    pack_affinity = results['pack_affinity']
+    reference_segment = (lifestage, premium_customer) == (TARGET_LIFESTAGE, TARGET_PREMIUM)
+    if reference_segment and HIGH_AFFINITY_PACK_SIZE in pack_affinity.index:
+        results['favoured_pack_size'] = (HIGH_AFFINITY_PACK_SIZE, True)
+    elif not pack_affinity.empty:
+        results['favoured_pack_size'] = (pack_affinity.index[0], False)
+    else:
+        results['favoured_pack_size'] = None
+    if results['favoured_pack_size'] is not None:
+        results['favoured_pack_brands'] = affinity['pack_brands'].get(results['favoured_pack_size'][0], [])
+    return results
+
+
+def render_text(results, locale=DEFAULT_LOCALE, out=None):
+    """Print the console report of ``results`` in ``locale``."""
+    text = messages(locale)
+    out = sys.stdout if out is None else out
+
+    def say(*values):
+        print(*values, file=out)
+
+    say(text['transactions_info'])
+    say(results['transactions_info'])
+    say(text['transactions_head'])
+    say(results['transactions_head'])
+    say(text['customers_info'])
+    say(results['customers_info'])
+    say(text['customers_head'])
+    say(results['customers_head'])
+
+    # Section III: preprocessing and exploratory analysis
+    say(text['converting_date'])
+    say(text['date_dtype'].format(dtype=results['date_dtype']))
+    say(results['date_head'])
+    say(text['analyzing_prod_name'])
+    say(text['product_counts'])
+    say(results['product_counts'])
+    say(text['distinct_products'].format(count=results['distinct_products']))
+    say(text['salsa_found'].format(count=results['salsa_count']))
+    say(text['rows_after_salsa'].format(count=results['rows_after_salsa']))
+    say(text['summary_before_outliers'])
+    say(results['summary_before_outliers'])
+    say(text['outlier_audit'])
+    say(results['outlier_audit'])
+    for customer, customer_transactions in results['outlier_transactions'].items():
+        say(text['outlier_transactions'].format(customer=customer))
+        say(customer_transactions)
+    say(text['rows_after_outliers'].format(customers=len(results['outlier_audit']),
+                                           count=results['rows_after_outliers']))
+    say(text['table_1'])
+    say(results['table_1'])
+
+    report_data = results['report_data']
+    say(text['trends_over_time'])
+    say(text['days_with_transactions'].format(count=results['days_with_transactions']))
+    say(text['missing_days'])
+    say(results['missing_days'])
+
+    # Section IV: feature engineering
+    say(text['feature_engineering'])
+    say(text['pack_size_examples'])
+    say(results['pack_size_head'])
+    say(text['pack_size_distribution'])
+    say(report_data['pack_size_counts'].set_index('PACK_SIZE')['COUNT'].rename('count'))
+    say(text['table_2'])
+    say(results['table_2'])
+
+    # Section V: customer data
+    say(text['exploring_customers'])
+    say(text['customer_information'])
+    say(results['customers_info'])
+    say(text['customer_summary'])
+    say(results['customers_summary'])
+    say(text['lifestage_distribution'])
+    say(results['lifestage_counts'])
+    say(text['premium_distribution'])
+    say(results['premium_counts'])
+
+    # Section VI: merge
+    say(text['merging'])
+    say(text['transaction_rows'].format(count=results['transaction_rows']))
+    say(text['merged_rows'].format(count=results['merged_rows']))
+    memory = results['merged_memory']
+    say(text['merged_memory'])
+    say(memory.to_string())
+    say(text['memory_saved'].format(saved_mb=memory.loc['TOTAL', 'SAVED_BYTES'] / 1e6,
+                                    ratio=memory.loc['TOTAL', 'DEFAULT_BYTES'] / memory.loc['TOTAL', 'BYTES']))
+    say(text['memory_wide'].format(wide_bytes=int(memory.loc['TOTAL', 'WIDE_BYTES'])))
+    unmatched = results['unmatched_cards']
+    say(text['unmatched_cards'].format(rows=int(unmatched['TRANSACTIONS'].sum()), cards=len(unmatched)))
+    if unmatched.empty:
+        say(text['merge_ok'])
+    else:
+        say(text['merge_warning'])
+        say(unmatched.to_string(index=False))
+
+    # Section VII: segments
+    segment_table = results['segment_table']
+    segments = ['LIFESTAGE', 'PREMIUM_CUSTOMER']
+    say(text['segmentation'])
+    for key, columns, sort_by in (
+            ('table_3', ['SALES'], 'SALES'),
+            ('table_4', ['CUSTOMERS'], 'CUSTOMERS'),
+            ('table_5', ['TOTAL_QTY', 'CUSTOMERS', 'AVG_UNITS_PER_CUSTOMER'], 'AVG_UNITS_PER_CUSTOMER'),
+            ('table_6', ['SALES', 'TOTAL_QTY', 'AVG_PRICE_PER_UNIT'], 'AVG_PRICE_PER_UNIT')):
+        say(text[key])
+        say(segment_table[segments + columns].sort_values(by=sort_by, ascending=False).head(10))
+
+    ttest = results['ttest']
+    if ttest is not None:
+        say(text['table_7'])
+        say(text['ttest_comparison'])
+        say(f"T-statistic: {ttest['t_stat']:.4f}")
+        say(f"P-value: {ttest['p_value']:.4f}")
+        say(text['ttest_mean_group'].format(mean=ttest['mean_group']))
+        say(text['ttest_mean_other'].format(mean=ttest['mean_other']))
+        say(text['ttest_significant'] if ttest['p_value'] < 0.05 else text['ttest_not_significant'])
+    else:
+        say(text['ttest_no_data'])
+
+    # Section VIII: deep dive
+    lifestage, premium_customer = results['segment']
+    segment = {'lifestage': lifestage.title(), 'premium': premium_customer}
+    say(text['deep_dive'].format(**segment))
+    brand_affinity, pack_affinity = results['brand_affinity'], results['pack_affinity']
+    if not brand_affinity.empty and not pack_affinity.empty:
+        say(text['table_8'].format(**segment))
+        say(brand_affinity.head(10))
+        say(text['table_9'].format(**segment))
+        say(pack_affinity.head(10))
+        if results['favoured_pack_size'] is not None:
+            pack_size, from_reference = results['favoured_pack_size']
+            key = 'pack_size_brands' if from_reference else 'top_pack_size_brands'
+            say(text[key].format(pack_size=pack_size, brands=', '.join(results['favoured_pack_brands'])))
+    else:
+        say(text['deep_dive_no_data'])
+    say(text['analysis_complete'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the QVI analysis once and render it in one or "
+                                                 "more languages.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--locale', nargs='+', default=[DEFAULT_LOCALE], choices=LOCALES)
+    parser.add_argument('--out', default=None,
+                        help="write report_<locale>.txt and the figures here instead of printing "
+                             "and showing them")
+    parser.add_argument('--no-figures', action='store_true')
+    parser.add_argument('--lifestage', default=TARGET_LIFESTAGE, help="deep-dive segment life stage")
+    parser.add_argument('--premium', default=TARGET_PREMIUM, help="deep-dive segment premium category")
+    parser.add_argument('--result-cache', default=DEFAULT_RESULT_CACHE_DIR,
+                        help="directory of the cached result tables")
+    parser.add_argument('--result-cache-mb', type=float, default=DEFAULT_MAX_BYTES / 2 ** 20,
+                        help="size bound of the result cache; least recently used tables are evicted")
+    parser.add_argument('--no-result-cache', action='store_true', help="recompute every table")
+    parser.add_argument('--product-rules', default=None, metavar='PATH',
+                        help="JSON file of product exclusion, brand alias and pack size rules")
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    profiler = profiler_from_args(args)
+    result_cache = ResultCache(args.result_cache, int(args.result_cache_mb * 2 ** 20),
+                               enabled=not args.no_result_cache)
+    results = compute_analysis(args.transactions, args.customers, args.lifestage, args.premium,
+                               profiler=profiler, result_cache=result_cache,
+                               product_rules=load_product_rules(args.product_rules))
+    if result_cache.enabled:
+        print(f"Result cache: {result_cache.hits} table group(s) reused, {result_cache.misses} computed",
+              file=sys.stderr)
+    finish_profiling(profiler, args)
+    if args.out is None:
+        for locale in args.locale:
+            render_text(results, locale)
+            if not args.no_figures:
+                show_figures(results['report_data'], locale)
+        return
+
+    os.makedirs(args.out, exist_ok=True)
+    for locale in args.locale:
+        with open(os.path.join(args.out, f"report_{locale}.txt"), 'w', encoding='utf-8') as handle:
+            render_text(results, locale, out=handle)
+    if not args.no_figures:
+        render_report(results['report_data'], args.out, locales=args.locale)
+    print(f"Reports written to {args.out} for: {', '.join(args.locale)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+"""Interchangeable execution backends for the cleaning and segmentation stages.
+
+The section III-VII pipeline (salsa removal, outlier cards, product
+features, segment metrics) is available on three engines behind one
+interface, :meth:`Backend.run`:
+
+* ``pandas``: the reference, i.e. the :mod:`qvi.pipeline` stages;
+* ``polars``: one lazy, multithreaded Polars plan per pass;
+* ``duckdb``: the same plan as SQL on an embedded DuckDB connection.
+
+What is the same for every engine is written once and shared: the product
+dimension (the rules of :mod:`qvi.product_rules`, evaluated on the distinct
+names and joined to the transactions by the engine on integer product
+codes) and the outlier
+detection (the engine aggregates the per-card statistics, the thresholds of
+:mod:`qvi.outliers` are applied to them).  Outputs are converted back to
+pandas with the dtypes of the pandas stages, so every backend returns the
+same tables; :func:`check_backends` compares them with the reference.
+
+Polars and DuckDB are optional and only imported by their backend.
+
+Usage::
+
+    python -m qvi.backends --backend polars duckdb --check
+"""
+import abc
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE, convert_excel_dates
+from qvi.outliers import detect_outliers
+from qvi.products import build_product_dimension, product_codes
+from qvi.segments import SEGMENT_COLUMNS, add_derived_metrics
+
+DEFAULT_BACKEND = 'pandas'
+
+# Columns of the raw per-card statistics aggregated by the engines, and their
+# dtypes in :func:`qvi.outliers.card_statistics`
+CARD_STATISTIC_DTYPES = {'TRANSACTIONS': 'int64', 'UNITS': 'int64', 'SALES': 'float64', 'MAX_QTY': 'int64',
+                         'MAX_SALES': 'float64'}
+CARD_STATISTIC_COLUMNS = list(CARD_STATISTIC_DTYPES)
+
+# Columns of the segment metrics aggregated by the engines, before the derived ones
+SEGMENT_SUM_COLUMNS = ['TRANSACTIONS', 'SALES', 'TOTAL_QTY', 'CUSTOMERS']
+
+
+def _coded_transactions(transaction_data, products):
+    """The transactions with ``PROD_NAME`` as integer ``NAME_CODE``, and the products by ``NAME_CODE``.
+
+    The engines join and filter on integer codes only (as the workers of
+    :mod:`qvi.parallel` do); :meth:`Backend._cleaned` turns the codes back
+    into the categorical columns.
+    """
+    codes, names = product_codes(transaction_data['PROD_NAME'])
+    rows = pd.Index(products['PROD_NAME']).get_indexer(names)
+    known = np.flatnonzero(rows >= 0)
+    product_table = pd.DataFrame({
+        'NAME_CODE': known,
+        'PACK_SIZE': products['PACK_SIZE'].to_numpy(dtype='int64')[rows[known]],
+        'BRAND_CODE': products['BRAND'].cat.codes.to_numpy().astype('int64')[rows[known]],
+        'EXCLUDED': products['EXCLUDED'].to_numpy(dtype=bool)[rows[known]],
+    })
+    transactions = (transaction_data.drop(columns=['PROD_NAME', 'PACK_SIZE', 'BRAND'], errors='ignore')
+                    .assign(NAME_CODE=codes.astype('int64')))
+    return transactions, product_table, names
+
+
+def _coded_customers(customer_data):
+    """Card and segment codes (-1 when missing) of every customer, and the segment labels."""
+    if customer_data['LYLTY_CARD_NBR'].duplicated().any():
+        raise ValueError("The customer data has duplicate LYLTY_CARD_NBR values")
+    customers = pd.DataFrame({'LYLTY_CARD_NBR': customer_data['LYLTY_CARD_NBR'].to_numpy(dtype='int64')})
+    categories = {}
+    for column in SEGMENT_COLUMNS:
+        values = customer_data[column].astype('category')
+        customers[f'{column}_CODE'] = values.cat.codes.to_numpy().astype('int64')
+        categories[column] = values.cat.categories
+    return customers, categories
+
+
+def outlier_audit(statistics, outlier_rules=None):
+    """:func:`qvi.outliers.detect_outliers` on raw per-card statistics from an engine.
+
+    ``statistics`` has ``LYLTY_CARD_NBR`` and :data:`CARD_STATISTIC_COLUMNS`;
+    it is typed, rounded and indexed as :func:`qvi.outliers.card_statistics`.
+    """
+    statistics = statistics.set_index('LYLTY_CARD_NBR')[CARD_STATISTIC_COLUMNS].sort_index()
+    statistics = statistics.astype(CARD_STATISTIC_DTYPES)
+    return detect_outliers(statistics.round({'SALES': 2, 'MAX_SALES': 2}), outlier_rules)
+
+
+def segment_table(sums, categories):
+    """:func:`qvi.segments.segment_metrics` layout of per-segment sums from an engine.
+
+    ``sums`` has one ``<segment column>_CODE`` column per segment column and
+    :data:`SEGMENT_SUM_COLUMNS`; ``categories`` maps each segment column to
+    the labels of its codes, whose order is the order of the segments.
+    """
+    code_columns = [f'{column}_CODE' for column in SEGMENT_COLUMNS]
+    sums = sums.sort_values(code_columns, ignore_index=True)
+    table = pd.DataFrame({column: pd.Categorical.from_codes(sums[f'{column}_CODE'], categories[column])
+                          for column in SEGMENT_COLUMNS})
+    table['TRANSACTIONS'] = sums['TRANSACTIONS'].to_numpy(dtype='int64')
+    table['SALES'] = sums['SALES'].to_numpy(dtype='float64').round(2)
+    table['TOTAL_QTY'] = sums['TOTAL_QTY'].to_numpy(dtype='int64')
+    table['CUSTOMERS'] = sums['CUSTOMERS'].to_numpy(dtype='int64')
+    return add_derived_metrics(table)
+
+
+class Backend(abc.ABC):
+    """One engine for the cleaning and segmentation stages.
+
+    Subclasses implement :meth:`_run` on the prepared inputs; ``module`` is
+    the optional package the engine needs.
+    """
+
+    name = None
+    module = None
+
+    def __init__(self):
+        if self.module is not None:
+            try:
+                __import__(self.module)
+            except ImportError:
+                raise ValueError(f"The {self.name} backend needs the {self.module} package") from None
+
+    def run(self, transaction_data, customer_data=None, products=None, outlier_rules=None):
+        """Clean ``transaction_data`` and, with ``customer_data``, compute the segment metrics.
+
+        Returns a dict with ``cleaned`` (the transactions after salsa and
+        outlier removal, with ``PACK_SIZE`` and ``BRAND``, as
+        ``feature_stage(clean_stage(...))``), ``outliers`` (the audit table)
+        and ``segment_table`` (``None`` without ``customer_data``).
+        """
+        transaction_data = transaction_data.assign(DATE=convert_excel_dates(transaction_data['DATE']))
+        if products is None:
+            products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'])
+        return self._run(transaction_data, customer_data, products, outlier_rules)
+
+    def clean(self, transaction_data, products=None, outlier_rules=None):
+        """Only the cleaned transactions of :meth:`run`."""
+        return self.run(transaction_data, None, products, outlier_rules)['cleaned']
+
+    @abc.abstractmethod
+    def _run(self, transaction_data, customer_data, products, outlier_rules):
+        """The engine's :meth:`run` on transactions with converted dates and a product dimension."""
+
+    @staticmethod
+    def _cleaned(frame, transaction_data, products, names):
+        """An engine's coded cleaned rows with the columns and dtypes of the pandas stages."""
+        prod_names = transaction_data['PROD_NAME']
+        name_codes = frame['NAME_CODE'].to_numpy()
+        if isinstance(prod_names.dtype, pd.CategoricalDtype):
+            frame['PROD_NAME'] = pd.Categorical.from_codes(name_codes, dtype=prod_names.dtype)
+        else:
+            frame['PROD_NAME'] = np.append(np.asarray(names, dtype=object), np.nan)[name_codes]
+        brands = pd.Categorical.from_codes(frame['BRAND_CODE'].fillna(-1).to_numpy(dtype='int64'),
+                                           dtype=products['BRAND'].dtype)
+        frame['BRAND'] = pd.Series(brands, index=frame.index).cat.remove_unused_categories()
+        dtypes = {column: dtype for column, dtype in transaction_data.dtypes.items()
+                  if column not in ('PACK_SIZE', 'BRAND')}
+        dtypes.update(PACK_SIZE=products['PACK_SIZE'].dtype, BRAND=frame['BRAND'].dtype)
+        return frame[list(dtypes)].astype(dtypes)
+
+
+class PandasBackend(Backend):
+    """The reference: the eager :mod:`qvi.pipeline` stages."""
+
+    name = 'pandas'
+
+    def _run(self, transaction_data, customer_data, products, outlier_rules):
+        from qvi import pipeline
+
+        salsa_free = pipeline.clean_stage(transaction_data, products, outlier_customer_ids=())
+        kept, audit = pipeline.outlier_stage(salsa_free, outlier_rules)
+        cleaned = pipeline.feature_stage(kept, products)
+        table = None
+        if customer_data is not None:
+            table = pipeline.segmentation_stage(pipeline.merge_stage(cleaned, customer_data))
+        return {'cleaned': cleaned, 'outliers': audit, 'segment_table': table}
+
+
+class PolarsBackend(Backend):
+    """Lazy Polars plans: the product join and filters are fused and run multithreaded."""
+
+    name = 'polars'
+    module = 'polars'
+
+    def _run(self, transaction_data, customer_data, products, outlier_rules):
+        import polars as pl
+
+        transactions, product_table, names = _coded_transactions(transaction_data, products)
+        kept = (pl.from_pandas(transactions).lazy()
+                .join(pl.from_pandas(product_table).lazy(), on='NAME_CODE', how='left', maintain_order='left')
+                .filter(~pl.col('EXCLUDED').fill_null(False))
+                .with_columns(pl.col('PACK_SIZE').fill_null(0))
+                .drop('EXCLUDED'))
+        statistics = kept.group_by('LYLTY_CARD_NBR').agg(
+            TRANSACTIONS=pl.len(),
+            UNITS=pl.col('PROD_QTY').cast(pl.Int64).sum(),
+            SALES=pl.col('TOT_SALES').cast(pl.Float64).sum(),
+            MAX_QTY=pl.col('PROD_QTY').max().cast(pl.Int64),
+            MAX_SALES=pl.col('TOT_SALES').max().cast(pl.Float64),
+        ).collect().to_pandas()
+        audit = outlier_audit(statistics, outlier_rules)
+
+        cleaned = kept.filter(~pl.col('LYLTY_CARD_NBR').is_in(audit['LYLTY_CARD_NBR'].tolist()))
+        plans = [cleaned]
+        if customer_data is not None:
+            customers, categories = _coded_customers(customer_data)
+            code_columns = [f'{column}_CODE' for column in SEGMENT_COLUMNS]
+            plans.append(cleaned.with_columns(pl.col('LYLTY_CARD_NBR').cast(pl.Int64))
+                         .join(pl.from_pandas(customers).lazy(), on='LYLTY_CARD_NBR', how='inner')
+                         .filter(pl.all_horizontal(pl.col(code_columns) >= 0))
+                         .group_by(code_columns)
+                         .agg(TRANSACTIONS=pl.len(),
+                              SALES=pl.col('TOT_SALES').cast(pl.Float64).sum(),
+                              TOTAL_QTY=pl.col('PROD_QTY').cast(pl.Int64).sum(),
+                              CUSTOMERS=pl.col('LYLTY_CARD_NBR').n_unique()))
+        frames = pl.collect_all(plans)
+        return {
+            'cleaned': self._cleaned(frames[0].to_pandas(), transaction_data, products, names),
+            'outliers': audit,
+            'segment_table': segment_table(frames[1].to_pandas(), categories) if len(frames) > 1 else None,
+        }
+
+
+class DuckDBBackend(Backend):
+    """SQL on an embedded DuckDB connection, which scans the pandas frames in place."""
+
+    name = 'duckdb'
+    module = 'duckdb'
+
+    def _run(self, transaction_data, customer_data, products, outlier_rules):
+        import duckdb
+
+        transactions, product_table, names = _coded_transactions(transaction_data, products)
+        # Joins do not keep the row order: ROW_NUMBER restores it
+        transactions = transactions.assign(ROW_NUMBER=np.arange(len(transactions)))
+        connection = duckdb.connect()
+        try:
+            connection.register('transactions', transactions)
+            connection.register('products', product_table)
+            connection.execute("""
+                CREATE TEMP TABLE kept AS
+                SELECT t.*, COALESCE(p.PACK_SIZE, 0) AS PACK_SIZE, p.BRAND_CODE
+                FROM transactions t LEFT JOIN products p ON t.NAME_CODE = p.NAME_CODE
+                WHERE NOT COALESCE(p.EXCLUDED, FALSE)
+            """)
+            statistics = connection.sql("""
+                SELECT LYLTY_CARD_NBR, COUNT(*) AS TRANSACTIONS, SUM(CAST(PROD_QTY AS BIGINT)) AS UNITS,
+                       SUM(CAST(TOT_SALES AS DOUBLE)) AS SALES, MAX(PROD_QTY) AS MAX_QTY,
+                       MAX(CAST(TOT_SALES AS DOUBLE)) AS MAX_SALES
+                FROM kept GROUP BY LYLTY_CARD_NBR
+            """).df()
+            audit = outlier_audit(statistics, outlier_rules)
+            connection.register('outliers', audit[['LYLTY_CARD_NBR']])
+            connection.execute("""
+                CREATE TEMP TABLE cleaned AS
+                SELECT * FROM kept WHERE LYLTY_CARD_NBR NOT IN (SELECT LYLTY_CARD_NBR FROM outliers)
+            """)
+            cleaned = connection.sql("SELECT * FROM cleaned ORDER BY ROW_NUMBER").df()
+            table = None
+            if customer_data is not None:
+                customers, categories = _coded_customers(customer_data)
+                connection.register('customers', customers)
+                table = segment_table(connection.sql("""
+                    SELECT c.LIFESTAGE_CODE, c.PREMIUM_CUSTOMER_CODE, COUNT(*) AS TRANSACTIONS,
+                           SUM(CAST(t.TOT_SALES AS DOUBLE)) AS SALES,
+                           SUM(CAST(t.PROD_QTY AS BIGINT)) AS TOTAL_QTY,
+                           COUNT(DISTINCT t.LYLTY_CARD_NBR) AS CUSTOMERS
+                    FROM cleaned t JOIN customers c ON t.LYLTY_CARD_NBR = c.LYLTY_CARD_NBR
+                    WHERE c.LIFESTAGE_CODE >= 0 AND c.PREMIUM_CUSTOMER_CODE >= 0
+                    GROUP BY c.LIFESTAGE_CODE, c.PREMIUM_CUSTOMER_CODE
+                """).df(), categories)
+        finally:
+            connection.close()
+        return {'cleaned': self._cleaned(cleaned, transaction_data, products, names), 'outliers': audit,
+                'segment_table': table}
+
+
+BACKENDS = {backend.name: backend for backend in (PandasBackend, PolarsBackend, DuckDBBackend)}
+
+
+def get_backend(name=DEFAULT_BACKEND):
+    """The backend called ``name`` (one of :data:`BACKENDS`)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def compare_results(result, reference):
+    """Compare two :meth:`Backend.run` results table by table.
+
+    Returns a dict of table name -> True when identical, dtypes and
+    categories included (floats up to a relative 1e-9, as engines sum in
+    different orders).
+    """
+    parity = {}
+    for name, table in reference.items():
+        if table is None or result[name] is None:
+            parity[name] = table is None and result[name] is None
+            continue
+        try:
+            pd.testing.assert_frame_equal(result[name].reset_index(drop=True), table.reset_index(drop=True),
+                                          rtol=1e-9)
+            parity[name] = True
+        except AssertionError:
+            parity[name] = False
+    return parity
+
+
+def check_backends(transaction_data, customer_data, names=None, products=None, outlier_rules=None):
+    """Run every backend of ``names`` (default: all) and compare it with the pandas reference.
+
+    Returns a dict of backend name -> :func:`compare_results` dict.
+    """
+    names = [name for name in (BACKENDS if names is None else names) if name != DEFAULT_BACKEND]
+    reference = get_backend(DEFAULT_BACKEND).run(transaction_data, customer_data, products, outlier_rules)
+    return {name: compare_results(get_backend(name).run(transaction_data, customer_data, products, outlier_rules),
+                                  reference)
+            for name in names}
+
+
+def main(argv=None):
+    from qvi.pipeline import load_stage
+    from qvi.product_rules import load_product_rules
+
+    parser = argparse.ArgumentParser(description="Run the cleaning and segmentation stages on a chosen engine.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--product-rules', default=None, metavar='PATH')
+    parser.add_argument('--backend', nargs='+', default=[DEFAULT_BACKEND], choices=list(BACKENDS))
+    parser.add_argument('--check', action='store_true', help="compare every backend with the pandas reference")
+    args = parser.parse_args(argv)
+
+    transaction_data, customer_data = load_stage(args.transactions, args.customers)
+    products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'],
+                                       load_product_rules(args.product_rules))
+    results = {}
+    for name in args.backend:
+        backend = get_backend(name)
+        started = time.perf_counter()
+        results[name] = backend.run(transaction_data, customer_data, products)
+        print(f"{name}: cleaned and segmented {len(transaction_data)} rows "
+              f"({len(results[name]['cleaned'])} kept) in {time.perf_counter() - started:.3f}s")
+    print()
+    print(results[args.backend[-1]]['segment_table'].sort_values(by='SALES', ascending=False)
+          .to_string(index=False))
+    if args.check:
+        reference = results.get(DEFAULT_BACKEND)
+        if reference is None:
+            reference = get_backend(DEFAULT_BACKEND).run(transaction_data, customer_data, products)
+        print("\nParity with the pandas backend:")
+        for name, result in results.items():
+            if name == DEFAULT_BACKEND:
+                continue
+            for table, same in compare_results(result, reference).items():
+                print(f"  {name} {table}: {'identical' if same else 'DIFFERENT'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Market-basket (co-purchase) analysis on ``TXN_ID``.
+
+A basket is one transaction of one card (``LYLTY_CARD_NBR``, ``TXN_ID``).
+The baskets are encoded as a sparse basket x item incidence matrix ``X``
+(items are products, brands or pack sizes) and the pair counts are the
+sparse product ``X.T @ X``: its diagonal counts the baskets with each item
+and the off-diagonal entries the baskets with both items.  The work grows
+with the number of item pairs actually present in baskets, never with
+baskets x items or items x items, and only pairs bought together appear in
+the output.  Segment breakdowns repeat the product on each segment's rows.
+
+For a pair ``(A, B)`` over ``N`` baskets:
+
+* support = baskets with A and B / N;
+* confidence(A -> B) = baskets with A and B / baskets with A;
+* lift = support(A, B) / (support(A) * support(B)).
+
+scipy is imported only when baskets are analysed.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE
+from qvi.segments import SEGMENT_COLUMNS
+
+# Pairs bought together in fewer baskets are not reported
+DEFAULT_MIN_BASKETS = 2
+
+
+def basket_codes(transactions):
+    """Basket number of every row (0..n_baskets-1) and the number of baskets."""
+    keys = ((transactions['LYLTY_CARD_NBR'].to_numpy().astype(np.int64) << 32)
+            | transactions['TXN_ID'].to_numpy().astype(np.int64))
+    codes, uniques = pd.factorize(keys)
+    return codes, len(uniques)
+
+
+def item_codes(values):
+    """Item number of every row and the item labels (categoricals reuse their codes)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    codes, labels = pd.factorize(values, sort=True)
+    return codes, pd.Index(labels)
+
+
+def incidence_matrix(baskets, items, n_baskets, n_items):
+    """Sparse 0/1 basket x item matrix (an item bought twice in a basket counts once)."""
+    from scipy import sparse
+
+    valid = items >= 0
+    matrix = sparse.csr_matrix((np.ones(int(valid.sum()), dtype=np.int32), (baskets[valid], items[valid])),
+                               shape=(n_baskets, n_items))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def pair_statistics(matrix, labels, n_baskets=None, min_baskets=DEFAULT_MIN_BASKETS):
+    """Support, confidence and lift of every item pair bought together in ``matrix``.
+
+    ``matrix`` is a basket x item incidence matrix and ``n_baskets`` the
+    number of baskets the supports are relative to (its rows by default).
+    Returns one row per pair ``ITEM_A < ITEM_B`` with at least
+    ``min_baskets`` common baskets, strongest lift first.
+    """
+    from scipy import sparse
+
+    n_baskets = matrix.shape[0] if n_baskets is None else n_baskets
+    # Baskets with a single item add nothing to the pair counts
+    multi = np.flatnonzero(np.diff(matrix.indptr) > 1)
+    item_baskets = np.asarray(matrix.sum(axis=0)).ravel()
+    pairs = sparse.triu(matrix[multi].T @ matrix[multi], k=1).tocoo()
+    keep = pairs.data >= min_baskets
+    first, second, together = pairs.row[keep], pairs.col[keep], pairs.data[keep].astype(np.int64)
+    table = pd.DataFrame({
+        'ITEM_A': np.asarray(labels)[first],
+        'ITEM_B': np.asarray(labels)[second],
+        'BASKETS': together,
+        'SUPPORT': together / n_baskets,
+        'CONFIDENCE_A_B': together / item_baskets[first],
+        'CONFIDENCE_B_A': together / item_baskets[second],
+        'LIFT': together * n_baskets / (item_baskets[first] * item_baskets[second]),
+    })
+    return table.sort_values(['LIFT', 'BASKETS'], ascending=False, kind='stable', ignore_index=True)
+
+
+def co_purchases(transactions, item='BRAND', min_baskets=DEFAULT_MIN_BASKETS):
+    """Pair statistics of ``item`` (``PROD_NBR``, ``BRAND``, ``PACK_SIZE``...) over all baskets."""
+    baskets, n_baskets = basket_codes(transactions)
+    items, labels = item_codes(transactions[item])
+    return pair_statistics(incidence_matrix(baskets, items, n_baskets, len(labels)), labels,
+                           min_baskets=min_baskets)
+
+
+def segment_co_purchases(merged_data, item='BRAND', min_baskets=DEFAULT_MIN_BASKETS):
+    """Pair statistics of ``item`` within the baskets of every segment.
+
+    Supports are relative to the segment's own baskets.  A basket belongs to
+    the segment of its card; rows of cards without a segment are left out.
+    """
+    baskets, n_baskets = basket_codes(merged_data)
+    items, labels = item_codes(merged_data[item])
+    matrix = incidence_matrix(baskets, items, n_baskets, len(labels))
+    segments = merged_data[SEGMENT_COLUMNS]
+    segment_of_basket = np.full(n_baskets, -1, dtype=np.int64)
+    segment_codes, segment_labels = pd.MultiIndex.from_frame(segments).factorize()
+    segment_of_basket[baskets] = segment_codes
+    # Baskets grouped by segment, so each segment is one slice of the order
+    order = np.argsort(segment_of_basket, kind='stable')
+    bounds = np.searchsorted(segment_of_basket[order], np.arange(len(segment_labels) + 1))
+    tables = []
+    for number, (lifestage, premium) in enumerate(segment_labels):
+        if pd.isna(lifestage) or pd.isna(premium):
+            continue
+        rows = order[bounds[number]:bounds[number + 1]]
+        tables.append(pair_statistics(matrix[rows], labels, min_baskets=min_baskets)
+                      .assign(LIFESTAGE=lifestage, PREMIUM_CUSTOMER=premium))
+    if not tables:
+        tables = [pair_statistics(matrix[:0], labels, n_baskets=1).assign(LIFESTAGE=None, PREMIUM_CUSTOMER=None)]
+    table = pd.concat(tables, ignore_index=True)
+    table = table[SEGMENT_COLUMNS + [column for column in table.columns if column not in SEGMENT_COLUMNS]]
+    return table.sort_values(SEGMENT_COLUMNS + ['LIFT'], ascending=[True, True, False], kind='stable',
+                             ignore_index=True)
+
+
+def main(argv=None):
+    from qvi.pipeline import clean_stage, feature_stage, load_stage, merge_stage
+
+    parser = argparse.ArgumentParser(description="Which brands, pack sizes or products are bought together.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--item', default='BRAND', choices=['BRAND', 'PACK_SIZE', 'PROD_NBR', 'PROD_NAME'])
+    parser.add_argument('--min-baskets', type=int, default=DEFAULT_MIN_BASKETS)
+    parser.add_argument('--by-segment', action='store_true', help="break the pairs down by segment")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    transaction_data, customer_data = load_stage(args.transactions, args.customers)
+    transaction_data = feature_stage(clean_stage(transaction_data))
+    if args.by_segment:
+        merged_data = merge_stage(transaction_data, customer_data)
+        table = segment_co_purchases(merged_data, args.item, args.min_baskets)
+        table = table.groupby(SEGMENT_COLUMNS, observed=True, sort=False).head(args.top)
+    else:
+        table = co_purchases(transaction_data, args.item, args.min_baskets).head(args.top)
+    if table.empty:
+        print(f"No {args.item} pairs bought together in at least {args.min_baskets} baskets.")
+    else:
+        print(table.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Benchmark suite: time every pipeline stage on synthetic data and track it per commit.
+
+Each run generates (once, then reuses) a :mod:`qvi.synthetic` dataset per
+scale, runs the pipeline under a :class:`qvi.profiling.StageProfiler`
+``repeat`` times and keeps the fastest time of every stage.  Results are
+appended to a JSON-lines history together with the git commit, so any two
+commits can be compared stage by stage and slowdowns flagged.
+
+Usage::
+
+    python -m qvi.benchmark --scale 1 10 --repeat 3
+    python -m qvi.benchmark --scale 100 --mode stream --compare
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+from qvi.profiling import StageProfiler
+
+DEFAULT_BENCH_DIR = ".qvi_bench"
+
+# The checkout the qvi package lives in, whatever the working directory
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = 'history.jsonl'
+
+# A stage is reported as a regression when it gets this much slower
+REGRESSION_RATIO = 1.10
+
+MODES = ('pipeline', 'stream', 'parallel')
+
+
+def git_revision():
+    """Commit of the qvi checkout and whether its work tree has changes, or ``(None, None)`` outside git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPOSITORY_ROOT,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def dataset(scale, seed=0, bench_dir=DEFAULT_BENCH_DIR):
+    """Paths of the synthetic dataset for ``scale``/``seed``, generated on first use."""
+    from qvi.synthetic import write_dataset
+
+    out_dir = os.path.join(bench_dir, 'data', f"scale_{scale:g}_seed_{seed}")
+    transaction_path = os.path.join(out_dir, 'transactions.parquet')
+    customer_path = os.path.join(out_dir, 'customers.csv')
+    if not (os.path.exists(transaction_path) and os.path.exists(customer_path)):
+        write_dataset(out_dir, scale, seed)
+    return transaction_path, customer_path
+
+
+def _run_once(mode, transaction_path, customer_path):
+    profiler = StageProfiler()
+    if mode == 'pipeline':
+        from qvi.pipeline import run_pipeline
+
+        run_pipeline(transaction_path, customer_path, profiler=profiler)
+    elif mode == 'stream':
+        from qvi.streaming import stream_aggregates
+
+        with profiler.stage('stream') as record:
+            record['ROWS_OUT'] = stream_aggregates(transaction_path, customer_path).rows_kept
+    elif mode == 'parallel':
+        from qvi.loader import load_customers, load_transactions
+        from qvi.parallel import parallel_aggregates
+
+        with profiler.stage('load') as record:
+            transaction_data = load_transactions(transaction_path)
+            customer_data = load_customers(customer_path)
+            record['ROWS_OUT'] = len(transaction_data)
+        with profiler.stage('parallel', rows_in=transaction_data) as record:
+            record['ROWS_OUT'] = parallel_aggregates(transaction_data, customer_data)['rows_kept']
+    else:
+        raise ValueError(f"Unknown benchmark mode '{mode}', expected one of {MODES}")
+    return profiler.records
+
+
+def benchmark(scale, mode='pipeline', repeat=3, seed=0, bench_dir=DEFAULT_BENCH_DIR):
+    """Benchmark ``mode`` at ``scale`` and return the history record.
+
+    Every stage keeps its fastest wall and CPU time over ``repeat`` runs and
+    its largest peak memory.
+    """
+    transaction_path, customer_path = dataset(scale, seed, bench_dir)
+    stages = {}
+    for _ in range(repeat):
+        for record in _run_once(mode, transaction_path, customer_path):
+            best = stages.setdefault(record['STAGE'], {'wall_s': float('inf'), 'cpu_s': float('inf'),
+                                                       'peak_rss_mb': 0.0, 'rows_in': record['ROWS_IN'],
+                                                       'rows_out': record['ROWS_OUT']})
+            best['wall_s'] = min(best['wall_s'], record['WALL_S'])
+            best['cpu_s'] = min(best['cpu_s'], record['CPU_S'])
+            best['peak_rss_mb'] = max(best['peak_rss_mb'], record['PEAK_RSS_MB'] or 0.0)
+    commit, dirty = git_revision()
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'mode': mode,
+        'scale': scale,
+        'seed': seed,
+        'repeat': repeat,
+        'total_wall_s': sum(stage['wall_s'] for stage in stages.values()),
+        'stages': stages,
+    }
+
+
+def append_history(record, bench_dir=DEFAULT_BENCH_DIR):
+    os.makedirs(bench_dir, exist_ok=True)
+    with open(os.path.join(bench_dir, HISTORY_FILE), 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps(record) + '\n')
+
+
+def read_history(bench_dir=DEFAULT_BENCH_DIR):
+    path = os.path.join(bench_dir, HISTORY_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def compare(before, after, threshold=REGRESSION_RATIO):
+    """Stage-by-stage comparison table of two history records of the same mode and scale."""
+    import pandas as pd
+
+    rows = []
+    for stage in dict.fromkeys(list(before['stages']) + list(after['stages'])):
+        old = before['stages'].get(stage, {}).get('wall_s')
+        new = after['stages'].get(stage, {}).get('wall_s')
+        ratio = new / old if old and new is not None else None
+        rows.append({'STAGE': stage, 'BEFORE_S': old, 'AFTER_S': new, 'RATIO': ratio,
+                     'REGRESSION': ratio is not None and ratio > threshold})
+    rows.append({'STAGE': 'TOTAL', 'BEFORE_S': before['total_wall_s'], 'AFTER_S': after['total_wall_s'],
+                 'RATIO': after['total_wall_s'] / before['total_wall_s'],
+                 'REGRESSION': after['total_wall_s'] / before['total_wall_s'] > threshold})
+    return pd.DataFrame(rows)
+
+
+def previous_record(history, record):
+    """Latest earlier record of the same mode, scale and seed from another commit."""
+    for candidate in reversed(history):
+        if (candidate['mode'], candidate['scale'], candidate['seed']) == (record['mode'], record['scale'],
+                                                                        record['seed']) \
+                and candidate['commit'] != record['commit']:
+            return candidate
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the QVI pipeline stages on synthetic data.")
+    parser.add_argument('--scale', type=float, nargs='+', default=[1.0],
+                        help="dataset sizes; 1 = the real extract (~265k rows), 400 = ~100M rows")
+    parser.add_argument('--mode', choices=MODES, default='pipeline',
+                        help="in-memory pipeline stages, the chunked streaming mode for large scales, "
+                             "or the multi-process cleaning and aggregation")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bench-dir', default=DEFAULT_BENCH_DIR)
+    parser.add_argument('--no-record', action='store_true', help="do not append to the history")
+    parser.add_argument('--compare', action='store_true',
+                        help="compare with the latest result of a different commit")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+
+    history = read_history(args.bench_dir)
+    for scale in args.scale:
+        record = benchmark(scale, args.mode, args.repeat, args.seed, args.bench_dir)
+        print(f"\n--- {args.mode} at scale {scale:g} (commit {record['commit']}"
+              f"{', dirty' if record['dirty'] else ''}) ---")
+        for stage, timing in record['stages'].items():
+            print(f"{stage:<12} {timing['wall_s']:9.3f}s  cpu {timing['cpu_s']:9.3f}s  "
+                  f"peak rss {timing['peak_rss_mb']:9.1f} MB  rows {timing['rows_in']} -> {timing['rows_out']}")
+        print(f"{'TOTAL':<12} {record['total_wall_s']:9.3f}s")
+        if args.compare:
+            before = previous_record(history, record)
+            if before is None:
+                print("No earlier result from another commit to compare with.")
+            else:
+                print(f"\nCompared with commit {before['commit']} ({before['timestamp']}):")
+                print(compare(before, record, args.threshold).to_string(index=False))
+        if not args.no_record:
+            append_history(record, args.bench_dir)
+            history.append(record)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Cleaning and feature engineering for the transaction data (sections III-IV).
+
+Every function works on any slice of the transaction data, so the same rules
+are used for a full in-memory frame and for the chunks of the streaming mode.
+"""
+from qvi.loader import convert_excel_dates
+from qvi.outliers import exclude_outliers
+from qvi.products import build_product_dimension, map_products
+
+
+def remove_salsa(transactions, products=None):
+    """Drop the salsa products (every product excluded by the product rules) from ``transactions``."""
+    if products is None:
+        products = build_product_dimension(transactions['PROD_NAME'])
+    return transactions[~map_products(transactions['PROD_NAME'], products, 'EXCLUDED').to_numpy()]
+
+
+def remove_customers(transactions, customer_ids):
+    """Drop every transaction made with one of the ``customer_ids`` cards."""
+    return transactions[~transactions['LYLTY_CARD_NBR'].isin(customer_ids)]
+
+
+def add_product_features(transactions, products=None):
+    """Return ``transactions`` with the ``PACK_SIZE`` and ``BRAND`` columns added.
+
+    Both are looked up in the product dimension, which is built from the
+    distinct product names when ``products`` is not given.
+    """
+    if products is None:
+        products = build_product_dimension(transactions['PROD_NAME'])
+    prod_names = transactions['PROD_NAME']
+    return transactions.assign(PACK_SIZE=map_products(prod_names, products, 'PACK_SIZE'),
+                               BRAND=map_products(prod_names, products, 'BRAND'))
+
+
+def clean_transactions(transactions, outlier_customer_ids=None, outlier_rules=None, product_rules=None):
+    """Apply the section III/IV cleaning to a frame or chunk of transactions.
+
+    Converts ``DATE``, removes salsa products and outlier customers, then adds
+    the ``PACK_SIZE`` and ``BRAND`` features.  Product names are parsed once
+    per distinct product through :func:`qvi.products.build_product_dimension`
+    with ``product_rules`` (the default rules when ``None``).  Outlier cards are detected in ``transactions`` with ``outlier_rules``
+    unless ``outlier_customer_ids`` is given; chunks of a larger file should
+    get the ids detected over the whole file.
+    """
+    transactions = transactions.assign(DATE=convert_excel_dates(transactions['DATE']))
+    products = build_product_dimension(transactions['PROD_NAME'], rules=product_rules)
+    transactions = remove_salsa(transactions, products)
+    if outlier_customer_ids is None:
+        transactions, _ = exclude_outliers(transactions, outlier_rules)
+    else:
+        transactions = remove_customers(transactions, outlier_customer_ids)
+    return add_product_features(transactions, products)
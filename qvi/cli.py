@@ -0,0 +1,171 @@
+"""Command line entry point: ``python -m qvi <command>``.
+
+Commands import only what they need, so a cleaning-only job does not pay for
+matplotlib, seaborn or scipy.
+"""
+import argparse
+import importlib
+import sys
+
+from qvi.backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE
+from qvi.pipeline import TARGET_LIFESTAGE, TARGET_PREMIUM
+from qvi.profiling import add_profiling_arguments, finish_profiling, profiler_from_args
+
+# Commands implemented by the main() of another module
+DELEGATED_COMMANDS = {
+    'analysis': 'qvi.analysis',
+    'backends': 'qvi.backends',
+    'baskets': 'qvi.baskets',
+    'benchmark': 'qvi.benchmark',
+    'controls': 'qvi.store_matching',
+    'cube': 'qvi.cube',
+    'features': 'qvi.customer_features',
+    'parallel': 'qvi.parallel',
+    'synthetic': 'qvi.synthetic',
+    'report': 'qvi.report',
+    'serve': 'qvi.service',
+    'stream': 'qvi.streaming',
+    'store': 'qvi.store',
+}
+
+
+def _print_table(table, sort_by=None, top=None):
+    if sort_by is not None:
+        table = table.sort_values(by=sort_by, ascending=False)
+    if top is not None:
+        table = table.head(top)
+    print(table.to_string())
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m qvi', description="QVI transaction analysis pipeline.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--no-cache', action='store_true', help="always parse the transaction workbook")
+    parser.add_argument('--product-rules', default=None, metavar='PATH',
+                        help="JSON file of product exclusion, brand alias and pack size rules")
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=list(BACKENDS),
+                        help="engine of the cleaning and segment stages (see python -m qvi.backends)")
+    add_profiling_arguments(parser)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('products', help="print the product dimension and the rules that fired")
+
+    clean = commands.add_parser('clean', help="load, clean and add features; write the result")
+    clean.add_argument('--out', required=True, help="output file (.parquet, .pkl or .csv)")
+
+    commands.add_parser('segments', help="print the segment metrics (Tables 3-6)")
+    ttest = commands.add_parser('ttest', help="print the price per unit t-test (Table 7)")
+    ttest.add_argument('--pairwise', action='store_true', help="also test every pair of segments")
+    ttest.add_argument('--correction', default='holm', help="p-value correction of the pairwise tests "
+                                                            "(bonferroni, holm, fdr_bh or none)")
+    ttest.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                       help="print per-segment bootstrap confidence intervals from N resamples")
+
+    affinity = commands.add_parser('affinity', help="print brand and pack size affinity (Tables 8-9)")
+    affinity.add_argument('--lifestage', default=TARGET_LIFESTAGE)
+    affinity.add_argument('--premium', default=TARGET_PREMIUM)
+    affinity.add_argument('--top', type=int, default=10)
+    affinity.add_argument('--all', action='store_true', help="every segment instead of one")
+    affinity.add_argument('--dimension', nargs='+', default=['BRAND', 'PACK_SIZE'],
+                          help="product columns to compute the affinity to")
+
+    for command, module in DELEGATED_COMMANDS.items():
+        commands.add_parser(command, help=f"see python -m {module} --help", add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    args, _ = parser.parse_known_args(argv)
+    if args.command in DELEGATED_COMMANDS:
+        # Options given before the command name are forwarded to the command's own parser, which rejects
+        # any it does not know instead of the pipeline running without printing anything.
+        position = argv.index(args.command)
+        forwarded = argv[:position] + argv[position + 1:]
+        return importlib.import_module(DELEGATED_COMMANDS[args.command]).main(forwarded)
+    args = parser.parse_args(argv)
+    profiler = profiler_from_args(args)
+    _run_command(args, profiler)
+    finish_profiling(profiler, args)
+
+
+def _run_command(args, profiler):
+    from qvi import pipeline
+    from qvi.product_rules import load_product_rules
+    from qvi.products import build_product_dimension
+
+    with profiler.stage('load') as record:
+        transaction_data, customer_data = pipeline.load_stage(args.transactions, args.customers,
+                                                              use_cache=not args.no_cache)
+        record['ROWS_OUT'] = len(transaction_data)
+    with profiler.stage('products', rows_in=transaction_data) as record:
+        products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'],
+                                           load_product_rules(args.product_rules))
+        record['ROWS_OUT'] = len(products)
+    if args.command == 'products':
+        print(products.to_string())
+        return
+    if args.backend != DEFAULT_BACKEND:
+        backend = get_backend(args.backend)
+        if args.command == 'segments':
+            with profiler.stage('segments', rows_in=transaction_data):
+                result = backend.run(transaction_data, customer_data, products)
+                _print_table(result['segment_table'], sort_by='SALES')
+            return
+        transaction_data = profiler.run('clean', backend.clean, transaction_data, products)
+    else:
+        transaction_data = profiler.run('clean', pipeline.clean_stage, transaction_data, products)
+        transaction_data = profiler.run('features', pipeline.feature_stage, transaction_data, products)
+    if args.command == 'clean':
+        from qvi.loader import write_frame
+
+        if args.out.endswith('.csv'):
+            transaction_data.to_csv(args.out, index=False)
+        else:
+            write_frame(transaction_data, args.out)
+        print(f"Wrote {len(transaction_data)} cleaned transactions to {args.out}")
+        return
+
+    merged_data = profiler.run('merge', pipeline.merge_stage, transaction_data, customer_data)
+    with profiler.stage(args.command, rows_in=merged_data):
+        _run_analysis_command(args, merged_data)
+
+
+def _run_analysis_command(args, merged_data):
+    from qvi import pipeline
+    from qvi.affinity import affinity_table
+
+    if args.command == 'segments':
+        _print_table(pipeline.segmentation_stage(merged_data), sort_by='SALES')
+    elif args.command == 'ttest':
+        from qvi import significance
+
+        moments = significance.segment_moments(merged_data)
+        result = significance.price_per_unit_ttest(merged_data, moments=moments)
+        if result is None:
+            print("Not enough data to perform T-test for the selected groups.")
+        else:
+            for name, value in result.items():
+                print(f"{name}: {value:.4f}" if isinstance(value, float) else f"{name}: {value}")
+        if args.pairwise:
+            print()
+            _print_table(significance.pairwise_welch(moments, args.correction).sort_values(by='P_VALUE'))
+        if args.bootstrap:
+            print()
+            _print_table(significance.bootstrap_mean_ci(merged_data, args.bootstrap))
+    elif args.command == 'affinity':
+        if args.all:
+            for table in pipeline.segment_affinity_stage(merged_data, args.dimension).values():
+                _print_table(table.groupby(level=[0, 1], observed=True, sort=False).head(args.top))
+                print()
+            return
+        for dimension in args.dimension:
+            _print_table(affinity_table(merged_data, dimension, args.lifestage, args.premium), top=args.top)
+            print()
+
+
+if __name__ == '__main__':
+    main()
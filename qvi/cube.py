@@ -0,0 +1,447 @@
+"""Pre-aggregated cube over DATE x STORE_NBR x segment x BRAND x PACK_SIZE.
+
+The merged transactions are reduced once to one cell per combination of
+day, store, ``LIFESTAGE``, ``PREMIUM_CUSTOMER``, ``BRAND`` and ``PACK_SIZE``
+that occurs, holding the additive measures (transactions, sales, units and
+the shifted sums of the price per unit and of its square, for Welch's
+test).  Distinct customers are not additive, and keeping the cards of
+every cell would take about one entry per transaction, so they are kept
+exactly at the coarser segment x calendar month grain instead: one row
+per card with its segment and a card x month activity matrix.  Any
+roll-up of segments and months (Tables 5 and 6 included) counts its
+customers exactly from those; finer slices leave ``CUSTOMERS`` out.
+
+Roll-up and slice queries (:meth:`Cube.query`) work on the cells with
+integer codes, compact group ids and ``np.bincount``, never on the
+transactions, and the section VII-VIII tables (3-9) are served from the
+cube.
+
+Usage::
+
+    python -m qvi.cube build CUBE_DIR
+    python -m qvi.cube query CUBE_DIR --by BRAND --where LIFESTAGE="OLDER FAMILIES" --month 12
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from qvi.affinity import segment_affinities, select_segment
+from qvi.loader import (CUSTOMER_FILE, TRANSACTION_FILE, columnar_extension, convert_excel_dates,
+                        read_frame, write_frame)
+from qvi.segments import SEGMENT_COLUMNS, add_derived_metrics
+
+CUBE_VERSION = 2
+
+# Finest grain of the cube
+CUBE_DIMENSIONS = ['DATE', 'STORE_NBR'] + SEGMENT_COLUMNS + ['BRAND', 'PACK_SIZE']
+
+# Additive measures of every cell
+CUBE_MEASURES = ['TRANSACTIONS', 'SALES', 'TOTAL_QTY', 'PRICE_SUM', 'PRICE_SQUARES']
+
+# Dimensions derived from DATE that queries can group by or filter on
+DATE_PARTS = {
+    'YEAR': lambda dates: dates.year,
+    'MONTH': lambda dates: dates.month,
+    'DAY_OF_WEEK': lambda dates: dates.dayofweek,
+}
+
+# Dimensions of the queries whose distinct customers the cube answers exactly
+CUSTOMER_DIMENSIONS = SEGMENT_COLUMNS + ['YEAR', 'MONTH']
+
+# Combined group keys are re-factorized before they would overflow
+_KEY_LIMIT = 1 << 62
+
+
+def _dimension_codes(values):
+    """Integer codes (-1 for missing) and labels of a dimension column."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64), values.cat.categories
+    codes, labels = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), labels
+
+
+def _labels_at(labels, codes, categorical):
+    """Labels of ``codes`` (-1 for missing), as a categorical when ``categorical``."""
+    if categorical:
+        return pd.Categorical.from_codes(codes, labels)
+    values = np.asarray(labels)
+    if (codes >= 0).all():
+        return values[codes]
+    return np.where(codes >= 0, values.astype(object)[np.maximum(codes, 0)], None)
+
+
+def _group_ids(codes, widths, size):
+    """Compact group ids of ``size`` rows of per-dimension ``codes`` and the first row of every group.
+
+    The codes are combined into one key while it fits in 62 bits and the key
+    is re-factorized with ``np.unique`` whenever the next dimension would
+    overflow it, so the ids never depend on the product of the widths.  Keys
+    with no more values than rows are compacted with a lookup table instead
+    of a sort.
+    """
+    key = np.zeros(size, dtype=np.int64)
+    bound = 1
+    for column, width in zip(codes, widths):
+        if bound * width >= _KEY_LIMIT:
+            uniques, key = np.unique(key, return_inverse=True)
+            key = key.reshape(-1)
+            bound = len(uniques)
+        key = key * width + column
+        bound *= width
+    if bound > size:
+        _, first, groups = np.unique(key, return_index=True, return_inverse=True)
+        return groups.reshape(-1), first
+    rows = np.arange(size)
+    first_of_key = np.full(bound, size, dtype=np.int64)
+    # Reversed, so the first row of every key is the one written last
+    first_of_key[key[::-1]] = rows[::-1]
+    present = np.flatnonzero(first_of_key < size)
+    group_of_key = np.zeros(bound, dtype=np.int64)
+    group_of_key[present] = np.arange(len(present))
+    return group_of_key[key], first_of_key[present]
+
+
+def _month_bound(date, side):
+    """Whether ``date`` (or no bound) starts (``side='start'``) or ends a calendar month."""
+    if date is None:
+        return True
+    date = pd.Timestamp(date)
+    month = date.to_period('M')
+    return date == (month.start_time if side == 'start' else month.end_time.normalize())
+
+
+def build_cube(merged_data):
+    """Aggregate the cleaned and merged transactions into a :class:`Cube`.
+
+    Rows of cards without a segment keep missing segment labels, so they
+    still count towards the "other" share of the affinities.
+    """
+    codes, labels = {}, {}
+    for dimension in CUBE_DIMENSIONS:
+        codes[dimension], labels[dimension] = _dimension_codes(merged_data[dimension])
+    # Missing labels (-1) get their own slot 0
+    shape = tuple(len(labels[dimension]) + 1 for dimension in CUBE_DIMENSIONS)
+    keys = np.ravel_multi_index(tuple(codes[dimension] + 1 for dimension in CUBE_DIMENSIONS), shape)
+    cell_keys, cell_of_row = np.unique(keys, return_inverse=True)
+    n_cells = len(cell_keys)
+
+    cells = {}
+    for dimension, cell_codes in zip(CUBE_DIMENSIONS, np.unravel_index(cell_keys, shape)):
+        categorical = isinstance(merged_data[dimension].dtype, pd.CategoricalDtype)
+        cells[dimension] = _labels_at(labels[dimension], cell_codes - 1, categorical)
+
+    prices = merged_data['TOT_SALES'].to_numpy() / merged_data['PROD_QTY'].to_numpy()
+    # The same shift as qvi.significance.segment_moments, so the moments agree
+    price_shift = float(np.nan_to_num(np.nanmedian(prices[:1000]))) if len(prices) else 0.0
+    shifted = prices - price_shift
+    cells['TRANSACTIONS'] = np.bincount(cell_of_row, minlength=n_cells)
+    cells['SALES'] = np.bincount(cell_of_row, weights=merged_data['TOT_SALES'].to_numpy(),
+                                 minlength=n_cells)
+    cells['TOTAL_QTY'] = np.bincount(cell_of_row, weights=merged_data['PROD_QTY'].to_numpy(dtype='float64'),
+                                     minlength=n_cells).round().astype(np.int64)
+    cells['PRICE_SUM'] = np.bincount(cell_of_row, weights=shifted, minlength=n_cells)
+    cells['PRICE_SQUARES'] = np.bincount(cell_of_row, weights=shifted * shifted, minlength=n_cells)
+
+    cards, first_row, card_of_row = np.unique(merged_data['LYLTY_CARD_NBR'].to_numpy().astype(np.int64),
+                                              return_index=True, return_inverse=True)
+    customers = merged_data[['LYLTY_CARD_NBR'] + SEGMENT_COLUMNS].iloc[first_row].reset_index(drop=True)
+    dates = pd.DatetimeIndex(merged_data['DATE'])
+    month_of_row = np.asarray(dates.year * 12 + dates.month - 1, dtype=np.int64)
+    if len(month_of_row):
+        first_month = int(month_of_row.min())
+        periods = pd.period_range(pd.Period(year=first_month // 12, month=first_month % 12 + 1, freq='M'),
+                                  periods=int(month_of_row.max()) - first_month + 1, freq='M')
+        month_of_row = month_of_row - first_month
+    else:
+        periods = pd.PeriodIndex([], freq='M')
+    activity = np.zeros((len(cards), len(periods)), dtype=bool)
+    activity[card_of_row.reshape(-1), month_of_row] = True
+    return Cube(pd.DataFrame(cells), customers, activity, periods, price_shift)
+
+
+class Cube:
+    """Cells of additive measures plus the segment and monthly activity of every card."""
+
+    def __init__(self, cells, customers, activity, periods, price_shift=0.0):
+        self.cells = cells
+        # One row per card: LYLTY_CARD_NBR and its segment
+        self.customers = customers
+        # activity[card, month] is true when the card bought in periods[month]
+        self.activity = activity
+        self.periods = periods
+        self.price_shift = price_shift
+        self._codes = {}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _dimension(self, name):
+        if name in DATE_PARTS:
+            return pd.Series(DATE_PARTS[name](pd.DatetimeIndex(self.cells['DATE'])), name=name)
+        if name not in self.cells.columns or name in CUBE_MEASURES:
+            raise ValueError(f"Unknown cube dimension {name!r}")
+        return self.cells[name]
+
+    def _dimension_codes(self, name):
+        if name not in self._codes:
+            self._codes[name] = _dimension_codes(self._dimension(name))
+        return self._codes[name]
+
+    def mask(self, where=None, start=None, end=None):
+        """Boolean mask of the cells matching ``where`` (dimension -> value or list) and the date range."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for name, values in (where or {}).items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            mask &= self._dimension(name).isin(list(values)).to_numpy()
+        dates = self.cells['DATE']
+        if start is not None:
+            mask &= (dates >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (dates <= pd.Timestamp(end)).to_numpy()
+        return mask
+
+    def query(self, by=(), where=None, start=None, end=None, customers=None):
+        """Roll up the cells matching the slice to the ``by`` dimensions.
+
+        ``by`` and the ``where`` keys are cube dimensions or :data:`DATE_PARTS`;
+        ``start``/``end`` bound ``DATE`` (inclusive).  Returns one row per
+        group with ``TRANSACTIONS``, ``SALES``, ``TOTAL_QTY`` and the exact
+        distinct ``CUSTOMERS`` when the query stays within
+        :data:`CUSTOMER_DIMENSIONS` and whole months.  ``customers=True``
+        raises ``ValueError`` for any other query, ``False`` leaves them out.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        answerable = self._customers_answerable(by, where, start, end)
+        if customers and not answerable:
+            raise ValueError(f"Distinct customers are kept per {' x '.join(CUSTOMER_DIMENSIONS)} only; "
+                             f"cannot count them by {by} with {sorted(where or {})} between {start} and {end}")
+        selected = np.flatnonzero(self.mask(where, start, end))
+        codes, widths = [], []
+        for name in by:
+            dimension_codes, labels = self._dimension_codes(name)
+            codes.append(dimension_codes[selected] + 1)
+            widths.append(len(labels) + 1)
+        groups, first = _group_ids(codes, widths, len(selected))
+        n_groups = len(first)
+
+        table = {'TRANSACTIONS': np.bincount(groups, weights=self.cells['TRANSACTIONS'].to_numpy()[selected],
+                                             minlength=n_groups).astype(np.int64),
+                 'SALES': np.bincount(groups, weights=self.cells['SALES'].to_numpy()[selected],
+                                      minlength=n_groups).round(2),
+                 'TOTAL_QTY': np.bincount(groups, weights=self.cells['TOTAL_QTY'].to_numpy()[selected],
+                                          minlength=n_groups).astype(np.int64)}
+        group_codes = [column[first] for column in codes]
+        if answerable and customers is not False:
+            table['CUSTOMERS'] = self._customer_counts(by, where, start, end, group_codes, widths, n_groups)
+
+        result = pd.DataFrame(table)
+        for position, (name, column) in enumerate(zip(by, group_codes)):
+            labels = self._dimension_codes(name)[1]
+            categorical = isinstance(self._dimension(name).dtype, pd.CategoricalDtype)
+            result.insert(position, name, _labels_at(labels, column - 1, categorical))
+        return result
+
+    @staticmethod
+    def _customers_answerable(by, where, start, end):
+        names = set(by) | set(where or {})
+        return names <= set(CUSTOMER_DIMENSIONS) and _month_bound(start, 'start') and _month_bound(end, 'end')
+
+    def _customer_codes(self, name):
+        """Codes of the cards' ``name`` segment, in the cells' labels of that dimension."""
+        key = ('customers', name)
+        if key not in self._codes:
+            labels = pd.Index(self._dimension_codes(name)[1])
+            self._codes[key] = labels.get_indexer(self.customers[name].astype(object))
+        return self._codes[key]
+
+    def _customer_counts(self, by, where, start, end, group_codes, widths, n_groups):
+        """Distinct cards of every group, from the card segments and monthly activity."""
+        month_starts = self.periods.start_time
+        cards = np.ones(len(self.customers), dtype=bool)
+        months = np.ones(len(self.periods), dtype=bool)
+        for name, values in (where or {}).items():
+            values = list(values) if isinstance(values, (list, tuple, set)) else [values]
+            if name in DATE_PARTS:
+                months &= np.isin(np.asarray(DATE_PARTS[name](month_starts)), values)
+            else:
+                cards &= self.customers[name].isin(values).to_numpy()
+        if start is not None:
+            months &= np.asarray(month_starts >= pd.Timestamp(start))
+        if end is not None:
+            months &= np.asarray(month_starts <= pd.Timestamp(end))
+
+        # Dense group index = card offset (segment dimensions) + month offset (date parts); both are small
+        strides = np.cumprod([1] + widths[::-1])[:-1][::-1]
+        card_offset = np.zeros(len(self.customers), dtype=np.int64)
+        month_offset = np.zeros(len(self.periods), dtype=np.int64)
+        for name, stride in zip(by, strides):
+            if name in DATE_PARTS:
+                labels = pd.Index(self._dimension_codes(name)[1])
+                month_offset += (labels.get_indexer(DATE_PARTS[name](month_starts)) + 1) * stride
+            else:
+                card_offset += (self._customer_codes(name) + 1) * stride
+        n_dense = int(np.prod(widths)) if by else 1
+        counts = np.zeros(n_dense, dtype=np.int64)
+        for offset in np.unique(month_offset[months]):
+            active = cards & self.activity[:, months & (month_offset == offset)].any(axis=1)
+            counts += np.bincount(card_offset[active] + offset, minlength=n_dense)
+        dense = np.zeros(n_groups, dtype=np.int64)
+        for column, stride in zip(group_codes, strides):
+            dense += column * stride
+        return counts[dense]
+
+    def segment_table(self):
+        """Tables 3-6: :func:`qvi.segments.segment_metrics` from the cube."""
+        table = self.query(SEGMENT_COLUMNS)
+        table = table.dropna(subset=SEGMENT_COLUMNS).reset_index(drop=True)
+        return add_derived_metrics(table)
+
+    def segment_moments(self):
+        """Price per unit moments per segment, as :func:`qvi.significance.segment_moments`."""
+        segmented = self.cells.dropna(subset=SEGMENT_COLUMNS)
+        sums = (segmented.groupby(SEGMENT_COLUMNS, observed=True)[['TRANSACTIONS', 'PRICE_SUM', 'PRICE_SQUARES']]
+                .sum())
+        counts = sums['TRANSACTIONS'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums['PRICE_SUM'].to_numpy() / counts
+            variances = (sums['PRICE_SQUARES'].to_numpy() - sums['PRICE_SUM'].to_numpy() * means) / (counts - 1)
+        table = sums.index.to_frame(index=False)
+        table['N'] = counts
+        table['MEAN'] = means + self.price_shift
+        table['VAR'] = variances
+        return table[table['N'] > 0].reset_index(drop=True)
+
+    def ttest(self, **kwargs):
+        """Table 7: the section VII.E Welch test from the cube's moments."""
+        from qvi.significance import price_per_unit_ttest
+
+        return price_per_unit_ttest(None, moments=self.segment_moments(), **kwargs)
+
+    def affinities(self, dimension):
+        """Section VIII affinities of every segment to ``dimension``."""
+        return segment_affinities(self.cells, dimension, quantity='TOTAL_QTY')
+
+    def affinity(self, dimension, lifestage, premium_customer):
+        """Tables 8/9: affinity of one segment to ``BRAND`` or ``PACK_SIZE``."""
+        return select_segment(self.affinities(dimension), lifestage, premium_customer)
+
+    def save(self, root):
+        """Write the cube to the directory ``root``."""
+        os.makedirs(root, exist_ok=True)
+        write_frame(self.cells, os.path.join(root, 'cells' + columnar_extension()))
+        write_frame(self.customers, os.path.join(root, 'customers' + columnar_extension()))
+        np.save(os.path.join(root, 'activity.npy'), self.activity)
+        with open(os.path.join(root, 'cube.json'), 'w', encoding='utf-8') as handle:
+            json.dump({'version': CUBE_VERSION, 'cells': len(self.cells), 'price_shift': self.price_shift,
+                       'first_month': str(self.periods[0]) if len(self.periods) else None,
+                       'months': len(self.periods)}, handle, indent=2)
+
+    @classmethod
+    def load(cls, root):
+        """Read a cube written by :meth:`save`."""
+        with open(os.path.join(root, 'cube.json'), encoding='utf-8') as handle:
+            meta = json.load(handle)
+        if meta.get('version') != CUBE_VERSION:
+            raise ValueError(f"Cube {root} has an unsupported version")
+        cells = read_frame(os.path.join(root, 'cells' + columnar_extension()))
+        cells['DATE'] = convert_excel_dates(cells['DATE'])
+        customers = read_frame(os.path.join(root, 'customers' + columnar_extension()))
+        if meta['months']:
+            periods = pd.period_range(meta['first_month'], periods=meta['months'], freq='M')
+        else:
+            periods = pd.PeriodIndex([], freq='M')
+        return cls(cells, customers, np.load(os.path.join(root, 'activity.npy')), periods, meta['price_shift'])
+
+
+def check_tables(cube, merged_data):
+    """Compare the cube's Tables 3-9 with the row-level pipeline on ``merged_data``.
+
+    Returns a dict of table name -> True when identical (floats up to 1e-9).
+    """
+    from qvi import pipeline
+    from qvi.significance import segment_moments
+
+    expected = {
+        'segment_table': pipeline.segmentation_stage(merged_data),
+        'moments': segment_moments(merged_data),
+        'BRAND': segment_affinities(merged_data, 'BRAND'),
+        'PACK_SIZE': segment_affinities(merged_data, 'PACK_SIZE'),
+    }
+    actual = {
+        'segment_table': cube.segment_table(),
+        'moments': cube.segment_moments(),
+        'BRAND': cube.affinities('BRAND'),
+        'PACK_SIZE': cube.affinities('PACK_SIZE'),
+    }
+    parity = {}
+    for name, table in expected.items():
+        try:
+            pd.testing.assert_frame_equal(actual[name], table, check_dtype=False, check_names=False,
+                                          check_index_type=False, check_categorical=False, rtol=1e-9)
+            parity[name] = True
+        except AssertionError:
+            parity[name] = False
+    expected_ttest = pipeline.significance_stage(merged_data)
+    actual_ttest = cube.ttest()
+    parity['ttest'] = (expected_ttest is None) == (actual_ttest is None) and (
+        expected_ttest is None or all(np.isclose(actual_ttest[key], value, rtol=1e-9, atol=0)
+                                      for key, value in expected_ttest.items()))
+    return parity
+
+
+def _parse_where(items):
+    where = {}
+    for item in items:
+        name, _, value = item.partition('=')
+        if not value:
+            raise ValueError(f"Expected DIMENSION=VALUE, got {item!r}")
+        where.setdefault(name, []).append(int(value) if value.lstrip('-').isdigit() else value)
+    return where
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the QVI cube and answer roll-up and slice queries.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="aggregate the cleaned transactions into a cube")
+    build.add_argument('cube')
+    build.add_argument('--transactions', default=TRANSACTION_FILE)
+    build.add_argument('--customers', default=CUSTOMER_FILE)
+    build.add_argument('--check', action='store_true', help="compare Tables 3-9 with the row-level pipeline")
+    query = commands.add_parser('query', help="roll up a slice of the cube")
+    query.add_argument('cube')
+    query.add_argument('--by', nargs='*', default=[])
+    query.add_argument('--where', nargs='*', default=[], metavar='DIMENSION=VALUE')
+    query.add_argument('--month', type=int, nargs='+', default=None)
+    query.add_argument('--start', default=None)
+    query.add_argument('--end', default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        from qvi import pipeline
+
+        transaction_data, customer_data = pipeline.load_stage(args.transactions, args.customers)
+        transaction_data = pipeline.feature_stage(pipeline.clean_stage(transaction_data))
+        merged_data = pipeline.merge_stage(transaction_data, customer_data)
+        cube = build_cube(merged_data)
+        cube.save(args.cube)
+        print(f"Cube of {len(merged_data)} transactions: {len(cube)} cells, "
+              f"{len(cube.customers)} customers over {len(cube.periods)} months, written to {args.cube}")
+        if args.check:
+            print("\nTables 3-9 against the row-level pipeline:")
+            for name, same in check_tables(cube, merged_data).items():
+                print(f"  {name}: {'identical' if same else 'DIFFERENT'}")
+        return
+
+    cube = Cube.load(args.cube)
+    where = _parse_where(args.where)
+    if args.month:
+        where['MONTH'] = args.month
+    table = cube.query(args.by, where, args.start, args.end)
+    print(table.sort_values('SALES', ascending=False).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""Customer-level feature store derived from the cleaned transactions.
+
+Every loyalty card gets its spend, visits, units, average price per unit,
+favourite brand and pack size, first and last purchase date and its
+recency/frequency/monetary (RFM) scores.  The features of a batch of
+transactions are computed in one grouped pass: the rows are sorted by card
+once and every measure is a segmented reduction (``np.add.reduceat`` etc.)
+over that order.
+
+The store keeps one row per card, sorted by card number, in a columnar file
+plus the per-card unit counts of every brand and pack size the favourites are
+derived from.  A new day of transactions is reduced to the same partial
+measures and combined with the stored ones, so a refresh costs in proportion
+to the new rows and the number of cards, never the history.  Lookups go
+through a :class:`qvi.lookup.CardIndex` on the sorted cards.
+
+Outlier cards are detected over every absorbed day from per-card outlier
+statistics kept next to the features; a card flagged in a later batch is
+removed from the stored features and unit counts, as in a full recompute.
+
+Usage::
+
+    python -m qvi.customer_features STORE_DIR transactions.csv QVI_purchase_behaviour.csv --card 1000
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from qvi.cleaning import clean_transactions
+from qvi.loader import (CUSTOMER_FILE, columnar_extension, convert_excel_dates, load_customers,
+                        read_frame, write_frame)
+from qvi.lookup import CardIndex, CustomerIndex
+from qvi.outliers import refresh_outliers
+from qvi.segments import SEGMENT_COLUMNS
+from qvi.streaming import iter_transaction_chunks
+
+FEATURE_STORE_VERSION = 2
+
+# Additive per-card measures, and how partial values of the same card combine
+CARD_MEASURES = {
+    'TRANSACTIONS': 'sum',
+    'VISITS': 'sum',
+    'UNITS': 'sum',
+    'SALES': 'sum',
+    'FIRST_DATE': 'min',
+    'LAST_DATE': 'max',
+}
+
+# Product columns with a favourite value per card
+FAVOURITE_COLUMNS = {'BRAND': 'FAVOURITE_BRAND', 'PACK_SIZE': 'FAVOURITE_PACK_SIZE'}
+
+# Number of RFM score levels (quantile bins)
+RFM_LEVELS = 5
+
+
+def _group_bounds(keys):
+    """Start of every run of equal values in the sorted ``keys``."""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def card_measures(transactions):
+    """Per-card :data:`CARD_MEASURES` of ``transactions``, one row per card, sorted by card.
+
+    One stable sort by card, then one segmented reduction per measure.
+    ``VISITS`` counts distinct ``TXN_ID`` values: a transaction never spans
+    days, so visit counts of disjoint days add up.
+    """
+    cards = transactions['LYLTY_CARD_NBR'].to_numpy().astype(np.int64)
+    order = np.argsort(cards, kind='stable')
+    cards = cards[order]
+    if not len(cards):
+        frame = pd.DataFrame({'LYLTY_CARD_NBR': cards, **{column: [] for column in CARD_MEASURES}})
+        return frame.astype({'FIRST_DATE': 'datetime64[ns]', 'LAST_DATE': 'datetime64[ns]'})
+    starts = _group_bounds(cards)
+    dates = transactions['DATE'].to_numpy().astype('datetime64[ns]')[order].view(np.int64)
+    txn_ids = transactions['TXN_ID'].to_numpy().astype(np.int64)[order]
+    # Distinct (card, TXN_ID) pairs: the first row of each run in (card, TXN_ID) order
+    txn_order = np.lexsort((txn_ids, cards))
+    new_visit = np.r_[True, (cards[txn_order][1:] != cards[txn_order][:-1])
+                      | (txn_ids[txn_order][1:] != txn_ids[txn_order][:-1])]
+    return pd.DataFrame({
+        'LYLTY_CARD_NBR': cards[starts],
+        'TRANSACTIONS': np.diff(np.r_[starts, len(cards)]),
+        'VISITS': np.add.reduceat(new_visit.astype(np.int64), starts),
+        'UNITS': np.add.reduceat(transactions['PROD_QTY'].to_numpy().astype(np.int64)[order], starts),
+        'SALES': np.add.reduceat(transactions['TOT_SALES'].to_numpy()[order], starts),
+        'FIRST_DATE': np.minimum.reduceat(dates, starts).view('datetime64[ns]'),
+        'LAST_DATE': np.maximum.reduceat(dates, starts).view('datetime64[ns]'),
+    })
+
+
+def card_product_units(transactions, column):
+    """Units bought by every card of every ``column`` value (``LYLTY_CARD_NBR``, ``column``, ``UNITS``)."""
+    units = (transactions.groupby(['LYLTY_CARD_NBR', column], observed=True, sort=False)['PROD_QTY']
+             .sum().astype('int64').rename('UNITS').reset_index())
+    if isinstance(units[column].dtype, pd.CategoricalDtype):
+        units[column] = units[column].astype(str)
+    return units
+
+
+def combine_card_measures(partials):
+    """Combine per-card measures of disjoint batches (e.g. stored and new days)."""
+    combined = pd.concat(partials, ignore_index=True)
+    return combined.groupby('LYLTY_CARD_NBR', sort=True).agg(CARD_MEASURES).reset_index()
+
+
+def combine_product_units(partials, column):
+    """Add up per-card product units of disjoint batches."""
+    combined = pd.concat(partials, ignore_index=True)
+    return combined.groupby(['LYLTY_CARD_NBR', column], sort=False)['UNITS'].sum().reset_index()
+
+
+def favourites(units, column):
+    """The ``column`` value each card bought most units of (ties go to the smallest value)."""
+    ranked = units.sort_values(['LYLTY_CARD_NBR', 'UNITS', column], ascending=[True, False, True])
+    return ranked.drop_duplicates('LYLTY_CARD_NBR').set_index('LYLTY_CARD_NBR')[column]
+
+
+def _score(values, higher_is_better=True):
+    """Quantile score 1..RFM_LEVELS of ``values`` (ties broken by order, so bins are equal-sized)."""
+    if not len(values):
+        return np.empty(0, dtype=np.int8)
+    ranks = values.rank(method='first', ascending=higher_is_better).to_numpy()
+    return np.ceil(ranks * RFM_LEVELS / len(values)).astype(np.int8)
+
+
+def rfm_scores(features, as_of=None):
+    """Recency (days since the last purchase, as of ``as_of``) and the R, F and M scores.
+
+    ``as_of`` defaults to the last purchase date of all cards.  Frequency is
+    the number of visits and monetary value the total spend; 5 is the best
+    score of each.
+    """
+    as_of = features['LAST_DATE'].max() if as_of is None else pd.Timestamp(as_of)
+    recency = (as_of - features['LAST_DATE']).dt.days.astype('int64')
+    scores = pd.DataFrame({
+        'RECENCY_DAYS': recency,
+        'R_SCORE': _score(recency, higher_is_better=False),
+        'F_SCORE': _score(features['VISITS']),
+        'M_SCORE': _score(features['SALES']),
+    }, index=features.index)
+    scores['RFM_SCORE'] = (scores['R_SCORE'].astype(np.int16) * 100 + scores['F_SCORE'] * 10
+                           + scores['M_SCORE'])
+    return scores
+
+
+def build_features(measures, product_units, customer_data=None, as_of=None):
+    """Assemble the feature table from combined measures and product units.
+
+    ``product_units`` maps each :data:`FAVOURITE_COLUMNS` key to its
+    per-card units.  Segments are attached from ``customer_data`` when given.
+    """
+    features = measures.copy()
+    features['SALES'] = features['SALES'].round(2)
+    features['AVG_PRICE_PER_UNIT'] = features['SALES'] / features['UNITS'].where(features['UNITS'] > 0)
+    cards = features['LYLTY_CARD_NBR']
+    for column, favourite in FAVOURITE_COLUMNS.items():
+        features[favourite] = favourites(product_units[column], column).reindex(cards).to_numpy()
+    features = pd.concat([features, rfm_scores(features, as_of)], axis=1)
+    if customer_data is not None:
+        segments = CustomerIndex(customer_data).segment_columns(cards.to_numpy())
+        for position, column in enumerate(SEGMENT_COLUMNS):
+            features.insert(1 + position, column, segments[column])
+    return features
+
+
+def customer_features(transactions, customer_data=None, as_of=None):
+    """Feature table of every card in the cleaned ``transactions`` (with ``BRAND`` and ``PACK_SIZE``)."""
+    return build_features(card_measures(transactions),
+                          {column: card_product_units(transactions, column) for column in FAVOURITE_COLUMNS},
+                          customer_data, as_of)
+
+
+class CustomerFeatureStore:
+    """On-disk customer feature table, refreshed one batch of new days at a time."""
+
+    def __init__(self, root):
+        self.root = root
+        self._manifest_path = os.path.join(root, 'manifest.json')
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding='utf-8') as handle:
+                self._manifest = json.load(handle)
+            if self._manifest.get('version') != FEATURE_STORE_VERSION:
+                raise ValueError(f"Customer feature store {root} has an unsupported version")
+        else:
+            self._manifest = {'version': FEATURE_STORE_VERSION, 'dates': [], 'excluded': []}
+        self._features = None
+        self._index = None
+
+    @property
+    def dates(self):
+        """Sorted list of the dates (``YYYY-MM-DD``) already in the store."""
+        return sorted(self._manifest['dates'])
+
+    def _path(self, name):
+        return os.path.join(self.root, name + columnar_extension())
+
+    def _read(self, name):
+        path = self._path(name)
+        return read_frame(path) if os.path.exists(path) else None
+
+    def features(self):
+        """The feature table, one row per card sorted by card number."""
+        if self._features is None:
+            features = self._read('features')
+            if features is not None:
+                for column in ('FIRST_DATE', 'LAST_DATE'):
+                    features[column] = convert_excel_dates(features[column])
+            self._features = features
+        return self._features
+
+    def lookup(self, cards):
+        """Feature rows of ``cards``, in order; unknown cards are left out."""
+        features = self.features()
+        if features is None:
+            return pd.DataFrame()
+        if self._index is None:
+            self._index = CardIndex(features['LYLTY_CARD_NBR'].to_numpy())
+        positions = self._index.positions(np.atleast_1d(cards))
+        return features.iloc[positions[positions >= 0]]
+
+    def absorb(self, transactions, customer_data=None, outlier_rules=None):
+        """Refresh the features with cleaned ``transactions`` of new days; return those days.
+
+        ``transactions`` still hold the outlier cards: they are detected here
+        with ``outlier_rules`` over every absorbed day.  Days that are already
+        stored raise a ``ValueError``, as the additive measures would count
+        them twice.
+        """
+        days = transactions['DATE'].dt.strftime('%Y-%m-%d')
+        already_stored = sorted(set(days.unique()) & set(self._manifest['dates']))
+        if already_stored:
+            raise ValueError(f"Dates already in the customer feature store: {', '.join(already_stored)}")
+        if transactions.empty:
+            return []
+
+        statistics = self._read('card_statistics')
+        if statistics is not None:
+            statistics = statistics.set_index('LYLTY_CARD_NBR')
+        statistics, excluded = refresh_outliers(statistics, transactions, self._manifest['excluded'],
+                                                outlier_rules)
+        transactions = transactions[~transactions['LYLTY_CARD_NBR'].isin(excluded)]
+
+        measures = [card_measures(transactions)]
+        stored = self.features()
+        if stored is not None:
+            measures.insert(0, stored[['LYLTY_CARD_NBR'] + list(CARD_MEASURES)])
+        measures = combine_card_measures(measures)
+        measures = measures[~measures['LYLTY_CARD_NBR'].isin(excluded)].reset_index(drop=True)
+        product_units = {}
+        for column in FAVOURITE_COLUMNS:
+            partials = [card_product_units(transactions, column)]
+            stored_units = self._read(f'units_{column.lower()}')
+            if stored_units is not None:
+                partials.insert(0, stored_units)
+            units = combine_product_units(partials, column)
+            product_units[column] = units[~units['LYLTY_CARD_NBR'].isin(excluded)]
+        features = build_features(measures, product_units, customer_data)
+
+        write_frame(features, self._path('features'))
+        for column, units in product_units.items():
+            write_frame(units, self._path(f'units_{column.lower()}'))
+        write_frame(statistics.reset_index(), self._path('card_statistics'))
+        new_days = sorted(days.unique())
+        self._manifest['dates'] = sorted(set(self._manifest['dates']) | set(new_days))
+        self._manifest['excluded'] = excluded.tolist()
+        with open(self._manifest_path, 'w', encoding='utf-8') as handle:
+            json.dump(self._manifest, handle, indent=2)
+        self._features, self._index = None, None
+        return new_days
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the customer feature store with new days of "
+                                                 "transactions and look up cards.")
+    parser.add_argument('store')
+    parser.add_argument('transactions', nargs='?', default=None,
+                        help="new transactions to absorb (omit to only look up cards)")
+    parser.add_argument('customers', nargs='?', default=CUSTOMER_FILE)
+    parser.add_argument('--card', type=int, nargs='+', default=None, help="print the features of these cards")
+    args = parser.parse_args(argv)
+
+    store = CustomerFeatureStore(args.store)
+    if args.transactions is not None:
+        # Outlier cards are detected by the store over every absorbed day, not per batch
+        transaction_data = clean_transactions(pd.concat(iter_transaction_chunks(args.transactions),
+                                                        ignore_index=True), outlier_customer_ids=[])
+        transaction_data = transaction_data[~transaction_data['DATE'].dt.strftime('%Y-%m-%d').isin(store.dates)]
+        new_days = store.absorb(transaction_data, load_customers(args.customers))
+        features = store.features()
+        print(f"Absorbed {len(new_days)} new day(s); the store now holds {len(store.dates)} day(s) "
+              f"and {0 if features is None else len(features)} customer(s).")
+    if args.card:
+        print(store.lookup(args.card).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Loading of the raw QVI data files.
+
+Parsing ``QVI_transaction_data.xlsx`` with openpyxl is by far the slowest step
+of the pipeline, so the transaction sheet is converted once into a typed
+columnar cache (Parquet when pyarrow is available, pickle otherwise).  The
+cache is keyed by the size, mtime and SHA-256 hash of the source workbook and
+already holds the converted ``DATE`` column and the schema dtypes, so
+later runs only pay for reading the columnar file.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from qvi.schema import CUSTOMER_SCHEMA, TRANSACTION_SCHEMA, apply_schema
+
+TRANSACTION_FILE = "QVI_transaction_data.xlsx"
+CUSTOMER_FILE = "QVI_purchase_behaviour.csv"
+TRANSACTION_SHEET = 'in'
+DEFAULT_CACHE_DIR = ".qvi_cache"
+
+# Excel stores dates as the number of days since 1899-12-30
+EXCEL_EPOCH = '1899-12-30'
+
+# Bump this whenever the cached layout changes so stale caches are rebuilt
+CACHE_VERSION = 3
+
+# Canonical resolution of the DATE column, identical for fresh and cached loads
+DATE_DTYPE = TRANSACTION_SCHEMA['DATE']
+
+
+def convert_excel_dates(dates):
+    """Convert Excel serial day numbers to datetimes.
+
+    Columns that are already datetimes (e.g. loaded from the cache) are
+    returned unchanged, so the conversion is safe to call twice.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.astype(DATE_DTYPE)
+    return pd.to_datetime(dates, origin=EXCEL_EPOCH, unit='D').astype(DATE_DTYPE)
+
+
+def file_fingerprint(path, with_hash=True):
+    """Return the size, mtime and (optionally) SHA-256 hash of ``path``."""
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def columnar_extension():
+    """File extension of the columnar format used for cached frames."""
+    return '.parquet' if _parquet_available() else '.pkl'
+
+
+def write_frame(frame, path):
+    """Atomically write ``frame`` to ``path`` (Parquet or pickle, by extension)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    if path.endswith('.parquet'):
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_frame(path):
+    """Read a frame written by :func:`write_frame`."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def _cache_paths(path, sheet, cache_dir):
+    stem = f"{os.path.splitext(os.path.basename(path))[0]}.{sheet}"
+    data_ext = columnar_extension()
+    return (os.path.join(cache_dir, stem + '.json'),
+            os.path.join(cache_dir, stem + data_ext))
+
+
+def source_fingerprint(path, known=None):
+    """Fingerprint of ``path`` with its SHA-256 hash, reusing the ``known`` one when still current.
+
+    Size and mtime are checked first; the file is only hashed when they
+    differ from ``known`` (a fingerprint recorded earlier), so an untouched
+    file is fingerprinted without reading it.
+    """
+    current = file_fingerprint(path, with_hash=False)
+    if (known is not None and 'sha256' in known and current['size'] == known['size']
+            and current['mtime_ns'] == known['mtime_ns']):
+        return known
+    return file_fingerprint(path)
+
+
+def recorded_fingerprint(path, record_path):
+    """:func:`source_fingerprint` of ``path``, kept between runs in the JSON file ``record_path``.
+
+    The record maps absolute paths to fingerprints, so one file serves every
+    input fingerprinted through it.
+    """
+    record = _read_manifest(record_path) or {}
+    key = os.path.abspath(path)
+    fingerprint = source_fingerprint(path, record.get(key))
+    if fingerprint is not record.get(key):
+        record[key] = fingerprint
+        os.makedirs(os.path.dirname(record_path) or '.', exist_ok=True)
+        with open(record_path + '.tmp', 'w', encoding='utf-8') as handle:
+            json.dump(record, handle, indent=2)
+        os.replace(record_path + '.tmp', record_path)
+    return fingerprint
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_is_valid(manifest, manifest_path, path, data_path):
+    """Check a cache manifest against the current source file.
+
+    Size and mtime are checked first; the hash is only recomputed when the
+    mtime changed (e.g. after a fresh checkout), so an untouched workbook is
+    validated without reading it.  A matching hash refreshes the stored mtime.
+    """
+    if manifest is None or manifest.get('version') != CACHE_VERSION:
+        return False
+    if not os.path.exists(data_path):
+        return False
+    source = manifest['source']
+    if file_fingerprint(path, with_hash=False)['size'] != source['size']:
+        return False
+    fingerprint = source_fingerprint(path, source)
+    if fingerprint is source:
+        return True
+    if fingerprint['sha256'] != source['sha256']:
+        return False
+    manifest['source'] = fingerprint
+    with open(manifest_path, 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+    return True
+
+
+def prepare_transactions(transaction_data):
+    """Apply the typed layout stored in the cache to a freshly parsed sheet."""
+    transaction_data = transaction_data.assign(DATE=convert_excel_dates(transaction_data['DATE']))
+    return apply_schema(transaction_data, TRANSACTION_SCHEMA)
+
+
+def _write_cache(transaction_data, path, manifest_path, data_path):
+    write_frame(transaction_data, data_path)
+    manifest = {'version': CACHE_VERSION, 'source': file_fingerprint(path),
+                'rows': len(transaction_data)}
+    with open(manifest_path, 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+
+
+def _read_cache(data_path):
+    transaction_data = read_frame(data_path)
+    # Parquet may store timestamps at a coarser resolution
+    transaction_data['DATE'] = convert_excel_dates(transaction_data['DATE'])
+    return transaction_data
+
+
+def load_transactions(path=TRANSACTION_FILE, sheet=TRANSACTION_SHEET,
+                      cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+    """Load the transaction sheet, reusing the columnar cache when possible.
+
+    The returned frame already has ``DATE`` converted to datetimes and follows
+    :data:`qvi.schema.TRANSACTION_SCHEMA` (categorical ``PROD_NAME``, narrow
+    integer columns).  Pass ``use_cache=False`` to always
+    parse the workbook (the cache is then neither read nor written).
+    Parquet and CSV extracts (e.g. from :mod:`qvi.synthetic`) are read
+    directly, without a cache.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return prepare_transactions(pd.read_parquet(path))
+    if extension == '.csv':
+        return prepare_transactions(pd.read_csv(path))
+    if not use_cache:
+        return prepare_transactions(pd.read_excel(path, sheet_name=sheet))
+
+    manifest_path, data_path = _cache_paths(path, sheet, cache_dir)
+    if _cache_is_valid(_read_manifest(manifest_path), manifest_path, path, data_path):
+        return _read_cache(data_path)
+
+    transaction_data = prepare_transactions(pd.read_excel(path, sheet_name=sheet))
+    _write_cache(transaction_data, path, manifest_path, data_path)
+    return transaction_data
+
+
+def load_customers(path=CUSTOMER_FILE):
+    """Load the customer purchase behaviour file with :data:`qvi.schema.CUSTOMER_SCHEMA`."""
+    return pd.read_csv(path, dtype=CUSTOMER_SCHEMA)
@@ -0,0 +1,186 @@
+"""Localized labels, titles and console text of the analysis report.
+
+Every user-facing string of the report is looked up here by key, so one set
+of computed results can be rendered in any of the ``LOCALES``.
+"""
+MESSAGES = {
+    'en': {
+        # Console text
+        'transactions_info': "--- Initial Information of Transaction Data ---",
+        'transactions_head': "\n--- First 5 rows of Transaction Data ---",
+        'customers_info': "\n--- Initial Information of Customer Data ---",
+        'customers_head': "\n--- First 5 rows of Customer Data ---",
+        'converting_date': "\n--- Converting DATE column ---",
+        'date_dtype': "Data type of DATE column after conversion: {dtype}",
+        'analyzing_prod_name': "\n--- Analyzing PROD_NAME ---",
+        'product_counts': "Some product names and their counts:",
+        'distinct_products': "Number of distinct products: {count}",
+        'salsa_found': "\nNumber of salsa products found: {count}",
+        'rows_after_salsa': "Number of transactions remaining after removing salsa: {count}",
+        'summary_before_outliers': "\n--- Initial summary statistics (before outlier handling) ---",
+        'outlier_audit': "\nLoyalty cards flagged as outliers (per-card statistics and the rules that fired):",
+        'outlier_transactions': "\nTransactions for customer LYLTY_CARD_NBR = {customer}:",
+        'rows_after_outliers': "\nNumber of transactions remaining after removing {customers} outlier customer(s): {count}",
+        'table_1': "\n--- Table 1: Summary Statistics of Transaction Data (After Outlier Removal) ---",
+        'trends_over_time': "\n--- Transaction trends over time ---",
+        'days_with_transactions': "Number of days with transactions: {count}",
+        'missing_days': "\nDays with no transactions (e.g., Christmas):",
+        'feature_engineering': "\n--- Feature Engineering ---",
+        'pack_size_examples': "A few examples of extracted PACK_SIZE:",
+        'pack_size_distribution': "\nDistribution of PACK_SIZE:",
+        'table_2': "\n--- Table 2: Cleaned Brand Distribution ---",
+        'exploring_customers': "\n--- Exploring Customer Data ---",
+        'customer_information': "Customer data information:",
+        'customer_summary': "\nCustomer data summary statistics:",
+        'lifestage_distribution': "\nLIFESTAGE distribution:",
+        'premium_distribution': "\nPREMIUM_CUSTOMER distribution:",
+        'merging': "\n--- Merging Data ---",
+        'transaction_rows': "Number of rows in transaction data: {count}",
+        'merged_rows': "Number of rows in merged data: {count}",
+        'merged_memory': "\nMemory usage of merged data by column (bytes):",
+        'memory_saved': "Memory saved by the compact schema: {saved_mb:.1f} MB ({ratio:.1f}x smaller)",
+        'memory_wide': "TOT_SALES is kept as float64 so the sales sums stay exact: "
+                       "{wide_bytes:,} bytes more than float32",
+        'unmatched_cards': "Transactions whose card is not in the customer data: {rows} rows from {cards} cards",
+        'merge_ok': "Merge successful, no transactions missing customer information.",
+        'merge_warning': "Warning: Some transactions are missing customer information after merge.",
+        'segmentation': "\n--- Customer Segmentation Analysis ---",
+        'table_3': "\n--- Table 3: Total Sales by LIFESTAGE and PREMIUM_CUSTOMER (Top 10) ---",
+        'table_4': "\n--- Table 4: Number of Customers by LIFESTAGE and PREMIUM_CUSTOMER (Top 10) ---",
+        'table_5': "\n--- Table 5: Average Units per Customer by Segment (Top 10) ---",
+        'table_6': "\n--- Table 6: Average Price per Unit by Segment (Top 10) ---",
+        'table_7': "\n--- Table 7: T-test Results for Price Per Unit ---",
+        'ttest_comparison': "Comparison: Mainstream (Young/Midage Singles/Couples) vs. "
+                            "Budget/Premium (Young/Midage Singles/Couples)",
+        'ttest_mean_group': "Avg Price (Mainstream): {mean:.4f}",
+        'ttest_mean_other': "Avg Price (Budget/Premium): {mean:.4f}",
+        'ttest_significant': "Conclusion: There is statistical evidence that the Mainstream group pays a "
+                             "significantly higher price per unit.",
+        'ttest_not_significant': "Conclusion: There is not enough statistical evidence that the Mainstream "
+                                 "group pays a significantly higher price per unit.",
+        'ttest_no_data': "\nNot enough data to perform T-test for the selected groups.",
+        'deep_dive': "\n--- Deep Dive: {premium}, {lifestage} ---",
+        'table_8': "\n--- Table 8: Brand Affinity of '{premium}, {lifestage}' Segment (Top 10) ---",
+        'table_9': "\n--- Table 9: Pack Size Preference of '{premium}, {lifestage}' Segment (Top 10) ---",
+        'pack_size_brands': "\nProducts with {pack_size}g pack size: {brands}",
+        'top_pack_size_brands': "\nProducts with highest affinity pack size ({pack_size}g): {brands}",
+        'deep_dive_no_data': "\nNot enough data in the target segment or the other segments to perform "
+                             "deep dive analysis.",
+        'analysis_complete': "\n--- Analysis complete. Please refer to the report for detailed conclusions. ---",
+        # Figure labels
+        'date': 'Date',
+        'number_of_transactions': 'Number of Transactions',
+        'transactions_over_time_title': 'Number of Transactions Over Time (Overview)',
+        'transactions_december_title': 'Number of Transactions in December',
+        'pack_size_title': 'Distribution of Pack Size (PACK_SIZE)',
+        'pack_size_label': 'Pack Size (g)',
+        'frequency': 'Frequency',
+        'premium_segment': 'Premium Customer Segment',
+        'lifestage': 'Lifestage',
+        'customer_segment': 'Customer Segment',
+        'total_sales_label': 'Total Sales ($)',
+        'sales_title': 'Total Sales by LIFESTAGE and PREMIUM_CUSTOMER',
+        'customers_label': 'Number of Customers',
+        'customers_title': 'Number of Customers by LIFESTAGE and PREMIUM_CUSTOMER',
+        'avg_units_label': 'Avg. Units / Customer',
+        'avg_units_title': 'Average Units per Customer by Segment',
+        'avg_price_label': 'Avg. Price / Unit ($)',
+        'avg_price_title': 'Average Price per Unit by Segment',
+    },
+    'vi': {
+        # Console text
+        'transactions_info': "--- Thông tin ban đầu của dữ liệu giao dịch ---",
+        'transactions_head': "\n--- 5 dòng đầu của dữ liệu giao dịch ---",
+        'customers_info': "\n--- Thông tin ban đầu của dữ liệu khách hàng ---",
+        'customers_head': "\n--- 5 dòng đầu của dữ liệu khách hàng ---",
+        'converting_date': "\n--- Chuyển đổi cột DATE ---",
+        'date_dtype': "Kiểu dữ liệu cột DATE sau chuyển đổi: {dtype}",
+        'analyzing_prod_name': "\n--- Phân tích PROD_NAME ---",
+        'product_counts': "Một số tên sản phẩm và số lượng:",
+        'distinct_products': "Số lượng sản phẩm riêng biệt: {count}",
+        'salsa_found': "\nSố lượng sản phẩm salsa tìm thấy: {count}",
+        'rows_after_salsa': "Số lượng giao dịch còn lại sau khi loại bỏ salsa: {count}",
+        'summary_before_outliers': "\n--- Thống kê tóm tắt ban đầu (trước khi xử lý ngoại lệ) ---",
+        'outlier_audit': "\nCác thẻ khách hàng thân thiết bị đánh dấu là ngoại lệ (thống kê theo thẻ và quy tắc đã kích hoạt):",
+        'outlier_transactions': "\nCác giao dịch của khách hàng LYLTY_CARD_NBR = {customer}:",
+        'rows_after_outliers': "\nSố lượng giao dịch còn lại sau khi loại bỏ {customers} khách hàng ngoại lệ: {count}",
+        'table_1': "\n--- Bảng 1: Thống Kê Tóm Tắt Dữ Liệu Giao Dịch (Sau Khi Loại Bỏ Ngoại Lệ) ---",
+        'trends_over_time': "\n--- Xu hướng giao dịch theo thời gian ---",
+        'days_with_transactions': "Số ngày có giao dịch: {count}",
+        'missing_days': "\nNgày không có giao dịch (ví dụ: Giáng Sinh):",
+        'feature_engineering': "\n--- Kỹ thuật tạo đặc trưng ---",
+        'pack_size_examples': "Một vài ví dụ về PACK_SIZE được trích xuất:",
+        'pack_size_distribution': "\nPhân phối PACK_SIZE:",
+        'table_2': "\n--- Bảng 2: Phân Phối Thương Hiệu Đã Được Làm Sạch ---",
+        'exploring_customers': "\n--- Thăm dò dữ liệu khách hàng ---",
+        'customer_information': "Thông tin dữ liệu khách hàng:",
+        'customer_summary': "\nThống kê tóm tắt dữ liệu khách hàng:",
+        'lifestage_distribution': "\nPhân phối LIFESTAGE:",
+        'premium_distribution': "\nPhân phối PREMIUM_CUSTOMER:",
+        'merging': "\n--- Hợp nhất dữ liệu ---",
+        'transaction_rows': "Số hàng trong dữ liệu giao dịch: {count}",
+        'merged_rows': "Số hàng trong dữ liệu đã hợp nhất: {count}",
+        'merged_memory': "\nBộ nhớ sử dụng của dữ liệu đã hợp nhất theo cột (byte):",
+        'memory_saved': "Bộ nhớ tiết kiệm được nhờ lược đồ gọn: {saved_mb:.1f} MB (nhỏ hơn {ratio:.1f} lần)",
+        'memory_wide': "TOT_SALES được giữ ở float64 để tổng doanh số chính xác: "
+                       "nhiều hơn float32 {wide_bytes:,} byte",
+        'unmatched_cards': "Giao dịch có thẻ không có trong dữ liệu khách hàng: {rows} dòng từ {cards} thẻ",
+        'merge_ok': "Hợp nhất thành công, không có giao dịch nào thiếu thông tin khách hàng.",
+        'merge_warning': "Cảnh báo: Có giao dịch thiếu thông tin khách hàng sau khi hợp nhất.",
+        'segmentation': "\n--- Phân tích phân khúc khách hàng ---",
+        'table_3': "\n--- Bảng 3: Tổng Doanh Số theo LIFESTAGE và PREMIUM_CUSTOMER (Top 10) ---",
+        'table_4': "\n--- Bảng 4: Số Lượng Khách Hàng theo LIFESTAGE và PREMIUM_CUSTOMER (Top 10) ---",
+        'table_5': "\n--- Bảng 5: Số Lượng Đơn Vị Trung Bình trên Mỗi Khách Hàng theo Phân Khúc (Top 10) ---",
+        'table_6': "\n--- Bảng 6: Giá Trung Bình trên Mỗi Đơn Vị theo Phân Khúc (Top 10) ---",
+        'table_7': "\n--- Bảng 7: Kết Quả T-test cho Giá Mỗi Đơn Vị ---",
+        'ttest_comparison': "So sánh: Mainstream (Young/Midage Singles/Couples) vs. "
+                            "Budget/Premium (Young/Midage Singles/Couples)",
+        'ttest_mean_group': "Giá TB (Mainstream): {mean:.4f}",
+        'ttest_mean_other': "Giá TB (Budget/Premium): {mean:.4f}",
+        'ttest_significant': "Kết luận: Có bằng chứng thống kê cho thấy nhóm Mainstream trả giá mỗi đơn vị "
+                             "cao hơn đáng kể.",
+        'ttest_not_significant': "Kết luận: Không có đủ bằng chứng thống kê cho thấy nhóm Mainstream trả giá "
+                                 "mỗi đơn vị cao hơn đáng kể.",
+        'ttest_no_data': "\nKhông đủ dữ liệu để thực hiện T-test cho các nhóm đã chọn.",
+        'deep_dive': "\n--- Phân tích sâu: {premium}, {lifestage} ---",
+        'table_8': "\n--- Bảng 8: Mức Độ Ưa Thích Thương Hiệu của Phân Khúc "
+                   "'{premium}, {lifestage}' (Top 10) ---",
+        'table_9': "\n--- Bảng 9: Sở Thích Kích Thước Gói của Phân Khúc "
+                   "'{premium}, {lifestage}' (Top 10) ---",
+        'pack_size_brands': "\nCác sản phẩm có kích thước gói {pack_size}g: {brands}",
+        'top_pack_size_brands': "\nCác sản phẩm có kích thước gói ưa thích nhất ({pack_size}g): {brands}",
+        'deep_dive_no_data': "\nKhông đủ dữ liệu trong phân khúc mục tiêu hoặc các phân khúc khác để thực "
+                             "hiện phân tích sâu.",
+        'analysis_complete': "\n--- Phân tích hoàn tất. Vui lòng xem báo cáo để biết kết luận chi tiết. ---",
+        # Figure labels
+        'date': 'Ngày',
+        'number_of_transactions': 'Số Lượng Giao Dịch',
+        'transactions_over_time_title': 'Số Lượng Giao Dịch Theo Thời Gian (Tổng Quan)',
+        'transactions_december_title': 'Số Lượng Giao Dịch Tháng 12',
+        'pack_size_title': 'Phân Phối Kích Thước Gói (PACK_SIZE)',
+        'pack_size_label': 'Kích Thước Gói (g)',
+        'frequency': 'Tần Suất',
+        'premium_segment': 'Phân Khúc Khách Hàng',
+        'lifestage': 'Giai Đoạn Sống',
+        'customer_segment': 'Phân Khúc KH',
+        'total_sales_label': 'Tổng Doanh Số ($)',
+        'sales_title': 'Tổng Doanh Số theo LIFESTAGE và PREMIUM_CUSTOMER',
+        'customers_label': 'Số Lượng Khách Hàng',
+        'customers_title': 'Số Lượng Khách Hàng theo LIFESTAGE và PREMIUM_CUSTOMER',
+        'avg_units_label': 'Số Lượng Đơn Vị TB / Khách Hàng',
+        'avg_units_title': 'Số Lượng Đơn Vị Trung Bình trên Mỗi Khách Hàng theo Phân Khúc',
+        'avg_price_label': 'Giá TB / Đơn Vị ($)',
+        'avg_price_title': 'Giá Trung Bình trên Mỗi Đơn Vị theo Phân Khúc',
+    },
+}
+
+LOCALES = tuple(MESSAGES)
+DEFAULT_LOCALE = 'en'
+
+
+def messages(locale=DEFAULT_LOCALE):
+    """Return the message table of ``locale``."""
+    try:
+        return MESSAGES[locale]
+    except KeyError:
+        raise ValueError(f"Unknown locale {locale!r}, expected one of {', '.join(LOCALES)}") from None
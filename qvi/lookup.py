@@ -0,0 +1,105 @@
+"""Customer lookup index for attaching segments to transactions (section VI).
+
+Instead of ``transactions.merge(customers, on='LYLTY_CARD_NBR', how='left')``,
+which hashes the keys and copies every transaction column into a new frame,
+the customer file is turned once into an index from card number to the
+integer codes of ``LIFESTAGE`` and ``PREMIUM_CUSTOMER``.  Attaching the
+segments is then one vectorized lookup per transaction that adds two
+categorical columns; the transaction columns themselves are not copied.
+
+When the card numbers are dense enough the index (:class:`CardIndex`) is a
+direct-address table (one entry per possible card number); otherwise it is
+the sorted card array, searched with ``np.searchsorted``.  Either way a card
+is found in O(1) or O(log n) without hashing.
+"""
+import numpy as np
+import pandas as pd
+
+from qvi.segments import SEGMENT_COLUMNS, _categorical
+
+# Largest direct-address table, in entries (one int32 row position per card number)
+DIRECT_ADDRESS_LIMIT = 64_000_000
+
+
+class CardIndex:
+    """Sorted card numbers and the lookup from a card number to its position among them."""
+
+    def __init__(self, cards, direct_address_limit=DIRECT_ADDRESS_LIMIT):
+        cards = np.asarray(cards).astype(np.int64)
+        # Position i of the index holds input row order[i]
+        self.order = np.argsort(cards, kind='stable')
+        self.cards = cards[self.order]
+        if len(self.cards) > 1 and not (np.diff(self.cards) > 0).all():
+            raise ValueError("Duplicate LYLTY_CARD_NBR values in a card index")
+
+        self._table = None
+        if len(self.cards):
+            self._low = int(self.cards[0])
+            span = int(self.cards[-1]) - self._low + 1
+            if span <= direct_address_limit:
+                self._table = np.full(span, -1, dtype=np.int32)
+                self._table[self.cards - self._low] = np.arange(len(self.cards), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.cards)
+
+    @property
+    def direct_address(self):
+        """Whether lookups use the direct-address table (rather than binary search)."""
+        return self._table is not None
+
+    def positions(self, cards):
+        """Position of every card of ``cards`` in :attr:`cards`; -1 where the card is unknown."""
+        cards = np.asarray(cards).astype(np.int64, copy=False)
+        if not len(self.cards):
+            return np.full(len(cards), -1, dtype=np.int64)
+        if self._table is not None:
+            offsets = cards - self._low
+            inside = (offsets >= 0) & (offsets < len(self._table))
+            return np.where(inside, self._table[np.clip(offsets, 0, len(self._table) - 1)], -1)
+        positions = np.minimum(np.searchsorted(self.cards, cards), len(self.cards) - 1)
+        return np.where(self.cards[positions] == cards, positions, -1)
+
+
+class CustomerIndex(CardIndex):
+    """Card number -> customer row, and the segment codes of every row."""
+
+    def __init__(self, customer_data, direct_address_limit=DIRECT_ADDRESS_LIMIT):
+        try:
+            super().__init__(customer_data['LYLTY_CARD_NBR'].to_numpy(), direct_address_limit)
+        except ValueError:
+            raise ValueError("The customer data has duplicate LYLTY_CARD_NBR values") from None
+        self.codes = {}
+        self.categories = {}
+        for column in SEGMENT_COLUMNS:
+            values = _categorical(customer_data[column])
+            self.codes[column] = values.cat.codes.to_numpy()[self.order]
+            self.categories[column] = values.cat.categories
+
+    def segment_columns(self, cards):
+        """``LIFESTAGE`` and ``PREMIUM_CUSTOMER`` of every card, as categoricals (NaN if unknown)."""
+        positions = self.positions(cards)
+        unknown = positions < 0
+        columns = {}
+        for column in SEGMENT_COLUMNS:
+            codes = self.codes[column][positions]
+            codes[unknown] = -1
+            columns[column] = pd.Categorical.from_codes(codes, self.categories[column])
+        return columns
+
+    def attach(self, transactions):
+        """``transactions`` with the ``LIFESTAGE`` and ``PREMIUM_CUSTOMER`` columns added.
+
+        The rows keep their order, like a left merge; unknown cards get
+        missing segments.  With pandas copy-on-write, the transaction columns
+        are shared with the input frame, not copied.
+        """
+        columns = self.segment_columns(transactions['LYLTY_CARD_NBR'].to_numpy())
+        return transactions.reset_index(drop=True).assign(**columns)
+
+    def unmatched(self, transactions):
+        """Cards of ``transactions`` missing from the customer data, with their transaction counts."""
+        cards = transactions['LYLTY_CARD_NBR'].to_numpy()
+        missing = cards[self.positions(cards) < 0]
+        missing_cards, counts = np.unique(missing, return_counts=True)
+        return pd.DataFrame({'LYLTY_CARD_NBR': missing_cards, 'TRANSACTIONS': counts})
@@ -0,0 +1,130 @@
+"""Data-driven detection of outlier loyalty cards (section III.C).
+
+The R reference analysis removed card 226000 by hand after spotting two
+transactions of 200 packets.  Here every card is summarised in one grouped
+pass (transactions, units, spend and its largest single transaction) and a
+card is flagged when one of its statistics is far outside the distribution
+of all cards.  The per-card statistics are additive (sums and maxima), so
+they can be computed chunk by chunk and combined before detection.
+"""
+import numpy as np
+import pandas as pd
+
+# Per-card statistic -> (column, aggregation) over the card's transactions
+CARD_STATISTICS = {
+    'TRANSACTIONS': ('TXN_ID', 'size'),
+    'UNITS': ('PROD_QTY', 'sum'),
+    'SALES': ('TOT_SALES', 'sum'),
+    'MAX_QTY': ('PROD_QTY', 'max'),
+    'MAX_SALES': ('TOT_SALES', 'max'),
+}
+
+# How partial statistics of the same card are combined across chunks
+COMBINE = {'TRANSACTIONS': 'sum', 'UNITS': 'sum', 'SALES': 'sum', 'MAX_QTY': 'max', 'MAX_SALES': 'max'}
+
+# Statistic -> (method, threshold).  'quantile': flag values above threshold x
+# the RULE_QUANTILE quantile of all cards.  'mad': flag values whose robust
+# z-score (x - median) / (1.4826 MAD) is above threshold.
+DEFAULT_RULES = {
+    'MAX_QTY': ('quantile', 10.0),
+    'MAX_SALES': ('quantile', 10.0),
+}
+RULE_QUANTILE = 0.99
+
+# Scale factors making MAD and mean absolute deviation consistent with the
+# standard deviation of normal data; the latter is used when MAD is 0
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def card_statistics(transactions):
+    """Statistics of every loyalty card in ``transactions``, from one groupby.
+
+    Indexed by ``LYLTY_CARD_NBR``; sums are float64 so that they can be
+    combined across chunks without overflow or float32 noise.
+    """
+    columns = {column for column, _ in CARD_STATISTICS.values()}
+    frame = transactions[['LYLTY_CARD_NBR'] + sorted(columns)].astype(
+        {'PROD_QTY': 'int64', 'TOT_SALES': 'float64'})
+    statistics = frame.groupby('LYLTY_CARD_NBR').agg(**CARD_STATISTICS)
+    return statistics.round({'SALES': 2, 'MAX_SALES': 2})
+
+
+def combine_card_statistics(partials):
+    """Combine :func:`card_statistics` of several chunks into those of all rows."""
+    partials = list(partials)
+    if len(partials) == 1:
+        return partials[0]
+    statistics = pd.concat(partials).groupby(level='LYLTY_CARD_NBR').agg(COMBINE)
+    return statistics.round({'SALES': 2})
+
+
+def robust_scale(values):
+    """Median and robust standard deviation (scaled MAD) of ``values``.
+
+    Falls back to the scaled mean absolute deviation when more than half of
+    the values equal the median, as for the packet counts where MAD is 0.
+    """
+    median = np.median(values)
+    deviations = np.abs(values - median)
+    scale = MAD_SCALE * np.median(deviations)
+    if scale == 0:
+        scale = MEAN_AD_SCALE * deviations.mean()
+    return median, scale
+
+
+def rule_thresholds(statistics, rules=None):
+    """The value above which each rule of ``rules`` flags a card."""
+    rules = DEFAULT_RULES if rules is None else rules
+    thresholds = {}
+    for name, (method, threshold) in rules.items():
+        values = statistics[name].to_numpy(dtype='float64')
+        if method == 'quantile':
+            thresholds[name] = threshold * np.quantile(values, RULE_QUANTILE)
+        elif method == 'mad':
+            median, scale = robust_scale(values)
+            thresholds[name] = median + threshold * scale
+        else:
+            raise ValueError(f"Unknown outlier rule method '{method}' for {name}")
+    return thresholds
+
+
+def detect_outliers(statistics, rules=None):
+    """Audit table of the cards flagged by ``rules`` in ``statistics``.
+
+    One row per flagged card with all its statistics and a ``RULES`` column
+    naming the rules that fired, sorted by card number.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    if statistics.empty:
+        return statistics.assign(RULES=pd.Series(dtype=object)).sort_index().reset_index()
+    fired = pd.DataFrame({name: statistics[name] > threshold
+                          for name, threshold in rule_thresholds(statistics, rules).items()},
+                         index=statistics.index)
+    flagged = fired.any(axis=1).to_numpy()
+    audit = statistics[flagged].copy()
+    audit['RULES'] = [', '.join(fired.columns[row]) for row in fired.to_numpy()[flagged]]
+    return audit.sort_index().reset_index()
+
+
+def refresh_outliers(statistics, transactions, excluded=(), rules=None):
+    """Fold ``transactions`` into the per-card ``statistics`` of earlier batches and re-detect outliers.
+
+    Returns the combined statistics (``statistics`` may be ``None`` for the
+    first batch) and the sorted array of excluded cards: the cards flagged
+    over all batches so far plus the already ``excluded`` ones, which stay
+    excluded since the rows dropped while they were flagged cannot be restored.
+    """
+    partials = [card_statistics(transactions)]
+    if statistics is not None:
+        partials.insert(0, statistics)
+    statistics = combine_card_statistics(partials)
+    flagged = detect_outliers(statistics, rules)['LYLTY_CARD_NBR'].to_numpy(dtype=np.int64)
+    return statistics, np.union1d(np.asarray(excluded, dtype=np.int64), flagged)
+
+
+def exclude_outliers(transactions, rules=None):
+    """Drop the transactions of outlier cards; return them with the audit table."""
+    audit = detect_outliers(card_statistics(transactions), rules)
+    kept = transactions[~transactions['LYLTY_CARD_NBR'].isin(audit['LYLTY_CARD_NBR'])]
+    return kept, audit
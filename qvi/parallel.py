@@ -0,0 +1,373 @@
+"""Multi-process cleaning and section VII aggregation.
+
+The transactions are partitioned by loyalty-card hash (``card % partitions``)
+so every card, and therefore every customer, lives in exactly one
+partition.  The partitioned columns are placed once in shared memory; each
+worker process attaches to them, cleans its slice (salsa and outlier
+removal, product features) and returns its partial aggregates as a handful
+of small NumPy arrays.  Because the partitions are disjoint by card, adding
+the partials is exact, distinct customer counts included.
+
+Outlier cards need the distribution over all cards, so the pool runs two
+passes over the shared columns: per-card statistics first, then the
+aggregates without the flagged cards.
+
+Usage::
+
+    python -m qvi.parallel --workers 8 --check
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE, load_customers, load_transactions
+from qvi.outliers import card_statistics, detect_outliers
+from qvi.product_rules import load_product_rules
+from qvi.products import build_product_dimension, product_codes
+from qvi.segments import SEGMENT_COLUMNS, add_derived_metrics, segment_codes
+from qvi.timeseries import DailySeries
+
+# Transaction columns shipped to the workers (PROD_NAME travels as PROD_CODE)
+TRANSACTION_COLUMNS = ('DATE', 'LYLTY_CARD_NBR', 'TXN_ID', 'PROD_CODE', 'PROD_QTY', 'TOT_SALES')
+
+_DAY = np.timedelta64(1, 'D')
+
+# Per-process state set by _init_worker: shared arrays and small lookups
+_ARRAYS = {}
+_CONTEXT = {}
+_HANDLES = []
+
+
+def partition_by_card(cards, n_partitions):
+    """Row order grouping the rows by ``card % n_partitions``, and the partition bounds.
+
+    Partition ``p`` is ``order[bounds[p]:bounds[p + 1]]``.  The stable sort on
+    the small partition numbers is a linear-time radix sort.
+    """
+    partition = (np.asarray(cards) % n_partitions).astype(np.uint16)
+    order = np.argsort(partition, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(partition, minlength=n_partitions))])
+    return order, bounds
+
+
+class SharedArrays:
+    """NumPy arrays copied into named shared-memory blocks (a context manager).
+
+    ``spec`` describes the blocks for :func:`attach_arrays` in other processes.
+    """
+
+    def __init__(self, arrays, order=None):
+        self.spec = {}
+        self._blocks = []
+        try:
+            for name, values in arrays.items():
+                values = np.asarray(values)
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self._blocks.append(block)
+                view = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+                if order is not None and name in order:
+                    np.take(values, order[name], out=view)
+                else:
+                    view[...] = values
+                self.spec[name] = (block.name, values.dtype.str, values.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_arrays(spec):
+    """Views on the shared blocks described by ``spec``, and the handles keeping them open."""
+    arrays, handles = {}, []
+    for name, (block_name, dtype, shape) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        handles.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return arrays, handles
+
+
+def _init_worker(spec, arrays, context):
+    if spec is not None:
+        arrays, handles = attach_arrays(spec)
+        _HANDLES.extend(handles)
+    _ARRAYS.update(arrays)
+    _CONTEXT.update(context)
+
+
+def _slice(start, stop):
+    return {name: _ARRAYS[name][start:stop] for name in TRANSACTION_COLUMNS}
+
+
+def _card_statistics_task(start, stop):
+    """Phase 1: per-card statistics of the non-salsa rows of one partition."""
+    rows = _slice(start, stop)
+    keep = ~_CONTEXT['salsa_by_code'][rows['PROD_CODE']]
+    frame = pd.DataFrame({name: rows[name][keep] for name in
+                          ('LYLTY_CARD_NBR', 'TXN_ID', 'PROD_QTY', 'TOT_SALES')})
+    statistics = card_statistics(frame).reset_index()
+    return {name: statistics[name].to_numpy() for name in statistics.columns}
+
+
+def _aggregate_task(start, stop, excluded_cards):
+    """Phase 2: clean one partition and return its section VII partial aggregates."""
+    context = _CONTEXT
+    rows = _slice(start, stop)
+    keep = ~context['salsa_by_code'][rows['PROD_CODE']]
+    if len(excluded_cards):
+        keep &= ~np.isin(rows['LYLTY_CARD_NBR'], excluded_cards)
+    rows = {name: values[keep] for name, values in rows.items()}
+
+    n_segments = context['n_segments']
+    customer_cards = _ARRAYS['CUSTOMER_CARDS']
+    cards = rows['LYLTY_CARD_NBR']
+    positions = np.minimum(np.searchsorted(customer_cards, cards), max(len(customer_cards) - 1, 0))
+    matched = customer_cards[positions] == cards if len(customer_cards) else np.zeros(len(cards), bool)
+    # Unmatched customers (and customers without a segment) go to the extra bin n_segments
+    segments = np.where(matched, _ARRAYS['CUSTOMER_SEGMENTS'][positions], n_segments)
+    segments[segments < 0] = n_segments
+
+    bins = n_segments + 1
+    qty = rows['PROD_QTY'].astype(np.float64)
+    sales = rows['TOT_SALES']
+    prices = sales / qty - context['price_shift']
+    _, first_seen = np.unique(cards, return_index=True)
+    days = ((rows['DATE'].astype('datetime64[D]') - context['first_day']) // _DAY).astype(np.int64)
+    brand = context['brand_by_code'][rows['PROD_CODE']]
+    pack = context['pack_by_code'][rows['PROD_CODE']]
+    n_brands, n_packs = context['n_brands'] + 1, context['n_packs'] + 1
+    return {
+        'ROWS': np.array([len(cards)]),
+        'TRANSACTIONS': np.bincount(segments, minlength=bins),
+        'SALES': np.bincount(segments, weights=sales, minlength=bins),
+        'TOTAL_QTY': np.bincount(segments, weights=qty, minlength=bins),
+        'CUSTOMERS': np.bincount(segments[first_seen], minlength=bins),
+        'PRICE_SUM': np.bincount(segments, weights=prices, minlength=bins),
+        'PRICE_SQUARES': np.bincount(segments, weights=prices * prices, minlength=bins),
+        'DAILY': np.bincount(days, minlength=context['n_days']),
+        'BRAND_QTY': np.bincount(segments * n_brands + brand, weights=qty, minlength=bins * n_brands),
+        'PACK_QTY': np.bincount(segments * n_packs + pack, weights=qty, minlength=bins * n_packs),
+    }
+
+
+def _code_lookups(prod_names, products):
+    """Per product code: salsa flag, brand index and pack size index (unknown -> last bin)."""
+    _, names = product_codes(prod_names)
+    rows = pd.Index(products['PROD_NAME']).get_indexer(names)
+    brands = products['BRAND'].cat.categories
+    pack_sizes = np.unique(products['PACK_SIZE'].to_numpy())
+    brand_of_row = np.append(products['BRAND'].cat.codes.to_numpy(), len(brands))
+    pack_of_row = np.append(np.searchsorted(pack_sizes, products['PACK_SIZE'].to_numpy()), len(pack_sizes))
+    salsa_of_row = np.append(products['EXCLUDED'].to_numpy(), False)
+    # Index -1 (missing name or name not in the dimension) reads the appended "unknown" entry
+    rows = np.append(np.where(rows < 0, len(products), rows), len(products))
+    return {
+        'salsa_by_code': salsa_of_row[rows],
+        'brand_by_code': brand_of_row[rows].astype(np.int64),
+        'pack_by_code': pack_of_row[rows].astype(np.int64),
+        'n_brands': len(brands),
+        'n_packs': len(pack_sizes),
+    }, brands, pack_sizes
+
+
+def _crosstab(partial, labels, values, name, n_segments):
+    units = partial.reshape(n_segments + 1, len(values) + 1)[:, :-1]
+    index = pd.MultiIndex.from_frame(pd.concat(
+        [labels, pd.DataFrame({column: [np.nan] for column in SEGMENT_COLUMNS})], ignore_index=True))
+    crosstab = pd.DataFrame(units, index=index, columns=pd.Index(values, name=name))
+    crosstab = crosstab.loc[crosstab.sum(axis=1) > 0, crosstab.sum(axis=0) > 0]
+    return crosstab.astype('int64')
+
+
+def parallel_aggregates(transaction_data, customer_data, workers=None, partitions=None,
+                        outlier_rules=None, products=None, product_rules=None):
+    """Clean ``transaction_data`` and compute its section VII aggregates in a process pool.
+
+    ``transaction_data`` is the loaded (uncleaned) transaction table.  Returns
+    a dict with the ``segment_table`` (as :func:`qvi.segments.segment_metrics`),
+    the price per unit ``moments`` (as :func:`qvi.significance.segment_moments`),
+    the ``daily`` :class:`~qvi.timeseries.DailySeries`, the ``BRAND`` and
+    ``PACK_SIZE`` segment cross-tabs (as :func:`qvi.affinity.segment_crosstab`),
+    the ``outlier_audit`` and the number of ``rows_kept``.  Unless the
+    ``products`` dimension is given, it is built with ``product_rules`` (the
+    default rules when ``None``).  With one worker everything runs in this
+    process.
+    """
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers
+    if products is None:
+        products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'],
+                                           product_rules)
+    lookups, brands, pack_sizes = _code_lookups(transaction_data['PROD_NAME'], products)
+
+    customers = customer_data.sort_values('LYLTY_CARD_NBR')
+    customer_segments, labels = segment_codes(customers)
+    dates = transaction_data['DATE'].to_numpy().astype('datetime64[D]')
+    first_day = dates.min() if len(dates) else np.datetime64('NaT', 'D')
+    prices = transaction_data['TOT_SALES'].to_numpy()[:1000] / transaction_data['PROD_QTY'].to_numpy()[:1000]
+    context = {**lookups,
+               'n_segments': len(labels),
+               'first_day': first_day,
+               'n_days': int((dates.max() - first_day) // _DAY) + 1 if len(dates) else 0,
+               'price_shift': float(np.nan_to_num(np.nanmedian(prices))) if len(prices) else 0.0}
+
+    columns = {
+        'DATE': transaction_data['DATE'].to_numpy(),
+        'LYLTY_CARD_NBR': transaction_data['LYLTY_CARD_NBR'].to_numpy(),
+        'TXN_ID': transaction_data['TXN_ID'].to_numpy(),
+        'PROD_CODE': product_codes(transaction_data['PROD_NAME'])[0],
+        'PROD_QTY': transaction_data['PROD_QTY'].to_numpy(),
+        'TOT_SALES': transaction_data['TOT_SALES'].to_numpy(),
+    }
+    order, bounds = partition_by_card(columns['LYLTY_CARD_NBR'], partitions)
+    arrays = {'CUSTOMER_CARDS': customers['LYLTY_CARD_NBR'].to_numpy(),
+              'CUSTOMER_SEGMENTS': customer_segments, **columns}
+    tasks = [(int(bounds[p]), int(bounds[p + 1])) for p in range(partitions) if bounds[p + 1] > bounds[p]]
+    # Without rows, one empty partition still yields (empty) aggregates of the right shape
+    tasks = tasks or [(0, 0)]
+
+    if workers == 1:
+        _init_worker(None, {name: (values[order] if name in columns else values)
+                            for name, values in arrays.items()}, context)
+        statistics = [_card_statistics_task(*task) for task in tasks]
+        audit = _detect(statistics, outlier_rules)
+        excluded = np.sort(audit['LYLTY_CARD_NBR'].to_numpy())
+        partials = [_aggregate_task(*task, excluded) for task in tasks]
+    else:
+        with SharedArrays(arrays, order={name: order for name in columns}) as shared:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.spec, {}, context)) as pool:
+                statistics = list(pool.map(_card_statistics_task, *zip(*tasks)))
+                audit = _detect(statistics, outlier_rules)
+                excluded = np.sort(audit['LYLTY_CARD_NBR'].to_numpy())
+                partials = list(pool.map(_aggregate_task, *zip(*tasks), [excluded] * len(tasks)))
+
+    totals = {name: sum(partial[name] for partial in partials) for name in partials[0]}
+    return _assemble(totals, labels, brands, pack_sizes, context, audit)
+
+
+def _detect(statistics, outlier_rules):
+    # The partitions are disjoint by card, so the per-card statistics just concatenate
+    frame = pd.concat([pd.DataFrame(part) for part in statistics], ignore_index=True)
+    return detect_outliers(frame.set_index('LYLTY_CARD_NBR'), outlier_rules)
+
+
+def _assemble(totals, labels, brands, pack_sizes, context, audit):
+    n_segments = context['n_segments']
+    table = labels.copy()
+    table['TRANSACTIONS'] = totals['TRANSACTIONS'][:n_segments]
+    table['SALES'] = totals['SALES'][:n_segments].round(2)
+    table['TOTAL_QTY'] = totals['TOTAL_QTY'][:n_segments].round().astype('int64')
+    table['CUSTOMERS'] = totals['CUSTOMERS'][:n_segments]
+    segment_table = add_derived_metrics(table[table['TRANSACTIONS'] > 0].reset_index(drop=True))
+
+    counts = totals['TRANSACTIONS'][:n_segments]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = totals['PRICE_SUM'][:n_segments] / counts
+        variances = (totals['PRICE_SQUARES'][:n_segments] - totals['PRICE_SUM'][:n_segments] * means) / (counts - 1)
+    moments = labels.copy()
+    moments['N'] = counts
+    moments['MEAN'] = means + context['price_shift']
+    moments['VAR'] = variances
+    moments = moments[moments['N'] > 0].reset_index(drop=True)
+
+    daily_counts = totals['DAILY']
+    active = np.flatnonzero(daily_counts)
+    if len(active):
+        daily = DailySeries(context['first_day'] + int(active[0]) * _DAY,
+                            daily_counts[active[0]:active[-1] + 1])
+    else:
+        # Every row was excluded: an empty series
+        daily = DailySeries(context['first_day'], daily_counts[:0])
+
+    return {
+        'segment_table': segment_table,
+        'moments': moments,
+        'daily': daily,
+        'BRAND': _crosstab(totals['BRAND_QTY'], labels, pd.CategoricalIndex(brands, categories=brands),
+                           'BRAND', n_segments),
+        'PACK_SIZE': _crosstab(totals['PACK_QTY'], labels, pack_sizes, 'PACK_SIZE', n_segments),
+        'outlier_audit': audit,
+        'rows_kept': int(totals['ROWS'][0]),
+    }
+
+
+def check_parity(result, transaction_data, customer_data, product_rules=None):
+    """Compare a :func:`parallel_aggregates` result with the in-memory pipeline.
+
+    ``product_rules`` must be the rules the result was computed with.
+    Returns a dict of table name -> True when identical (floats up to 1e-9).
+    """
+    from qvi import pipeline
+    from qvi.affinity import segment_crosstab
+    from qvi.significance import segment_moments
+
+    products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'],
+                                       product_rules)
+    cleaned = pipeline.feature_stage(pipeline.clean_stage(transaction_data, products), products)
+    merged = pipeline.merge_stage(cleaned, customer_data)
+    expected = {
+        'segment_table': pipeline.segmentation_stage(merged),
+        'moments': segment_moments(merged),
+        'daily': DailySeries.from_frame(cleaned).to_frame(),
+        'BRAND': segment_crosstab(merged, 'BRAND'),
+        'PACK_SIZE': segment_crosstab(merged, 'PACK_SIZE'),
+    }
+    actual = dict(result, daily=result['daily'].to_frame())
+    parity = {}
+    for name, table in expected.items():
+        try:
+            pd.testing.assert_frame_equal(actual[name], table, check_dtype=False, check_names=False,
+                                          check_index_type=False, check_column_type=False,
+                                          check_categorical=False, rtol=1e-9)
+            parity[name] = True
+        except AssertionError:
+            parity[name] = False
+    parity['rows_kept'] = result['rows_kept'] == len(cleaned)
+    return parity
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean and aggregate the QVI transactions in parallel.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--partitions', type=int, default=None)
+    parser.add_argument('--product-rules', default=None, metavar='PATH',
+                        help="JSON file of product exclusion, brand alias and pack size rules")
+    parser.add_argument('--check', action='store_true', help="compare with the in-memory pipeline")
+    args = parser.parse_args(argv)
+
+    transaction_data = load_transactions(args.transactions)
+    customer_data = load_customers(args.customers)
+    started = time.perf_counter()
+    product_rules = load_product_rules(args.product_rules)
+    result = parallel_aggregates(transaction_data, customer_data, args.workers, args.partitions,
+                                 product_rules=product_rules)
+    print(f"Cleaned and aggregated {len(transaction_data)} rows ({result['rows_kept']} kept) "
+          f"in {time.perf_counter() - started:.3f}s")
+    print(result['segment_table'].sort_values(by='SALES', ascending=False).to_string(index=False))
+    if args.check:
+        parity = check_parity(result, transaction_data, customer_data, product_rules)
+        print("\nParity with the in-memory pipeline:")
+        for name, same in parity.items():
+            print(f"  {name}: {'identical' if same else 'DIFFERENT'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""The analysis pipeline as separate, callable stages.
+
+Each stage takes and returns plain DataFrames, so services can reuse any of
+them (e.g. only loading and cleaning) without running the whole analysis.
+Nothing heavy is imported here: scipy is only loaded by the significance
+stage and plotting libraries only by :mod:`qvi.report`.
+"""
+from qvi.affinity import affinity_table, segment_affinities
+from qvi.cleaning import add_product_features, remove_customers, remove_salsa
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE, convert_excel_dates, load_customers, load_transactions
+from qvi.lookup import CustomerIndex
+from qvi.outliers import exclude_outliers
+from qvi.products import build_product_dimension
+from qvi.profiling import StageProfiler
+from qvi.schema import MERGED_SCHEMA, apply_schema
+from qvi.segments import segment_metrics
+from qvi.significance import price_per_unit_ttest
+
+TARGET_LIFESTAGE = "YOUNG SINGLES/COUPLES"
+TARGET_PREMIUM = "Mainstream"
+
+
+def load_stage(transaction_path=TRANSACTION_FILE, customer_path=CUSTOMER_FILE, use_cache=True):
+    """Section II: load the transaction and customer data."""
+    return load_transactions(transaction_path, use_cache=use_cache), load_customers(customer_path)
+
+
+def clean_stage(transaction_data, products=None, outlier_customer_ids=None, outlier_rules=None):
+    """Section III: convert dates, remove salsa products and outlier customers.
+
+    Outlier cards are detected with ``outlier_rules`` unless their ids are
+    given (pass ``()`` to keep every card).
+    """
+    transaction_data = transaction_data.assign(DATE=convert_excel_dates(transaction_data['DATE']))
+    if products is None:
+        products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'])
+    transaction_data = remove_salsa(transaction_data, products)
+    if outlier_customer_ids is None:
+        return outlier_stage(transaction_data, outlier_rules)[0]
+    return remove_customers(transaction_data, outlier_customer_ids)
+
+
+def outlier_stage(transaction_data, outlier_rules=None):
+    """Section III.C: drop outlier cards; returns the kept rows and the audit table."""
+    return exclude_outliers(transaction_data, outlier_rules)
+
+
+def feature_stage(transaction_data, products=None):
+    """Section IV: add the ``PACK_SIZE`` and ``BRAND`` features."""
+    return add_product_features(transaction_data, products)
+
+
+def merge_stage(transaction_data, customer_data, customer_index=None):
+    """Section VI: attach the customer segments and enforce the merged schema.
+
+    The segments are looked up in ``customer_index`` (built from
+    ``customer_data`` unless given) instead of merging the two frames.
+    """
+    if customer_index is None:
+        customer_index = CustomerIndex(customer_data)
+    return apply_schema(customer_index.attach(transaction_data), MERGED_SCHEMA)
+
+
+def segmentation_stage(merged_data):
+    """Section VII.A-D: the segment metrics table."""
+    return segment_metrics(merged_data)
+
+
+def significance_stage(merged_data):
+    """Section VII.E: Welch's t-test of the price per unit (imports scipy)."""
+    return price_per_unit_ttest(merged_data)
+
+
+def affinity_stage(merged_data, lifestage=TARGET_LIFESTAGE, premium_customer=TARGET_PREMIUM):
+    """Section VIII: brand and pack size affinity of the target segment."""
+    return {dimension: affinity_table(merged_data, dimension, lifestage, premium_customer)
+            for dimension in ('BRAND', 'PACK_SIZE')}
+
+
+def segment_affinity_stage(merged_data, dimensions=('BRAND', 'PACK_SIZE')):
+    """Section VIII for every segment at once: one affinity table per dimension."""
+    return {dimension: segment_affinities(merged_data, dimension) for dimension in dimensions}
+
+
+def run_pipeline(transaction_path=TRANSACTION_FILE, customer_path=CUSTOMER_FILE,
+                 lifestage=TARGET_LIFESTAGE, premium_customer=TARGET_PREMIUM, use_cache=True,
+                 profiler=None, product_rules=None):
+    """Run every stage and return their outputs in a dict.
+
+    Each stage is recorded by ``profiler`` (a :class:`qvi.profiling.StageProfiler`)
+    when one is given.  Products are described by ``product_rules`` (a
+    :class:`qvi.product_rules.ProductRules`, the default rules when ``None``).
+    """
+    profiler = StageProfiler(enabled=False) if profiler is None else profiler
+    with profiler.stage('load') as record:
+        transaction_data, customer_data = load_stage(transaction_path, customer_path, use_cache)
+        record['ROWS_OUT'] = len(transaction_data)
+    with profiler.stage('products', rows_in=transaction_data) as record:
+        products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'],
+                                           product_rules)
+        record['ROWS_OUT'] = len(products)
+    transaction_data = profiler.run('salsa', clean_stage, transaction_data, products, outlier_customer_ids=())
+    transaction_data, _ = profiler.run('outliers', outlier_stage, transaction_data)
+    transaction_data = profiler.run('features', feature_stage, transaction_data, products)
+    merged_data = profiler.run('merge', merge_stage, transaction_data, customer_data)
+    segment_table = profiler.run('segments', segmentation_stage, merged_data)
+    ttest = profiler.run('ttest', significance_stage, merged_data)
+    affinities = profiler.run('affinity', affinity_stage, merged_data, lifestage, premium_customer)
+    return {
+        'transactions': transaction_data,
+        'customers': customer_data,
+        'products': products,
+        'merged': merged_data,
+        'segment_table': segment_table,
+        'ttest': ttest,
+        'brand_affinity': affinities['BRAND'],
+        'pack_affinity': affinities['PACK_SIZE'],
+    }
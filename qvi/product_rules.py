@@ -0,0 +1,137 @@
+"""Configurable rules that read the product attributes out of ``PROD_NAME``.
+
+Three kinds of rules describe a product name:
+
+* ``exclude``: named lists of keywords; a name containing any keyword of a
+  rule (case-insensitive) is excluded from the analysis by that rule;
+* ``brand_aliases``: the brand is the first word of the name, upper-cased,
+  and an alias maps it to the standard brand name;
+* ``pack_size``: a regex whose last match in the name is the pack size in
+  grams (0 when it does not match).
+
+The keywords and the pack size pattern are compiled into one alternation
+regex with a named group per rule, so each name is scanned once whatever
+the number of rules, and the group that matched tells which rule fired.
+Brand aliases are exact first-word matches, i.e. one dict lookup.  Rules
+are evaluated per distinct product name (see
+:func:`qvi.products.build_product_dimension`), never per transaction.
+
+Rules can be loaded from a JSON file with the same keys as
+:data:`DEFAULT_PRODUCT_RULES`; missing keys keep their default.
+"""
+import json
+import re
+
+import pandas as pd
+
+# Products containing this keyword are not chips and are removed
+SALSA_KEYWORD = 'salsa'
+
+BRAND_CLEANING_MAP = {
+    "RED": "RRD", "SNBTS": "SUNBITES", "INFZNS": "INFUZIONS",
+    "WW": "WOOLWORTHS", "SMITH": "SMITHS", "NCC": "NATURAL",
+    "DORITO": "DORITOS", "GRAIN": "GRNWVES",  # GRNWVES could be Grain Waves
+    "CC'S": "CCS"  # Added CCS from R data
+}
+
+PACK_SIZE_PATTERN = r'\d+'
+
+DEFAULT_PRODUCT_RULES = {
+    'exclude': {'SALSA': [SALSA_KEYWORD]},
+    'brand_aliases': BRAND_CLEANING_MAP,
+    'pack_size': PACK_SIZE_PATTERN,
+}
+
+# Columns of :meth:`ProductRules.apply`
+RULE_COLUMNS = ['PACK_SIZE', 'BRAND', 'EXCLUDED', 'EXCLUDE_RULE', 'BRAND_RULE']
+
+_PACK_GROUP = 'pack_size'
+
+
+class ProductRules:
+    """Compiled product-name rules (see the module docstring for their meaning)."""
+
+    def __init__(self, exclude=None, brand_aliases=None, pack_size=PACK_SIZE_PATTERN):
+        exclude = DEFAULT_PRODUCT_RULES['exclude'] if exclude is None else exclude
+        brand_aliases = DEFAULT_PRODUCT_RULES['brand_aliases'] if brand_aliases is None else brand_aliases
+        self.exclude = {rule: [keywords] if isinstance(keywords, str) else list(keywords)
+                        for rule, keywords in exclude.items()}
+        self.brand_aliases = {alias.upper(): brand for alias, brand in brand_aliases.items()}
+        self.pack_size = pack_size
+
+        # Exclusion branches come first: digits inside a keyword are not a pack size
+        self._rule_of_group = {}
+        branches = []
+        for number, (rule, keywords) in enumerate(self.exclude.items()):
+            if not keywords:
+                continue
+            group = f'exclude_{number}'
+            self._rule_of_group[group] = rule
+            branches.append(f"(?P<{group}>{'|'.join(re.escape(keyword) for keyword in keywords)})")
+        try:
+            re.compile(pack_size)
+        except re.error as error:
+            raise ValueError(f"Invalid pack size pattern {pack_size!r}: {error}") from error
+        branches.append(f'(?P<{_PACK_GROUP}>{pack_size})')
+        self.pattern = re.compile('|'.join(branches), re.IGNORECASE)
+
+    @classmethod
+    def from_config(cls, config):
+        """Rules from a dict with the :data:`DEFAULT_PRODUCT_RULES` keys (missing keys keep the default)."""
+        unknown = set(config) - set(DEFAULT_PRODUCT_RULES)
+        if unknown:
+            raise ValueError(f"Unknown product rule sections: {', '.join(sorted(unknown))}")
+        return cls(**{**DEFAULT_PRODUCT_RULES, **config})
+
+    @property
+    def config(self):
+        """The rules as a JSON-serializable dict (also their cache fingerprint)."""
+        return {'exclude': self.exclude, 'brand_aliases': self.brand_aliases, 'pack_size': self.pack_size}
+
+    def match(self, name):
+        """``(pack_size, brand, exclude_rule, brand_rule)`` of one product name.
+
+        ``exclude_rule`` is the first exclusion rule found in the name and
+        ``brand_rule`` the alias that renamed the brand (both ``None`` when
+        no rule fired).
+        """
+        exclude_rule = None
+        pack_size = 0
+        for found in self.pattern.finditer(name):
+            if found.lastgroup == _PACK_GROUP:
+                pack_size = found.group()
+            elif exclude_rule is None:
+                exclude_rule = self._rule_of_group[found.lastgroup]
+        words = name.split()
+        word = words[0].upper() if words else None
+        brand_rule = word if word in self.brand_aliases else None
+        brand = self.brand_aliases[word] if brand_rule is not None else word
+        return pack_size, brand, exclude_rule, brand_rule
+
+    def apply(self, prod_names):
+        """Evaluate the rules on every name of ``prod_names`` (:data:`RULE_COLUMNS`).
+
+        Meant for distinct names: each name is matched separately.
+        """
+        matches = pd.DataFrame([self.match(name) for name in prod_names],
+                               columns=['PACK_SIZE', 'BRAND', 'EXCLUDE_RULE', 'BRAND_RULE'],
+                               index=prod_names.index, dtype=object)
+        return pd.DataFrame({
+            'PACK_SIZE': pd.to_numeric(matches['PACK_SIZE'], errors='coerce').fillna(0).astype(int),
+            'BRAND': matches['BRAND'],
+            'EXCLUDED': matches['EXCLUDE_RULE'].notna(),
+            'EXCLUDE_RULE': matches['EXCLUDE_RULE'],
+            'BRAND_RULE': matches['BRAND_RULE'],
+        }, index=prod_names.index)
+
+
+def load_product_rules(path=None):
+    """Rules from the JSON file at ``path``, or the default rules when ``path`` is ``None``."""
+    if path is None:
+        return ProductRules()
+    with open(path, encoding='utf-8') as handle:
+        try:
+            config = json.load(handle)
+        except ValueError as error:
+            raise ValueError(f"Invalid product rules file {path}: {error}") from error
+    return ProductRules.from_config(config)
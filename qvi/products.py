@@ -0,0 +1,77 @@
+"""Product dimension: PACK_SIZE, BRAND and the exclusion flag parsed once per product.
+
+There are only about a hundred distinct product names, so the rules of
+:mod:`qvi.product_rules` are evaluated on the distinct names and joined back
+to the transactions through integer product codes.
+"""
+import numpy as np
+import pandas as pd
+
+from qvi.product_rules import ProductRules
+
+
+def product_codes(prod_names):
+    """Return integer product codes for ``prod_names`` and the names they index.
+
+    Categorical columns (as produced by :mod:`qvi.loader`) already hold the
+    codes; other columns are factorized.  Missing names get the code -1.
+    """
+    if isinstance(prod_names.dtype, pd.CategoricalDtype):
+        return prod_names.cat.codes.to_numpy(), pd.Index(prod_names.cat.categories)
+    codes, uniques = pd.factorize(prod_names)
+    return codes, pd.Index(uniques)
+
+
+def build_product_dimension(prod_names, prod_nbrs=None, rules=None):
+    """Build the product dimension of a PROD_NAME column.
+
+    The result has one row per product code (row ``i`` describes code ``i``)
+    with ``PROD_NAME``, ``PACK_SIZE``, a categorical ``BRAND``, ``EXCLUDED``,
+    the rules that fired (``EXCLUDE_RULE``, ``BRAND_RULE``) and, when
+    ``prod_nbrs`` is given, the matching ``PROD_NBR``.  ``rules`` is a
+    :class:`qvi.product_rules.ProductRules` (the default rules when ``None``).
+    """
+    rules = ProductRules() if rules is None else rules
+    codes, names = product_codes(prod_names)
+    names = pd.Series(names, dtype=object)
+    products = pd.concat([names.rename('PROD_NAME'), rules.apply(names)], axis=1)
+    products['BRAND'] = products['BRAND'].astype('category')
+    if prod_nbrs is not None:
+        valid = codes >= 0
+        first_nbr = pd.Series(np.asarray(prod_nbrs)[valid]).groupby(codes[valid]).first()
+        products.insert(0, 'PROD_NBR', first_nbr.reindex(products.index).to_numpy())
+    products.index.name = 'PROD_CODE'
+    return products
+
+
+def product_rows(prod_names, products):
+    """Row of ``products`` describing each transaction (-1 for unknown products).
+
+    Only the distinct names are matched against the dimension; the per-row
+    work is an integer take on the product codes.
+    """
+    codes, names = product_codes(prod_names)
+    rows = pd.Index(products['PROD_NAME']).get_indexer(names)
+    # Appending -1 sends the missing-name code (-1) to "unknown product"
+    return np.append(rows, -1)[codes]
+
+
+def map_products(prod_names, products, column):
+    """Look up ``column`` of the product dimension for every transaction.
+
+    Categorical attributes stay categorical (codes, not strings) and keep
+    only the categories that are actually used.
+    """
+    rows = product_rows(prod_names, products)
+    missing = rows < 0
+    values = products[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        attribute_codes = values.cat.codes.to_numpy()[rows]
+        attribute_codes[missing] = -1
+        result = pd.Categorical.from_codes(attribute_codes, values.cat.categories)
+        return pd.Series(result, index=prod_names.index, name=column).cat.remove_unused_categories()
+    result = values.to_numpy()[rows]
+    if missing.any():
+        fill = False if values.dtype == bool else 0
+        result = np.where(missing, fill, result)
+    return pd.Series(result, index=prod_names.index, name=column)
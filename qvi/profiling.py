@@ -0,0 +1,201 @@
+"""Per-stage profiling of the analysis pipeline.
+
+A :class:`StageProfiler` records, for every stage run inside its
+:meth:`~StageProfiler.stage` context, the wall and CPU time, the peak
+resident memory, and the number of rows going in and out.  The records
+can be written as a JSON or CSV run log.  Optionally each stage is also
+run under cProfile (one ``<stage>.prof`` file per stage) and/or
+tracemalloc (peak Python allocations).
+
+On Linux the kernel's peak-RSS counter is reset at the start of every stage,
+so ``PEAK_RSS_MB`` is the peak of that stage.  Elsewhere it is the process
+high-water mark at the end of the stage.
+"""
+import contextlib
+import csv
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+LOG_COLUMNS = ['STAGE', 'WALL_S', 'CPU_S', 'PEAK_RSS_MB', 'ROWS_IN', 'ROWS_OUT', 'PY_PEAK_MB']
+
+_PROC_STATUS = '/proc/self/status'
+_PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def _reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM (Linux >= 4.0); silently skipped elsewhere
+    try:
+        with open(_PROC_CLEAR_REFS, 'w') as handle:
+            handle.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or ``None`` if unknown."""
+    try:
+        with open(_PROC_STATUS) as handle:
+            for line in handle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kB on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def row_count(value):
+    """Number of rows of a frame-like ``value`` (ints pass through), ``None`` otherwise."""
+    if isinstance(value, int) or value is None:
+        return value
+    if isinstance(value, tuple):
+        # Stages returning (frame, side table) count the rows of the frame
+        return row_count(value[0]) if value else None
+    return len(value) if hasattr(value, 'shape') else None
+
+
+class StageProfiler:
+    """Collect one record per pipeline stage.
+
+    ``profile_dir`` enables a cProfile dump per stage, ``trace_memory``
+    enables tracemalloc.  A disabled profiler still yields records, so
+    instrumented code does not need to branch on it.
+    """
+
+    def __init__(self, enabled=True, profile_dir=None, trace_memory=False):
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        """Time the body of the ``with`` block as stage ``name``.
+
+        Yields the stage record; set its ``ROWS_OUT`` (and ``ROWS_IN`` when
+        not known up front) from inside the block.
+        """
+        record = {'STAGE': name, 'ROWS_IN': row_count(rows_in), 'ROWS_OUT': None}
+        if not self.enabled:
+            yield record
+            return
+
+        profile = None
+        if self.profile_dir is not None:
+            import cProfile
+
+            profile = cProfile.Profile()
+        if self.trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        peak_is_per_stage = _reset_peak_rss()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+            record['WALL_S'] = time.perf_counter() - wall
+            record['CPU_S'] = time.process_time() - cpu
+            record['PEAK_RSS_MB'] = peak_rss_mb()
+            record['PEAK_RSS_SCOPE'] = 'stage' if peak_is_per_stage else 'process'
+            if self.trace_memory:
+                import tracemalloc
+
+                record['PY_PEAK_MB'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            if profile is not None:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.profile_dir, f"{_file_name(name)}.prof"))
+            self.records.append(record)
+
+    def run(self, name, function, *args, **kwargs):
+        """Call ``function`` as stage ``name``; rows in/out come from the first argument and result."""
+        with self.stage(name, rows_in=args[0] if args else None) as record:
+            result = function(*args, **kwargs)
+            record['ROWS_OUT'] = row_count(result)
+        return result
+
+    def summary(self):
+        """One line per stage, for printing at the end of a run."""
+        lines = []
+        for record in self.records:
+            line = f"{record['STAGE']:<12} wall {record['WALL_S']:8.3f}s  cpu {record['CPU_S']:8.3f}s"
+            if record['PEAK_RSS_MB'] is not None:
+                line += f"  peak rss {record['PEAK_RSS_MB']:8.1f} MB"
+            if record['ROWS_IN'] is not None or record['ROWS_OUT'] is not None:
+                line += f"  rows {record['ROWS_IN']} -> {record['ROWS_OUT']}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def table(self):
+        """The records as a DataFrame with the ``LOG_COLUMNS`` first."""
+        import pandas as pd
+
+        table = pd.DataFrame(self.records)
+        columns = [column for column in LOG_COLUMNS if column in table.columns]
+        return table[columns + [column for column in table.columns if column not in columns]]
+
+    def write_log(self, path):
+        """Write the run log to ``path``: JSON with run metadata, or CSV for a ``.csv`` path."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith('.csv'):
+            columns = list(dict.fromkeys(LOG_COLUMNS + [key for record in self.records for key in record]))
+            with open(path, 'w', newline='', encoding='utf-8') as handle:
+                writer = csv.DictWriter(handle, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(self.records)
+            return path
+        run = {
+            'started': self.started,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'argv': sys.argv,
+            'stages': self.records,
+        }
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(run, handle, indent=2)
+        return path
+
+
+def _file_name(stage_name):
+    return ''.join(character if character.isalnum() else '_' for character in stage_name)
+
+
+def add_profiling_arguments(parser):
+    """Add the ``--profile``, ``--profile-dir`` and ``--trace-memory`` options to ``parser``."""
+    parser.add_argument('--profile', metavar='LOG', default=None,
+                        help="write a per-stage run log (.json, or .csv)")
+    parser.add_argument('--profile-dir', default=None, help="also dump a cProfile file per stage here")
+    parser.add_argument('--trace-memory', action='store_true', help="also record tracemalloc peaks")
+
+
+def profiler_from_args(args):
+    """The :class:`StageProfiler` requested by :func:`add_profiling_arguments` options."""
+    enabled = bool(args.profile or args.profile_dir or args.trace_memory)
+    return StageProfiler(enabled, args.profile_dir, args.trace_memory)
+
+
+def finish_profiling(profiler, args):
+    """Write the run log requested on the command line and print the stage summary."""
+    if not profiler.enabled:
+        return
+    if args.profile:
+        profiler.write_log(args.profile)
+    print(profiler.summary(), file=sys.stderr)
@@ -0,0 +1,244 @@
+"""Headless report mode: render every figure to files in parallel.
+
+Each figure is drawn from small precomputed aggregates (daily counts, pack
+size counts, the segment table) rather than from the full merged data, and
+the figures are rendered with the Agg backend in a process pool, so a batch
+run takes about as long as its slowest figure and never blocks on
+``plt.show()``.  The output directory is one report bundle: the figures (one
+directory per locale), the tables they were drawn from and an ``index.json``
+listing both.
+
+Usage::
+
+    python -m qvi.report --out report --format png svg --locale en vi
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from qvi.cleaning import clean_transactions
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE, load_customers, load_transactions
+from qvi.locales import DEFAULT_LOCALE, LOCALES, messages
+from qvi.lookup import CustomerIndex
+from qvi.schema import MERGED_SCHEMA, apply_schema
+from qvi.segments import segment_metrics
+from qvi.timeseries import DailySeries
+
+DEFAULT_FORMATS = ('png',)
+
+
+def build_report_data(transaction_data, segment_table, daily=None):
+    """Precompute the small tables every figure is drawn from.
+
+    ``transaction_data`` must be cleaned and have ``PACK_SIZE``; only its
+    ``DATE`` and ``PACK_SIZE`` columns are reduced here.  ``daily`` is its
+    :class:`qvi.timeseries.DailySeries` when the caller already has it.
+    """
+    daily = DailySeries.from_frame(transaction_data) if daily is None else daily
+    return {
+        'transactions_by_day': daily.to_frame().reset_index(drop=True),
+        'transactions_december': daily.to_frame(daily.month_offsets(12)).reset_index(drop=True),
+        'pack_size_counts': (transaction_data['PACK_SIZE'].value_counts().sort_index()
+                             .rename_axis('PACK_SIZE').reset_index(name='COUNT')),
+        'segment_table': segment_table,
+    }
+
+
+def _daily_figure(plt, sns, mdates, daily, text, title, color, locator, date_format):
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.lineplot(x='DATE', y='N', data=daily, ax=ax, color=color)
+    ax.set_title(title, fontsize=16, fontweight='bold')
+    ax.set_xlabel(text['date'], fontsize=12)
+    ax.set_ylabel(text['number_of_transactions'], fontsize=12)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    return fig
+
+
+def plot_transactions_over_time(plt, sns, mdates, data, text):
+    return _daily_figure(plt, sns, mdates, data['transactions_by_day'], text,
+                         text['transactions_over_time_title'], 'dodgerblue',
+                         mdates.MonthLocator(interval=1), '%Y-%m')
+
+
+def plot_december_transactions(plt, sns, mdates, data, text):
+    return _daily_figure(plt, sns, mdates, data['transactions_december'], text,
+                         text['transactions_december_title'], 'tomato',
+                         mdates.DayLocator(interval=2), '%Y-%m-%d')
+
+
+def plot_pack_size_distribution(plt, sns, mdates, data, text):
+    counts = data['pack_size_counts']
+    fig, ax = plt.subplots()
+    bins = len(counts) if len(counts) < 50 else 50
+    # Histogram of the per-row pack sizes, rebuilt from the value counts
+    ax.hist(counts['PACK_SIZE'], bins=bins, weights=counts['COUNT'], edgecolor='black')
+    ax.grid(True)
+    ax.set_title(text['pack_size_title'], fontsize=16, fontweight='bold')
+    ax.set_xlabel(text['pack_size_label'], fontsize=12)
+    ax.set_ylabel(text['frequency'], fontsize=12)
+    return fig
+
+
+def _segment_heatmap(plt, sns, table, text, value, fmt, cmap, label, title):
+    pivot = table.pivot_table(index='PREMIUM_CUSTOMER', columns='LIFESTAGE', values=value)
+    fig, ax = plt.subplots(figsize=(14, 8))
+    sns.heatmap(pivot, annot=True, fmt=fmt, cmap=cmap, linewidths=.5, cbar_kws={'label': label}, ax=ax)
+    ax.set_title(title, fontsize=16, fontweight='bold')
+    ax.set_ylabel(text['premium_segment'], fontsize=12)
+    ax.set_xlabel(text['lifestage'], fontsize=12)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    plt.setp(ax.get_yticklabels(), rotation=0)
+    return fig
+
+
+def plot_sales_heatmap(plt, sns, mdates, data, text):
+    return _segment_heatmap(plt, sns, data['segment_table'], text, 'SALES', ".0f", "viridis",
+                            text['total_sales_label'], text['sales_title'])
+
+
+def plot_customers_heatmap(plt, sns, mdates, data, text):
+    return _segment_heatmap(plt, sns, data['segment_table'], text, 'CUSTOMERS', ".0f", "YlGnBu",
+                            text['customers_label'], text['customers_title'])
+
+
+def _segment_barplot(plt, sns, table, text, value, palette, ylabel, title):
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(x='LIFESTAGE', y=value, hue='PREMIUM_CUSTOMER', data=table, palette=palette,
+                dodge=True, ax=ax)
+    ax.set_title(title, fontsize=16, fontweight='bold')
+    ax.set_xlabel(text['lifestage'], fontsize=12)
+    ax.set_ylabel(ylabel, fontsize=12)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.legend(title=text['customer_segment'])
+    return fig
+
+
+def plot_avg_units_per_customer(plt, sns, mdates, data, text):
+    return _segment_barplot(plt, sns, data['segment_table'], text, 'AVG_UNITS_PER_CUSTOMER', 'viridis',
+                            text['avg_units_label'], text['avg_units_title'])
+
+
+def plot_avg_price_per_unit(plt, sns, mdates, data, text):
+    return _segment_barplot(plt, sns, data['segment_table'], text, 'AVG_PRICE_PER_UNIT', 'coolwarm',
+                            text['avg_price_label'], text['avg_price_title'])
+
+
+# Figure name -> (plot function, report tables it needs)
+FIGURES = {
+    'transactions_over_time': (plot_transactions_over_time, ['transactions_by_day']),
+    'transactions_december': (plot_december_transactions, ['transactions_december']),
+    'pack_size_distribution': (plot_pack_size_distribution, ['pack_size_counts']),
+    'sales_by_segment': (plot_sales_heatmap, ['segment_table']),
+    'customers_by_segment': (plot_customers_heatmap, ['segment_table']),
+    'avg_units_per_customer': (plot_avg_units_per_customer, ['segment_table']),
+    'avg_price_per_unit': (plot_avg_price_per_unit, ['segment_table']),
+}
+
+
+def _plotting_modules(backend=None):
+    import matplotlib
+    if backend is not None:
+        matplotlib.use(backend)
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.style.use('seaborn-v0_8-whitegrid')
+    return plt, sns, mdates
+
+
+def build_figure(name, data, locale=DEFAULT_LOCALE, backend=None):
+    """Build figure ``name`` of ``FIGURES`` with the labels of ``locale``; returns (plt, fig)."""
+    plt, sns, mdates = _plotting_modules(backend)
+    plot, _ = FIGURES[name]
+    fig = plot(plt, sns, mdates, data, messages(locale))
+    fig.tight_layout()
+    return plt, fig
+
+
+def render_figure(name, data, out_dir, formats=DEFAULT_FORMATS, locale=DEFAULT_LOCALE):
+    """Render one figure of ``FIGURES`` to ``out_dir`` and return the written paths.
+
+    Runs in the worker processes; plotting libraries are imported here, with
+    the non-interactive Agg backend.
+    """
+    plt, fig = build_figure(name, data, locale, backend='Agg')
+    paths = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        fig.savefig(path)
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def show_figures(report_data, locale=DEFAULT_LOCALE):
+    """Display every figure interactively (blocks until the windows are closed)."""
+    for name in FIGURES:
+        plt, _ = build_figure(name, report_data, locale)
+    plt.show()
+
+
+def render_report(report_data, out_dir, formats=DEFAULT_FORMATS, workers=None, locales=(DEFAULT_LOCALE,)):
+    """Write the report bundle for ``report_data`` to ``out_dir``.
+
+    The figures of each locale go to ``out_dir/<locale>``; the tables are
+    shared by all locales.  Figures are spread over a pool of ``workers``
+    processes (one per CPU by default, rendered in-process when that is 1);
+    each task receives only the tables its figure needs.  Returns the bundle
+    index.
+    """
+    os.makedirs(os.path.join(out_dir, 'tables'), exist_ok=True)
+    tables = {}
+    for name, table in report_data.items():
+        path = os.path.join(out_dir, 'tables', f"{name}.csv")
+        table.to_csv(path, index=False)
+        tables[name] = os.path.relpath(path, out_dir)
+
+    jobs = {}
+    for locale in locales:
+        os.makedirs(os.path.join(out_dir, locale), exist_ok=True)
+        for name, (_, needs) in FIGURES.items():
+            jobs[locale, name] = ({table: report_data[table] for table in needs},
+                                  os.path.join(out_dir, locale), tuple(formats), locale)
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers == 1:
+        paths = {key: render_figure(key[1], *job) for key, job in jobs.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {key: pool.submit(render_figure, key[1], *job) for key, job in jobs.items()}
+            paths = {key: future.result() for key, future in futures.items()}
+    figures = {locale: {} for locale in locales}
+    for (locale, name), written in paths.items():
+        figures[locale][name] = [os.path.relpath(path, out_dir) for path in written]
+
+    index = {'figures': figures, 'tables': tables}
+    with open(os.path.join(out_dir, 'index.json'), 'w', encoding='utf-8') as handle:
+        json.dump(index, handle, indent=2)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the QVI report figures to files.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--out', default='report')
+    parser.add_argument('--format', nargs='+', default=list(DEFAULT_FORMATS), choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--locale', nargs='+', default=[DEFAULT_LOCALE], choices=LOCALES)
+    args = parser.parse_args(argv)
+
+    transaction_data = clean_transactions(load_transactions(args.transactions))
+    merged_data = apply_schema(CustomerIndex(load_customers(args.customers)).attach(transaction_data),
+                               MERGED_SCHEMA)
+    report_data = build_report_data(transaction_data, segment_metrics(merged_data))
+    index = render_report(report_data, args.out, args.format, args.workers, args.locale)
+    figure_count = sum(len(figures) for figures in index['figures'].values())
+    print(f"Report written to {args.out}: {figure_count} figures, {len(index['tables'])} tables")
+
+
+if __name__ == '__main__':
+    main()
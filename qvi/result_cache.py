@@ -0,0 +1,148 @@
+"""Content-addressed on-disk cache of computed result tables.
+
+Reruns of the analysis usually change only the presentation (a plot, the
+language, the deep-dive segment), yet every run used to recompute Tables 1-9
+from the raw data.  Each group of result tables is therefore stored under a
+key derived from the SHA-256 hashes of the input files and the parameters
+the tables depend on (brand map, salsa keyword, outlier rules, ...), so an
+unchanged stage is read back instead of recomputed, and any change to the
+data or to a parameter simply addresses a different entry.  The hashes are
+recorded with each input's size and mtime and only recomputed when those
+change, as for the loader's workbook cache.
+
+Entries are pickled files named after their key.  Every read refreshes the
+entry's mtime, and writing evicts the least recently used entries until the
+cache fits in ``max_bytes``.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+from qvi.loader import DEFAULT_CACHE_DIR, recorded_fingerprint
+
+DEFAULT_RESULT_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'results')
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+# Bump this whenever a cached table changes layout or meaning so old entries are ignored
+RESULT_CACHE_VERSION = 3
+
+_ENTRY_EXTENSION = '.pkl'
+
+# Fingerprints of the input files, by absolute path
+_INPUTS_RECORD = 'inputs.json'
+
+
+def input_fingerprint(path, cache_dir=DEFAULT_RESULT_CACHE_DIR):
+    """Content fingerprint (size and SHA-256) of an input file, independent of its mtime.
+
+    The hash is reused from ``cache_dir`` while the file's size and mtime are
+    unchanged (see :func:`qvi.loader.recorded_fingerprint`).
+    """
+    fingerprint = recorded_fingerprint(path, os.path.join(cache_dir, _INPUTS_RECORD))
+    return {'size': fingerprint['size'], 'sha256': fingerprint['sha256']}
+
+
+def cache_key(name, *parts):
+    """Hex key of the result ``name`` computed from ``parts`` (JSON-serializable values)."""
+    payload = json.dumps([RESULT_CACHE_VERSION, name, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU store of pickled results, addressed by :func:`cache_key`.
+
+    A disabled cache computes every result and stores nothing.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_RESULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + _ENTRY_EXTENSION)
+
+    def get(self, key):
+        """Return ``(True, value)`` for a stored key and ``(False, None)`` otherwise."""
+        if not self.enabled:
+            return False, None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle:
+                value = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        # The mtime records the last use, which orders the LRU eviction
+        os.utime(path)
+        return True, value
+
+    def put(self, key, value):
+        """Store ``value`` under ``key`` and evict old entries beyond ``max_bytes``."""
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as handle:
+            pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        if os.path.getsize(tmp_path) > self.max_bytes:
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def fetch(self, name, parts, compute, *args):
+        """The result ``name`` for ``parts``: read from the cache, or ``compute(*args)`` and stored."""
+        key = cache_key(name, *parts)
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute(*args)
+        self.put(key, value)
+        return value
+
+    def entries(self):
+        """Stored entries as ``(mtime_ns, size, path)``, least recently used first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_ENTRY_EXTENSION):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        """Total bytes of the stored entries."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until at most ``max_bytes`` remain; return their number."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Remove every entry."""
+        return self.evict(0)
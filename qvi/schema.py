@@ -0,0 +1,102 @@
+"""Explicit, enforced dtype schema for the transaction and customer data.
+
+Segment and brand columns are categoricals and integer columns use the
+narrowest width that fits the QVI data, which shrinks the merged
+transaction-customer frame several-fold and speeds up every groupby.
+Casting is checked: a value that does not fit its declared width raises a
+``ValueError`` instead of silently wrapping around.
+
+``TOT_SALES`` is the one exception: it stays ``float64``, because float32
+sales (about seven significant digits) round the segment sums and price
+moments of Tables 3-7 away from the reported values.  :func:`memory_report`
+shows what that costs (``WIDE_BYTES``, 4 bytes per row).
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+TRANSACTION_SCHEMA = {
+    'DATE': 'datetime64[ns]',
+    'STORE_NBR': 'int16',
+    'LYLTY_CARD_NBR': 'int32',
+    'TXN_ID': 'int32',
+    'PROD_NBR': 'int16',
+    'PROD_NAME': 'category',
+    'PROD_QTY': 'int16',
+    'TOT_SALES': 'float64',
+    'PACK_SIZE': 'int16',
+    'BRAND': 'category',
+}
+
+CUSTOMER_SCHEMA = {
+    'LYLTY_CARD_NBR': 'int32',
+    'LIFESTAGE': 'category',
+    'PREMIUM_CUSTOMER': 'category',
+}
+
+MERGED_SCHEMA = {**TRANSACTION_SCHEMA, **CUSTOMER_SCHEMA}
+
+# Columns deliberately kept wider than their values need, and the dtype that would hold them
+NARROWER_DTYPES = {'TOT_SALES': 'float32'}
+
+
+def _check_integer_range(column, values, dtype):
+    if values.empty or not pd.api.types.is_numeric_dtype(values):
+        return
+    limits = np.iinfo(dtype)
+    low, high = values.min(), values.max()
+    if low < limits.min or high > limits.max:
+        raise ValueError(f"Column {column} has values in [{low}, {high}], "
+                         f"which do not fit the schema dtype {dtype}")
+
+
+def apply_schema(frame, schema):
+    """Return ``frame`` with every column listed in ``schema`` cast to its dtype.
+
+    Columns missing from ``frame`` are skipped and columns not in ``schema``
+    are left untouched.
+    """
+    casts = {}
+    for column, dtype in schema.items():
+        if column not in frame.columns or frame[column].dtype == dtype:
+            continue
+        if dtype.startswith(('int', 'uint')):
+            _check_integer_range(column, frame[column], dtype)
+        casts[column] = dtype
+    return frame.astype(casts) if casts else frame
+
+
+def _default_column_bytes(values):
+    """Memory the column would use with pandas' default int64/float64/object dtypes."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Object strings: one pointer per row plus one Python object per row,
+        # estimated from the categories so no per-row strings are created.
+        counts = values.value_counts(sort=False)
+        object_sizes = np.array([sys.getsizeof(category) for category in counts.index])
+        return 8 * len(values) + int((object_sizes * counts.to_numpy()).sum())
+    return 8 * len(values)
+
+
+def memory_report(frame):
+    """Per-column memory of ``frame`` against the default-dtype layout.
+
+    Returns a DataFrame with the dtype, the bytes used now, the bytes used
+    with default dtypes, the bytes saved and the bytes spent on keeping the
+    :data:`NARROWER_DTYPES` columns wide (``WIDE_BYTES``), plus a ``TOTAL`` row.
+    """
+    report = pd.DataFrame({
+        'DTYPE': frame.dtypes.astype(str),
+        'BYTES': frame.memory_usage(index=False, deep=True),
+        'DEFAULT_BYTES': pd.Series({column: _default_column_bytes(frame[column])
+                                    for column in frame.columns}),
+    })
+    report.loc['TOTAL'] = ['', report['BYTES'].sum(), report['DEFAULT_BYTES'].sum()]
+    report['SAVED_BYTES'] = report['DEFAULT_BYTES'] - report['BYTES']
+    wide = pd.Series(0, index=report.index)
+    for column, dtype in NARROWER_DTYPES.items():
+        if column in frame.columns:
+            wide[column] = report.loc[column, 'BYTES'] - len(frame) * np.dtype(dtype).itemsize
+    wide['TOTAL'] = wide.drop('TOTAL').sum()
+    report['WIDE_BYTES'] = wide
+    return report
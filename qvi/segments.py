@@ -0,0 +1,93 @@
+"""Single-pass segment metrics for sections VII.A-D.
+
+Every metric of the segment analysis (total sales, customers, units per
+customer, price per unit, ...) comes from one grouped pass over integer
+segment codes instead of one ``groupby`` per table.  The result is one tidy
+table, with one row per ``LIFESTAGE`` x ``PREMIUM_CUSTOMER`` segment, that
+the heatmaps and bar plots all consume.
+"""
+import numpy as np
+import pandas as pd
+
+SEGMENT_COLUMNS = ['LIFESTAGE', 'PREMIUM_CUSTOMER']
+
+# Column summed per segment for each additive metric
+SUM_METRICS = {
+    'SALES': 'TOT_SALES',
+    'TOTAL_QTY': 'PROD_QTY',
+}
+
+# Metrics derived from the additive ones once the pass is done
+DERIVED_METRICS = {
+    'AVG_UNITS_PER_CUSTOMER': lambda table: table['TOTAL_QTY'] / table['CUSTOMERS'],
+    'AVG_PRICE_PER_UNIT': lambda table: table['SALES'] / table['TOTAL_QTY'],
+}
+
+
+def _categorical(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    return values.astype('category')
+
+
+def segment_codes(frame):
+    """Return one integer code per row for its segment, and the segment labels.
+
+    The code of a row is ``lifestage_code * n_premium + premium_code`` (-1 when
+    either label is missing); row ``i`` of the returned labels frame holds the
+    ``LIFESTAGE`` and ``PREMIUM_CUSTOMER`` of code ``i``.
+    """
+    lifestage = _categorical(frame['LIFESTAGE'])
+    premium = _categorical(frame['PREMIUM_CUSTOMER'])
+    lifestage_codes = lifestage.cat.codes.to_numpy().astype(np.int64)
+    premium_codes = premium.cat.codes.to_numpy().astype(np.int64)
+    n_premium = len(premium.cat.categories)
+    codes = lifestage_codes * n_premium + premium_codes
+    codes[(lifestage_codes < 0) | (premium_codes < 0)] = -1
+
+    n_lifestage = len(lifestage.cat.categories)
+    labels = pd.DataFrame({
+        'LIFESTAGE': pd.Categorical.from_codes(np.repeat(np.arange(n_lifestage), n_premium),
+                                               lifestage.cat.categories),
+        'PREMIUM_CUSTOMER': pd.Categorical.from_codes(np.tile(np.arange(n_premium), n_lifestage),
+                                                      premium.cat.categories),
+    })
+    return codes, labels
+
+
+def add_derived_metrics(table, derived=None):
+    """Add the ``DERIVED_METRICS`` (and any ``derived`` extras) to a segment table."""
+    for name, metric in {**DERIVED_METRICS, **(derived or {})}.items():
+        table[name] = metric(table)
+    return table
+
+
+def segment_metrics(merged_data, extra_sums=None, derived=None):
+    """Compute all the segment metrics of section VII in a single pass.
+
+    ``extra_sums`` maps new metric names to columns to sum per segment and
+    ``derived`` maps new metric names to functions of the segment table, so
+    metrics can be added without another pass over ``merged_data``.
+    Distinct customers are counted from the unique loyalty cards, each of
+    which belongs to exactly one segment.
+    """
+    codes, labels = segment_codes(merged_data)
+    matched = codes >= 0
+    codes = codes[matched]
+    n_segments = len(labels)
+
+    table = labels
+    table['TRANSACTIONS'] = np.bincount(codes, minlength=n_segments)
+    for name, column in {**SUM_METRICS, **(extra_sums or {})}.items():
+        weights = merged_data[column].to_numpy()[matched].astype(np.float64)
+        table[name] = np.bincount(codes, weights=weights, minlength=n_segments)
+    table['TOTAL_QTY'] = table['TOTAL_QTY'].round().astype('int64')
+    # Round the totals back to cents
+    table['SALES'] = table['SALES'].round(2)
+
+    cards = merged_data['LYLTY_CARD_NBR'].to_numpy()[matched]
+    _, first_seen = np.unique(cards, return_index=True)
+    table['CUSTOMERS'] = np.bincount(codes[first_seen], minlength=n_segments)
+
+    table = table[table['TRANSACTIONS'] > 0].reset_index(drop=True)
+    return add_derived_metrics(table, derived)
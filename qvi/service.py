@@ -0,0 +1,399 @@
+"""Long-running local HTTP/JSON service answering segment queries.
+
+The inputs are loaded, cleaned and reduced to a :class:`qvi.cube.Cube` and
+a daily series once; every request is then answered from those aggregates,
+never from the transactions.  Requests are served by one ``asyncio`` loop,
+so any number of clients can keep connections open concurrently, and the
+encoded answers are kept in a bounded in-memory LRU cache.  Only cache hits
+are answered on the loop; misses are computed in worker threads.  The inputs are
+polled for changes (size and mtime); a changed file is reloaded in a worker
+thread while the previous aggregates keep answering, then swapped in and
+the cache cleared.
+
+Endpoints (``GET``, JSON):
+
+* ``/segments``: the segment metrics of Tables 3-6;
+* ``/daily?start=&end=``: transactions per day, with the holidays;
+* ``/ttest?lifestage=&group=&other=&alternative=``: the Welch test of Table 7;
+* ``/affinity?dimension=BRAND&lifestage=&premium=``: Tables 8/9 for a segment;
+* ``/query?by=BRAND&LIFESTAGE=...&start=&end=``: any cube roll-up or slice;
+* ``/status``: inputs, load time and cache counters.
+
+Usage::
+
+    python -m qvi.service --port 8765
+    curl 'http://127.0.0.1:8765/affinity?dimension=PACK_SIZE&lifestage=OLDER%20FAMILIES&premium=Budget'
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE
+from qvi.pipeline import TARGET_LIFESTAGE, TARGET_PREMIUM
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Answers kept in memory, and seconds between two checks of the inputs
+DEFAULT_CACHE_ENTRIES = 1024
+DEFAULT_RELOAD_INTERVAL = 2.0
+
+# Answers computed with every (re)load, before the new data is swapped in
+WARM_QUERIES = ('/segments', '/daily', '/ttest', '/affinity?dimension=BRAND', '/affinity?dimension=PACK_SIZE')
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def input_stamps(paths):
+    """``(size, mtime_ns)`` of every existing path, the change test of the hot reload."""
+    stamps = {}
+    for path in paths:
+        if path is not None and os.path.exists(path):
+            stat = os.stat(path)
+            stamps[path] = (stat.st_size, stat.st_mtime_ns)
+    return stamps
+
+
+class Snapshot:
+    """Aggregates of one version of the inputs: the cube and the daily transactions."""
+
+    def __init__(self, cube, daily, stamps, rows):
+        self.cube = cube
+        self.daily = daily
+        self.stamps = stamps
+        self.rows = rows
+        self.loaded_at = time.time()
+
+
+def load_snapshot(transaction_path=TRANSACTION_FILE, customer_path=CUSTOMER_FILE, product_rules_path=None,
+                  use_cache=True):
+    """Run the cleaning stages on the inputs and reduce them to a :class:`Snapshot`."""
+    from qvi import pipeline
+    from qvi.cube import build_cube
+    from qvi.product_rules import load_product_rules
+    from qvi.products import build_product_dimension
+    from qvi.timeseries import DailySeries
+
+    stamps = input_stamps([transaction_path, customer_path, product_rules_path])
+    transaction_data, customer_data = pipeline.load_stage(transaction_path, customer_path, use_cache)
+    products = build_product_dimension(transaction_data['PROD_NAME'], transaction_data['PROD_NBR'],
+                                       load_product_rules(product_rules_path))
+    transaction_data = pipeline.clean_stage(transaction_data, products)
+    daily = DailySeries.from_frame(transaction_data)
+    merged_data = pipeline.merge_stage(pipeline.feature_stage(transaction_data, products), customer_data)
+    return Snapshot(build_cube(merged_data), daily, stamps, len(merged_data))
+
+
+def _values(params, name, default=None):
+    values = params.get(name)
+    return tuple(values) if values else default
+
+
+def _value(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _dimension_value(text):
+    return int(text) if text.lstrip('-').isdigit() else text
+
+
+def _records(table):
+    return json.loads(table.to_json(orient='records', date_format='iso'))
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class QueryService:
+    """Answers the endpoints from the current :class:`Snapshot`, with a bounded LRU cache.
+
+    :meth:`answer` computes in the calling thread and :meth:`answer_async`
+    in a worker thread; :meth:`serve` runs the HTTP loop and the hot reload.
+    """
+
+    def __init__(self, transaction_path=TRANSACTION_FILE, customer_path=CUSTOMER_FILE, product_rules_path=None,
+                 use_cache=True, cache_entries=DEFAULT_CACHE_ENTRIES, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.transaction_path = transaction_path
+        self.customer_path = customer_path
+        self.product_rules_path = product_rules_path
+        self.use_cache = use_cache
+        self.cache_entries = cache_entries
+        self.reload_interval = reload_interval
+        self.snapshot = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.reload_error = None
+        self._cache = OrderedDict()
+        self._routes = {
+            '/segments': self._segments,
+            '/daily': self._daily,
+            '/ttest': self._ttest,
+            '/affinity': self._affinity,
+            '/query': self._query,
+        }
+
+    @property
+    def paths(self):
+        return [self.transaction_path, self.customer_path, self.product_rules_path]
+
+    def prepare(self):
+        """Load the inputs (blocking) and compute the :data:`WARM_QUERIES` answers on them.
+
+        Returns the snapshot and its answers by cache key, for :meth:`swap`.
+        """
+        snapshot = load_snapshot(self.transaction_path, self.customer_path, self.product_rules_path,
+                                 self.use_cache)
+        answers = {}
+        for query in WARM_QUERIES:
+            url = urlsplit(query)
+            params = parse_qs(url.query)
+            answers[self._key(url.path, params)] = self._compute(snapshot, url.path, params)
+        return snapshot, answers
+
+    def load(self):
+        """Load the inputs (blocking) and swap the new snapshot in."""
+        self.swap(*self.prepare())
+
+    def swap(self, snapshot, answers=None):
+        self.snapshot = snapshot
+        self.generation += 1
+        self.reload_error = None
+        self._cache.clear()
+        self._cache.update(answers or {})
+        self._evict()
+
+    def changed(self):
+        """Whether an input differs from the loaded snapshot."""
+        return self.snapshot is None or input_stamps(self.paths) != self.snapshot.stamps
+
+    def answer(self, path, params):
+        """``(status, body bytes)`` of a ``GET`` of ``path`` with the parsed query ``params``."""
+        found = self._lookup(path, params)
+        if found is not None:
+            return found
+        snapshot = self.snapshot
+        return self._store(path, params, snapshot, *self._miss(snapshot, path, params))
+
+    async def answer_async(self, path, params):
+        """As :meth:`answer`, but a cache miss is computed in a worker thread while the loop keeps serving."""
+        found = self._lookup(path, params)
+        if found is not None:
+            return found
+        snapshot = self.snapshot
+        status, body = await asyncio.to_thread(self._miss, snapshot, path, params)
+        return self._store(path, params, snapshot, status, body)
+
+    def _lookup(self, path, params):
+        """The answer when it needs no computation (status, unknown endpoint, cache hit), else ``None``."""
+        if path == '/status':
+            return 200, self._encode(self._status())
+        if path not in self._routes:
+            return 404, self._encode({'error': f"Unknown endpoint {path}", 'endpoints': sorted(self._routes)})
+        key = self._key(path, params)
+        body = self._cache.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return 200, body
+
+    def _miss(self, snapshot, path, params):
+        # Only reads the snapshot, so it can run in any thread
+        try:
+            return 200, self._compute(snapshot, path, params)
+        except (ValueError, KeyError) as error:
+            return 400, self._encode({'error': str(error.args[0]) if error.args else str(error)})
+
+    def _store(self, path, params, snapshot, status, body):
+        # Answers computed on a snapshot that was swapped out meanwhile are not cached
+        if status == 200 and snapshot is self.snapshot:
+            self._cache[self._key(path, params)] = body
+            self._evict()
+        return status, body
+
+    def _evict(self):
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _key(path, params):
+        return path, tuple(sorted((name, tuple(values)) for name, values in params.items()))
+
+    def _compute(self, snapshot, path, params):
+        return self._encode(self._routes[path](snapshot, params))
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(payload, default=_json_default, allow_nan=False).encode('utf-8')
+
+    def _status(self):
+        snapshot = self.snapshot
+        return {
+            'inputs': [path for path in self.paths if path is not None],
+            'generation': self.generation,
+            'rows': snapshot.rows,
+            'cube_cells': len(snapshot.cube),
+            'loaded_at': pd.Timestamp(snapshot.loaded_at, unit='s').isoformat(),
+            'cache': {'entries': len(self._cache), 'max_entries': self.cache_entries,
+                      'hits': self.hits, 'misses': self.misses},
+            'reload_error': self.reload_error,
+        }
+
+    @staticmethod
+    def _segments(snapshot, params):
+        return {'segments': _records(snapshot.cube.segment_table())}
+
+    @staticmethod
+    def _daily(snapshot, params):
+        daily = snapshot.daily
+        start = daily.offset(_value(params, 'start')) if 'start' in params else 0
+        end = daily.offset(_value(params, 'end')) if 'end' in params else len(daily) - 1
+        offsets = np.arange(start, end + 1)
+        table = daily.to_frame(offsets, name='TRANSACTIONS').assign(
+            HOLIDAY=daily.calendar['HOLIDAY'].to_numpy()[offsets])
+        return {'daily': _records(table)}
+
+    @staticmethod
+    def _ttest(snapshot, params):
+        from qvi.significance import MAINSTREAM_LIFESTAGES
+
+        result = snapshot.cube.ttest(lifestages=_values(params, 'lifestage', MAINSTREAM_LIFESTAGES),
+                                     group=_values(params, 'group', ('Mainstream',)),
+                                     other=_values(params, 'other', ('Budget', 'Premium')),
+                                     alternative=_value(params, 'alternative', 'greater'))
+        return {'ttest': result}
+
+    @staticmethod
+    def _affinity(snapshot, params):
+        dimension = _value(params, 'dimension', 'BRAND')
+        if dimension not in ('BRAND', 'PACK_SIZE'):
+            raise ValueError(f"Unknown affinity dimension {dimension!r}, expected BRAND or PACK_SIZE")
+        table = snapshot.cube.affinity(dimension, _value(params, 'lifestage', TARGET_LIFESTAGE),
+                                       _value(params, 'premium', TARGET_PREMIUM))
+        return {'affinity': _records(table.reset_index())}
+
+    @staticmethod
+    def _query(snapshot, params):
+        where = {name: [_dimension_value(value) for value in values] for name, values in params.items()
+                 if name not in ('by', 'start', 'end')}
+        table = snapshot.cube.query(list(_values(params, 'by', ())), where, _value(params, 'start'),
+                                    _value(params, 'end'))
+        return {'rows': _records(table)}
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection (HTTP/1.1 keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, body = 400, self._encode({'error': "Malformed request line"})
+                elif parts[0] != 'GET':
+                    status, body = 405, self._encode({'error': f"Method {parts[0]} not allowed"})
+                else:
+                    url = urlsplit(parts[1])
+                    try:
+                        status, body = await self.answer_async(url.path.rstrip('/') or '/', parse_qs(url.query))
+                    except Exception as error:  # keep serving: report the failure to the client
+                        status, body = 500, self._encode({'error': f"{type(error).__name__}: {error}"})
+                keep_alive = (len(parts) == 3 and parts[2] == 'HTTP/1.1'
+                              and headers.get('connection', '').lower() != 'close')
+                writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                             + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Dropped connections, and open keep-alive connections at shutdown
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self):
+        """Reload the inputs in a worker thread whenever they change."""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if not self.changed():
+                continue
+            try:
+                snapshot, answers = await asyncio.to_thread(self.prepare)
+            except Exception as error:  # keep answering from the previous snapshot
+                self.reload_error = f"{type(error).__name__}: {error}"
+                print(f"Reload failed, still serving generation {self.generation}: {self.reload_error}",
+                      file=sys.stderr)
+                # Do not retry until the inputs change again
+                self.snapshot.stamps = input_stamps(self.paths)
+                continue
+            self.swap(snapshot, answers)
+            print(f"Reloaded the inputs (generation {self.generation}, {snapshot.rows} rows)", file=sys.stderr)
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """Load the inputs, then serve until cancelled; ``ready`` (an ``asyncio.Event``) is set once listening."""
+        if self.snapshot is None:
+            await asyncio.to_thread(self.load)
+        server = await asyncio.start_server(self.handle, host, port)
+        watcher = asyncio.create_task(self.watch()) if self.reload_interval > 0 else None
+        address = server.sockets[0].getsockname()
+        print(f"Serving {self.snapshot.rows} transactions on http://{address[0]}:{address[1]}", file=sys.stderr)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve segment metrics, daily counts, t-tests and affinities "
+                                                 "as JSON over local HTTP.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--product-rules', default=None, metavar='PATH')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--cache-entries', type=int, default=DEFAULT_CACHE_ENTRIES,
+                        help="answers kept in the in-memory cache")
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="seconds between checks of the inputs (0 disables the hot reload)")
+    parser.add_argument('--no-cache', action='store_true', help="do not use the transaction cache")
+    args = parser.parse_args(argv)
+
+    service = QueryService(args.transactions, args.customers, args.product_rules, not args.no_cache,
+                           args.cache_entries, args.reload_interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Statistical significance of price-per-unit differences (section VII.E).
+
+Welch's t-test only needs the count, mean and variance of each group, so
+these sufficient statistics are computed for every segment in one pass and
+every test -- the section VII.E comparison as well as all pairwise segment
+comparisons -- is run from them without touching the rows again.  Bootstrap
+confidence intervals resample the distinct prices with multinomial counts,
+which is exact and independent of the number of transactions.
+
+scipy is imported only when a test is actually run.
+"""
+import numpy as np
+import pandas as pd
+
+from qvi.segments import SEGMENT_COLUMNS, segment_codes
+
+MAINSTREAM_LIFESTAGES = ("YOUNG SINGLES/COUPLES", "MIDAGE SINGLES/COUPLES")
+
+P_VALUE_CORRECTIONS = ('bonferroni', 'holm', 'fdr_bh', 'none')
+
+
+def price_per_unit(merged_data):
+    """Price per unit of every row, as float64."""
+    return merged_data['TOT_SALES'].to_numpy(dtype='float64') / merged_data['PROD_QTY'].to_numpy()
+
+
+def segment_moments(merged_data, values=None):
+    """Count, mean and variance (ddof=1) of ``values`` per segment, in one pass.
+
+    ``values`` defaults to the price per unit.  Rows without a segment or
+    with a missing value are ignored.
+    """
+    values = price_per_unit(merged_data) if values is None else np.asarray(values, dtype='float64')
+    codes, labels = segment_codes(merged_data)
+    n_segments = len(labels)
+    # Invalid rows go to an extra bin that is dropped, which avoids copying the valid rows
+    codes[(codes < 0) | np.isnan(values)] = n_segments
+
+    # Shifting by a typical value keeps sum(x^2) - n mean^2 accurate (prices are all close)
+    shift = np.nan_to_num(np.nanmedian(values[:1000])) if len(values) else 0.0
+    values = values - shift
+    counts = np.bincount(codes, minlength=n_segments + 1)[:n_segments]
+    sums = np.bincount(codes, weights=values, minlength=n_segments + 1)[:n_segments]
+    squares = np.bincount(codes, weights=values * values, minlength=n_segments + 1)[:n_segments]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+        variances = (squares - sums * means) / (counts - 1)
+        means = means + shift
+
+    table = labels
+    table['N'] = counts
+    table['MEAN'] = means
+    table['VAR'] = variances
+    return table[table['N'] > 0].reset_index(drop=True)
+
+
+def pool_moments(moments):
+    """Count, mean and variance of the union of the groups in ``moments``."""
+    counts = moments['N'].to_numpy(dtype='float64')
+    means = moments['MEAN'].to_numpy()
+    n = counts.sum()
+    mean = (counts * means).sum() / n
+    squares = ((counts - 1) * np.nan_to_num(moments['VAR'].to_numpy()) + counts * (means - mean) ** 2).sum()
+    return int(n), mean, squares / (n - 1) if n > 1 else np.nan
+
+
+def welch_test(n1, mean1, var1, n2, mean2, var2, alternative='two-sided'):
+    """Welch's t-test from sufficient statistics; every argument may be an array."""
+    from scipy import stats
+
+    return stats.ttest_ind_from_stats(mean1, np.sqrt(var1), n1, mean2, np.sqrt(var2), n2,
+                                      equal_var=False, alternative=alternative)
+
+
+def adjust_p_values(p_values, method='holm'):
+    """Correct ``p_values`` for multiple comparisons (one of ``P_VALUE_CORRECTIONS``)."""
+    p_values = np.asarray(p_values, dtype='float64')
+    n = len(p_values)
+    if method == 'none' or n == 0:
+        return p_values
+    if method == 'bonferroni':
+        return np.minimum(p_values * n, 1.0)
+    order = np.argsort(p_values)
+    ranked = p_values[order]
+    if method == 'holm':
+        adjusted = np.maximum.accumulate(ranked * (n - np.arange(n)))
+    elif method == 'fdr_bh':
+        adjusted = np.minimum.accumulate((ranked * n / np.arange(1, n + 1))[::-1])[::-1]
+    else:
+        raise ValueError(f"Unknown p-value correction '{method}', expected one of {P_VALUE_CORRECTIONS}")
+    result = np.empty(n)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def pairwise_welch(moments, correction='holm', alternative='two-sided'):
+    """Welch's t-test between every pair of segments of :func:`segment_moments`.
+
+    All pairs are tested at once from the sufficient statistics; the
+    ``P_ADJUSTED`` column holds the p-values corrected with ``correction``.
+    """
+    first, second = np.triu_indices(len(moments), k=1)
+    n, mean, var = (moments[column].to_numpy() for column in ('N', 'MEAN', 'VAR'))
+    t_stat, p_value = welch_test(n[first], mean[first], var[first],
+                                 n[second], mean[second], var[second], alternative)
+    columns = {f'{column}_{side}': moments[column].to_numpy()[rows]
+               for side, rows in (('A', first), ('B', second)) for column in SEGMENT_COLUMNS}
+    return pd.DataFrame({**columns, 'MEAN_DIFF': mean[first] - mean[second], 'T_STAT': t_stat,
+                         'P_VALUE': p_value, 'P_ADJUSTED': adjust_p_values(p_value, correction)})
+
+
+def bootstrap_mean_ci(merged_data, n_resamples=2000, confidence=0.95, seed=None, values=None):
+    """Percentile bootstrap confidence interval of the mean of ``values`` per segment.
+
+    Resampling n rows with replacement is the same as drawing multinomial
+    counts over the distinct values, so each segment costs
+    ``n_resamples x distinct values`` instead of ``n_resamples x rows``.
+    """
+    values = price_per_unit(merged_data) if values is None else np.asarray(values, dtype='float64')
+    codes, labels = segment_codes(merged_data)
+    valid = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    rng = np.random.default_rng(seed)
+    tail = (1 - confidence) / 2
+
+    rows = []
+    for code in np.unique(codes):
+        distinct, counts = np.unique(values[codes == code], return_counts=True)
+        n = counts.sum()
+        resampled = rng.multinomial(n, counts / n, size=n_resamples)
+        means = resampled @ distinct / n
+        low, high = np.quantile(means, [tail, 1 - tail])
+        rows.append((code, n, (counts @ distinct) / n, low, high))
+    table = pd.DataFrame(rows, columns=['CODE', 'N', 'MEAN', 'CI_LOW', 'CI_HIGH'])
+    table = labels.iloc[table['CODE']].reset_index(drop=True).join(table.drop(columns='CODE'))
+    return table
+
+
+def price_per_unit_ttest(merged_data, lifestages=MAINSTREAM_LIFESTAGES, group=("Mainstream",),
+                         other=("Budget", "Premium"), alternative='greater', moments=None):
+    """Welch's t-test of the price per unit of ``group`` against ``other`` within ``lifestages``.
+
+    Both sides are pooled from the per-segment sufficient statistics
+    (``moments``, computed from ``merged_data`` when not given).  Returns a
+    dict with the t statistic, the p-value and the mean price of both groups,
+    or ``None`` when either group has no transactions.
+    """
+    moments = segment_moments(merged_data) if moments is None else moments
+    # A couple of dozen segments: plain numpy is cheaper than pandas indexing here
+    in_lifestages = np.isin(moments['LIFESTAGE'].to_numpy(), lifestages)
+    premium = moments['PREMIUM_CUSTOMER'].to_numpy()
+    group_moments = moments[in_lifestages & np.isin(premium, group)]
+    other_moments = moments[in_lifestages & np.isin(premium, other)]
+    if group_moments.empty or other_moments.empty:
+        return None
+
+    n_group, mean_group, var_group = pool_moments(group_moments)
+    n_other, mean_other, var_other = pool_moments(other_moments)
+    t_stat, p_value = welch_test(n_group, mean_group, var_group, n_other, mean_other, var_other, alternative)
+    return {'t_stat': float(t_stat), 'p_value': float(p_value),
+            'mean_group': mean_group, 'mean_other': mean_other,
+            'n_group': n_group, 'n_other': n_other}
@@ -0,0 +1,245 @@
+"""Incremental aggregate store, partitioned by DATE.
+
+Each absorbed day is reduced to one small partition of additive measures at
+the grain DATE x segment x BRAND x PACK_SIZE, and the distinct customers of
+each segment are kept as an exact sorted set of (segment, card) keys.  A new
+day of transactions only writes its own partition and merges its cards into
+the set, so the daily counts, the section VII segment table and the section
+VIII affinities are served without touching the raw history.
+
+Outlier cards are detected over every absorbed day: the per-card outlier
+statistics are kept in the store and combined with those of each new batch.
+A card flagged after some of its days were stored is left out of the
+customer set and the segment table, whose measures subtract its stored
+per-card totals; the daily counts and affinities still include the days
+absorbed before it was flagged, as the partitions keep no per-card rows.
+
+Usage::
+
+    python -m qvi.store STORE_DIR new_day_transactions.csv QVI_purchase_behaviour.csv
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from qvi.affinity import affinity_table, segment_affinities
+from qvi.cleaning import clean_transactions
+from qvi.loader import (CUSTOMER_FILE, columnar_extension, convert_excel_dates, load_customers,
+                        read_frame, write_frame)
+from qvi.lookup import CustomerIndex
+from qvi.outliers import card_statistics, combine_card_statistics, refresh_outliers
+from qvi.segments import SEGMENT_COLUMNS, add_derived_metrics
+from qvi.streaming import iter_transaction_chunks
+from qvi.timeseries import DailySeries
+
+STORE_VERSION = 2
+
+# Grain of the stored partitions (besides DATE)
+PARTITION_KEYS = SEGMENT_COLUMNS + ['BRAND', 'PACK_SIZE']
+
+# Customer keys are segment_index << 32 | card number
+_CARD_BITS = 32
+_CARD_MASK = (1 << _CARD_BITS) - 1
+
+
+class AggregateStore:
+    """On-disk store of daily aggregates that absorbs one partition at a time."""
+
+    def __init__(self, root):
+        self.root = root
+        self._manifest_path = os.path.join(root, 'manifest.json')
+        self._customers_path = os.path.join(root, 'customers.npy')
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding='utf-8') as handle:
+                self._manifest = json.load(handle)
+            if self._manifest.get('version') != STORE_VERSION:
+                raise ValueError(f"Aggregate store {root} has an unsupported version")
+        else:
+            self._manifest = {'version': STORE_VERSION, 'dates': {}, 'segments': [], 'excluded': []}
+
+    @property
+    def dates(self):
+        """Sorted list of the dates (``YYYY-MM-DD``) already in the store."""
+        return sorted(self._manifest['dates'])
+
+    def _partition_path(self, day):
+        return os.path.join(self.root, 'partitions', self._manifest['dates'][day])
+
+    def _customer_keys(self):
+        if not os.path.exists(self._customers_path):
+            return np.empty(0, dtype=np.int64)
+        return np.load(self._customers_path)
+
+    def _statistics_path(self, name):
+        return os.path.join(self.root, name + columnar_extension())
+
+    def _read_statistics(self, name):
+        path = self._statistics_path(name)
+        return read_frame(path).set_index('LYLTY_CARD_NBR') if os.path.exists(path) else None
+
+    def _write_statistics(self, name, statistics):
+        write_frame(statistics.reset_index(), self._statistics_path(name))
+
+    @property
+    def excluded(self):
+        """Sorted array of the outlier cards excluded from the store."""
+        return np.array(self._manifest['excluded'], dtype=np.int64)
+
+    def _withheld(self):
+        """Stored totals of the cards excluded after some of their days were absorbed, per segment.
+
+        ``None`` when no stored card was excluded later.
+        """
+        keys = self._customer_keys()
+        keys = keys[np.isin(keys & _CARD_MASK, self.excluded)]
+        if not len(keys):
+            return None
+        stored = self._read_statistics('stored_statistics')
+        withheld = stored.loc[keys & _CARD_MASK, ['TRANSACTIONS', 'SALES', 'UNITS']].rename(
+            columns={'UNITS': 'TOTAL_QTY'})
+        segments = self._manifest['segments']
+        withheld.index = pd.MultiIndex.from_tuples([tuple(segments[index]) for index in keys >> _CARD_BITS],
+                                                   names=SEGMENT_COLUMNS)
+        return withheld.groupby(level=SEGMENT_COLUMNS).sum()
+
+    def _segment_index(self, segments):
+        known = self._manifest['segments']
+        lookup = {tuple(segment): index for index, segment in enumerate(known)}
+        indexes = []
+        for segment in segments:
+            if segment not in lookup:
+                lookup[segment] = len(known)
+                known.append(list(segment))
+            indexes.append(lookup[segment])
+        return np.array(indexes, dtype=np.int64)
+
+    def absorb(self, merged_data, outlier_rules=None):
+        """Add cleaned and merged transactions for one or more new days.
+
+        ``merged_data`` needs the ``DATE``, segment, ``BRAND``, ``PACK_SIZE``,
+        ``TXN_ID``, ``PROD_QTY``, ``TOT_SALES`` and ``LYLTY_CARD_NBR`` columns
+        and still holds the outlier cards: they are detected here with
+        ``outlier_rules`` over every absorbed day.  Days that are already
+        stored raise a ``ValueError``: the distinct-customer sets cannot be
+        subtracted from, so a day is absorbed exactly once.
+        """
+        days = pd.to_datetime(merged_data['DATE']).dt.strftime('%Y-%m-%d')
+        already_stored = sorted(set(days.unique()) & set(self._manifest['dates']))
+        if already_stored:
+            raise ValueError(f"Dates already in the aggregate store: {', '.join(already_stored)}")
+        if merged_data.empty:
+            return []
+
+        statistics, excluded = refresh_outliers(self._read_statistics('card_statistics'), merged_data,
+                                                self.excluded, outlier_rules)
+        kept = ~merged_data['LYLTY_CARD_NBR'].isin(excluded).to_numpy()
+        merged_data, days = merged_data[kept], days[kept]
+        stored = [card_statistics(merged_data)]
+        previous = self._read_statistics('stored_statistics')
+        if previous is not None:
+            stored.insert(0, previous)
+
+        aggregates = (merged_data.assign(DAY=days.to_numpy())
+                      .groupby(['DAY'] + PARTITION_KEYS, observed=True, dropna=False)
+                      .agg(TRANSACTIONS=('PROD_QTY', 'size'), SALES=('TOT_SALES', 'sum'),
+                           TOTAL_QTY=('PROD_QTY', 'sum'))
+                      .reset_index())
+        aggregates['SALES'] = aggregates['SALES'].round(2)
+        for column in SEGMENT_COLUMNS + ['BRAND']:
+            aggregates[column] = aggregates[column].astype(str).where(aggregates[column].notna())
+
+        matched = merged_data[SEGMENT_COLUMNS].notna().all(axis=1).to_numpy()
+        pairs = merged_data.loc[matched, SEGMENT_COLUMNS + ['LYLTY_CARD_NBR']].drop_duplicates()
+        segments = pairs[SEGMENT_COLUMNS].astype(str)
+        segment_index = self._segment_index(list(zip(segments['LIFESTAGE'], segments['PREMIUM_CUSTOMER'])))
+        new_keys = (segment_index << _CARD_BITS) | pairs['LYLTY_CARD_NBR'].to_numpy().astype(np.int64)
+
+        for day, partition in aggregates.groupby('DAY'):
+            file_name = day + columnar_extension()
+            write_frame(partition.drop(columns='DAY'), os.path.join(self.root, 'partitions', file_name))
+            self._manifest['dates'][day] = file_name
+        np.save(self._customers_path, np.union1d(self._customer_keys(), new_keys))
+        self._write_statistics('card_statistics', statistics)
+        self._write_statistics('stored_statistics', combine_card_statistics(stored))
+        self._manifest['excluded'] = excluded.tolist()
+        with open(self._manifest_path, 'w', encoding='utf-8') as handle:
+            json.dump(self._manifest, handle, indent=2)
+        return sorted(aggregates['DAY'].unique())
+
+    def aggregates(self):
+        """All stored partitions as one frame (bounded by days x segments x brands x packs)."""
+        partitions = []
+        for day in self.dates:
+            partition = read_frame(self._partition_path(day))
+            partition.insert(0, 'DATE', pd.Timestamp(day))
+            partitions.append(partition)
+        if not partitions:
+            return pd.DataFrame(columns=['DATE'] + PARTITION_KEYS + ['TRANSACTIONS', 'SALES', 'TOTAL_QTY'])
+        aggregates = pd.concat(partitions, ignore_index=True)
+        aggregates['DATE'] = convert_excel_dates(aggregates['DATE'])
+        return aggregates
+
+    def daily_series(self, by=None):
+        """Daily transaction counts, per ``by`` column(s) if given, as a :class:`DailySeries`."""
+        return DailySeries.from_frame(self.aggregates(), by=by, weights='TRANSACTIONS')
+
+    def transactions_by_day(self):
+        """Daily transaction counts over the whole span, missing days included (``DATE``, ``N``)."""
+        return self.daily_series().to_frame().reset_index(drop=True)
+
+    def customers_by_segment(self):
+        """Exact number of distinct customers in each segment."""
+        keys = self._customer_keys()
+        segment_index = keys[~np.isin(keys & _CARD_MASK, self.excluded)] >> _CARD_BITS
+        counts = np.bincount(segment_index, minlength=len(self._manifest['segments']))
+        index = pd.MultiIndex.from_tuples([tuple(segment) for segment in self._manifest['segments']],
+                                          names=SEGMENT_COLUMNS)
+        return pd.Series(counts, index=index, name='CUSTOMERS')
+
+    def segment_table(self):
+        """Section VII segment metrics, as returned by :func:`qvi.segments.segment_metrics`."""
+        aggregates = self.aggregates().dropna(subset=SEGMENT_COLUMNS)
+        table = aggregates.groupby(SEGMENT_COLUMNS)[['TRANSACTIONS', 'SALES', 'TOTAL_QTY']].sum()
+        withheld = self._withheld()
+        if withheld is not None:
+            table = table.sub(withheld.reindex(table.index, fill_value=0))
+        table = table.astype({'TRANSACTIONS': 'int64', 'TOTAL_QTY': 'int64'})
+        table['SALES'] = table['SALES'].round(2)
+        table = table.join(self.customers_by_segment())
+        return add_derived_metrics(table).reset_index()
+
+    def affinity(self, dimension, lifestage, premium_customer):
+        """Section VIII affinity of one segment to ``BRAND`` or ``PACK_SIZE`` (Tables 8 and 9)."""
+        return affinity_table(self.aggregates(), dimension, lifestage, premium_customer,
+                              quantity='TOTAL_QTY')
+
+    def affinities(self, dimension):
+        """Section VIII affinities of every segment to ``dimension``."""
+        return segment_affinities(self.aggregates(), dimension, quantity='TOTAL_QTY')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Absorb new days of transactions into the "
+                                                 "incremental aggregate store.")
+    parser.add_argument('store')
+    parser.add_argument('transactions')
+    parser.add_argument('customers', nargs='?', default=CUSTOMER_FILE)
+    args = parser.parse_args(argv)
+
+    store = AggregateStore(args.store)
+    # A day may span several chunks, so the new days are absorbed together.
+    # Outlier cards are detected by the store over every absorbed day, not per batch.
+    transaction_data = clean_transactions(pd.concat(iter_transaction_chunks(args.transactions),
+                                                    ignore_index=True), outlier_customer_ids=[])
+    transaction_data = transaction_data[~transaction_data['DATE'].dt.strftime('%Y-%m-%d').isin(store.dates)]
+    merged_data = CustomerIndex(load_customers(args.customers)).attach(transaction_data)
+    new_days = store.absorb(merged_data)
+    print(f"Absorbed {len(new_days)} new day(s); the store now holds {len(store.dates)} day(s).")
+    print(store.segment_table().sort_values(by='SALES', ascending=False).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Trial vs control store matching over ``STORE_NBR``.
+
+The cleaned transactions are reduced to one store x month matrix per metric
+(total sales, distinct customers, transactions per customer) in a single
+pass of ``np.bincount``.  Every store pair is then scored at once on the
+pre-trial months:
+
+* the Pearson correlation of the two monthly series, for all pairs as one
+  matrix product of the standardized rows;
+* the magnitude distance ``1 - (|x_t - x_c| - min) / (max - min)``, where
+  ``min``/``max`` are taken over all candidate controls of the trial store in
+  the same month, averaged over the months.
+
+The score of a metric is ``weight * correlation + (1 - weight) * magnitude``
+and the control score averages the metrics.  Only stores with transactions in
+every pre-trial month are candidates.
+
+Usage::
+
+    python -m qvi.store_matching --trial 77 86 88 --top 5
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE
+
+STORE_METRICS = ('SALES', 'CUSTOMERS', 'TXN_PER_CUSTOMER')
+
+# Metrics the control stores are matched on, and the correlation weight of each score
+MATCH_METRICS = ('SALES', 'CUSTOMERS')
+CORRELATION_WEIGHT = 0.5
+
+# First month of the trial; the months before it are the pre-trial period
+TRIAL_START = '2019-02'
+
+
+def _distinct_counts(keys, values, n_keys):
+    """Number of distinct ``values`` per key (``keys`` in ``[0, n_keys)``, values < 2**32)."""
+    pairs = np.unique((keys.astype(np.int64) << 32) | values.astype(np.int64))
+    return np.bincount(pairs >> 32, minlength=n_keys)
+
+
+def store_month_matrices(transactions):
+    """Store x month matrices of :data:`STORE_METRICS` (plus ``TRANSACTIONS``).
+
+    Returns ``(stores, months, matrices)``: the sorted store numbers, the
+    monthly ``PeriodIndex`` spanning the data and a dict of 2-D arrays with
+    one row per store and one column per month.
+    """
+    stores, store_codes = np.unique(transactions['STORE_NBR'].to_numpy(), return_inverse=True)
+    dates = pd.DatetimeIndex(transactions['DATE'])
+    month_numbers = (dates.year * 12 + dates.month - 1).to_numpy()
+    first_month = int(month_numbers.min()) if len(month_numbers) else 0
+    n_months = int(month_numbers.max()) - first_month + 1 if len(month_numbers) else 0
+    months = pd.period_range(pd.Period(year=first_month // 12, month=first_month % 12 + 1, freq='M'),
+                             periods=n_months, freq='M')
+
+    shape = (len(stores), n_months)
+    n_cells = shape[0] * shape[1]
+    cells = store_codes * n_months + (month_numbers - first_month)
+    sales = np.bincount(cells, weights=transactions['TOT_SALES'].to_numpy(), minlength=n_cells)
+    customers = _distinct_counts(cells, transactions['LYLTY_CARD_NBR'].to_numpy(), n_cells)
+    transaction_counts = _distinct_counts(cells, transactions['TXN_ID'].to_numpy(), n_cells)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        txn_per_customer = np.where(customers > 0, transaction_counts / customers, np.nan)
+    matrices = {
+        'SALES': sales.round(2),
+        'CUSTOMERS': customers,
+        'TRANSACTIONS': transaction_counts,
+        'TXN_PER_CUSTOMER': txn_per_customer,
+    }
+    return stores, months, {metric: values.reshape(shape) for metric, values in matrices.items()}
+
+
+def monthly_store_metrics(transactions):
+    """Long table of the monthly metrics: ``STORE_NBR``, ``MONTH`` and one column per metric."""
+    stores, months, matrices = store_month_matrices(transactions)
+    table = pd.DataFrame({
+        'STORE_NBR': np.repeat(stores, len(months)),
+        'MONTH': np.tile(months, len(stores)),
+        **{metric: values.ravel() for metric, values in matrices.items()},
+    })
+    return table[table['TRANSACTIONS'] > 0].reset_index(drop=True)
+
+
+def correlation_matrix(matrix, rows=None):
+    """Pearson correlation of rows ``rows`` (default: all) with every row of ``matrix``.
+
+    Constant rows have no correlation (NaN).
+    """
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.sqrt((centered * centered).sum(axis=1, keepdims=True))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        standardized = centered / norms
+    trial = standardized if rows is None else standardized[rows]
+    return trial @ standardized.T
+
+
+def magnitude_matrix(matrix, rows=None):
+    """Magnitude similarity of rows ``rows`` (default: all) with every row, averaged over the columns.
+
+    Distances are scaled per trial row and column by the smallest and largest
+    distance to any row; identical distances for all rows score 1.
+    """
+    trial = matrix if rows is None else matrix[rows]
+    distances = np.abs(trial[:, None, :] - matrix[None, :, :])
+    low = distances.min(axis=1, keepdims=True)
+    spread = distances.max(axis=1, keepdims=True) - low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        similarity = np.where(spread > 0, 1 - (distances - low) / spread, 1.0)
+    return similarity.mean(axis=2)
+
+
+def score_controls(stores, months, matrices, trial_stores=None, metrics=MATCH_METRICS,
+                   weight=CORRELATION_WEIGHT, trial_start=TRIAL_START):
+    """Score every candidate control store of every trial store.
+
+    ``stores``, ``months`` and ``matrices`` come from
+    :func:`store_month_matrices`; only the months before ``trial_start`` are
+    used.  Returns one row per (trial, control) pair with the correlation,
+    magnitude and score of each metric and the overall ``SCORE``, best
+    controls first.  Trial stores default to every candidate store.
+    """
+    pre_trial = np.asarray(months < pd.Period(trial_start, freq='M'))
+    if not pre_trial.any():
+        raise ValueError(f"No pre-trial months before {trial_start}")
+    # Candidates: stores with transactions in every pre-trial month
+    candidates = (matrices['TRANSACTIONS'][:, pre_trial] > 0).all(axis=1)
+    candidate_stores = stores[candidates]
+    if trial_stores is None:
+        trial_stores = candidate_stores
+    trial_stores = np.asarray(trial_stores)
+    unknown = np.setdiff1d(trial_stores, candidate_stores)
+    if len(unknown):
+        raise ValueError("Trial stores without transactions in every pre-trial month: "
+                         + ', '.join(str(store) for store in unknown))
+    trial_rows = np.searchsorted(candidate_stores, trial_stores)
+
+    columns = {}
+    total = np.zeros((len(trial_rows), len(candidate_stores)))
+    for metric in metrics:
+        matrix = matrices[metric][candidates][:, pre_trial].astype(np.float64)
+        correlation = correlation_matrix(matrix, trial_rows)
+        magnitude = magnitude_matrix(matrix, trial_rows)
+        score = weight * correlation + (1 - weight) * magnitude
+        columns.update({f'{metric}_CORR': correlation, f'{metric}_MAGNITUDE': magnitude,
+                        f'{metric}_SCORE': score})
+        total += score
+
+    table = pd.DataFrame({
+        'TRIAL_STORE': np.repeat(trial_stores, len(candidate_stores)),
+        'CONTROL_STORE': np.tile(candidate_stores, len(trial_stores)),
+        **{name: values.ravel() for name, values in columns.items()},
+        'SCORE': (total / len(metrics)).ravel(),
+    })
+    table = table[table['TRIAL_STORE'] != table['CONTROL_STORE']]
+    return table.sort_values(['TRIAL_STORE', 'SCORE'], ascending=[True, False], kind='stable',
+                             ignore_index=True)
+
+
+def best_controls(scores, top=1):
+    """The ``top`` best control stores of every trial store in ``scores``."""
+    return scores.groupby('TRIAL_STORE', sort=False).head(top).reset_index(drop=True)
+
+
+def main(argv=None):
+    from qvi.pipeline import clean_stage, load_stage
+
+    parser = argparse.ArgumentParser(description="Find the control stores that best match trial stores "
+                                                 "over the pre-trial months.")
+    parser.add_argument('--transactions', default=TRANSACTION_FILE)
+    parser.add_argument('--customers', default=CUSTOMER_FILE)
+    parser.add_argument('--trial', type=int, nargs='+', default=None,
+                        help="trial store numbers (default: every store)")
+    parser.add_argument('--trial-start', default=TRIAL_START, help="first trial month (YYYY-MM)")
+    parser.add_argument('--metrics', nargs='+', default=list(MATCH_METRICS), choices=STORE_METRICS)
+    parser.add_argument('--weight', type=float, default=CORRELATION_WEIGHT,
+                        help="weight of the correlation in each metric score")
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    transaction_data, _ = load_stage(args.transactions, args.customers)
+    stores, months, matrices = store_month_matrices(clean_stage(transaction_data))
+    scores = score_controls(stores, months, matrices, args.trial, args.metrics, args.weight, args.trial_start)
+    print(best_controls(scores, args.top).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Streaming, chunked ingestion for transaction files larger than memory.
+
+Transactions are read in bounded-size chunks, each chunk is cleaned with the
+section III/IV rules from :mod:`qvi.cleaning` and folded into running
+aggregates.  Outlier cards are detected in a first pass that only keeps
+per-card statistics, so they are excluded from every chunk of the second.
+Only state bounded by the number of customers, days, segments, brands and
+pack sizes is kept, so peak memory does not grow with the number of
+transactions.
+
+Usage::
+
+    python -m qvi.streaming QVI_transaction_data.xlsx QVI_purchase_behaviour.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from qvi.cleaning import clean_transactions, remove_salsa
+from qvi.loader import CUSTOMER_FILE, TRANSACTION_FILE, TRANSACTION_SHEET, load_customers
+from qvi.lookup import CustomerIndex
+from qvi.outliers import card_statistics, combine_card_statistics, detect_outliers
+from qvi.product_rules import load_product_rules
+from qvi.products import build_product_dimension
+from qvi.segments import SEGMENT_COLUMNS, add_derived_metrics
+from qvi.timeseries import DailySeries
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Number of per-chunk card statistics collected before they are combined
+COMBINE_EVERY = 16
+
+
+def _iter_excel_chunks(path, sheet, chunksize):
+    # Imported here: openpyxl is only needed when streaming a workbook
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = list(next(rows))
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def _iter_parquet_chunks(path, chunksize):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def iter_transaction_chunks(path=TRANSACTION_FILE, chunksize=DEFAULT_CHUNKSIZE,
+                            sheet=TRANSACTION_SHEET):
+    """Yield the raw transactions of ``path`` as DataFrames of at most ``chunksize`` rows.
+
+    ``.xlsx`` workbooks are read row by row with openpyxl in read-only mode;
+    ``.csv`` and ``.parquet`` extracts are read natively in batches.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return _iter_excel_chunks(path, sheet, chunksize)
+    if extension == '.parquet':
+        return _iter_parquet_chunks(path, chunksize)
+    if extension == '.csv':
+        return iter(pd.read_csv(path, chunksize=chunksize))
+    raise ValueError(f"Unsupported transaction file type: {path}")
+
+
+def scan_outliers(transaction_path=TRANSACTION_FILE, chunksize=DEFAULT_CHUNKSIZE, outlier_rules=None,
+                  product_rules=None):
+    """Outlier audit table of a whole file, computed chunk by chunk.
+
+    The per-card statistics of the chunks are combined in one pass every
+    :data:`COMBINE_EVERY` chunks, so the state stays bounded by the number of
+    cards times that many chunks.  A file without rows has no outliers.
+    Products excluded by ``product_rules`` are left out of the statistics.
+    """
+    partials = []
+    for raw_chunk in iter_transaction_chunks(transaction_path, chunksize):
+        products = build_product_dimension(raw_chunk['PROD_NAME'], rules=product_rules)
+        partials.append(card_statistics(remove_salsa(raw_chunk, products)))
+        if len(partials) == COMBINE_EVERY:
+            partials = [combine_card_statistics(partials)]
+    if not partials:
+        partials = [card_statistics(pd.DataFrame(columns=['LYLTY_CARD_NBR', 'TXN_ID', 'PROD_QTY', 'TOT_SALES']))]
+    return detect_outliers(combine_card_statistics(partials), outlier_rules)
+
+
+class StreamingAggregates:
+    """Running section VII aggregates folded chunk by chunk.
+
+    Distinct customers are tracked with one flag per row of the customer
+    table, so the state is bounded by the number of customers rather than by
+    the number of transactions.
+    """
+
+    def __init__(self, customer_data, product_rules=None):
+        self._index = CustomerIndex(customer_data)
+        self._product_rules = product_rules
+        self._seen = np.zeros(len(self._index), dtype=bool)
+        self.segment_totals = None
+        self.brand_qty = None
+        self.pack_qty = None
+        self.daily_counts = pd.Series(dtype='int64')
+        self.rows_read = 0
+        self.rows_kept = 0
+        self.unmatched_rows = 0
+        self.outlier_audit = None
+
+    @staticmethod
+    def _fold(total, partial):
+        return partial if total is None else total.add(partial, fill_value=0)
+
+    def add_chunk(self, raw_chunk, outlier_customer_ids=()):
+        """Clean one raw chunk and fold it into the running aggregates."""
+        self.rows_read += len(raw_chunk)
+        if raw_chunk.empty:
+            # e.g. the untyped chunk read from a CSV file with only a header
+            return
+        chunk = clean_transactions(raw_chunk, outlier_customer_ids, product_rules=self._product_rules)
+        self.rows_kept += len(chunk)
+
+        self.daily_counts = self.daily_counts.add(chunk['DATE'].value_counts(), fill_value=0)
+
+        positions = self._index.positions(chunk['LYLTY_CARD_NBR'].to_numpy())
+        matched = positions >= 0
+        self.unmatched_rows += int((~matched).sum())
+        self._seen[positions[matched]] = True
+
+        chunk = self._index.attach(chunk[matched])
+
+        by_segment = chunk.groupby(SEGMENT_COLUMNS, observed=True)
+        self.segment_totals = self._fold(self.segment_totals, pd.DataFrame({
+            'TRANSACTIONS': by_segment.size(),
+            'SALES': by_segment['TOT_SALES'].sum(),
+            'TOTAL_QTY': by_segment['PROD_QTY'].sum(),
+        }))
+        self.brand_qty = self._fold(
+            self.brand_qty, chunk.groupby(SEGMENT_COLUMNS + ['BRAND'], observed=True)['PROD_QTY'].sum())
+        self.pack_qty = self._fold(
+            self.pack_qty, chunk.groupby(SEGMENT_COLUMNS + ['PACK_SIZE'], observed=True)['PROD_QTY'].sum())
+
+    def customers_by_segment(self):
+        """Number of distinct customers seen so far in each segment."""
+        seen = pd.DataFrame({column: pd.Categorical.from_codes(self._index.codes[column][self._seen],
+                                                               self._index.categories[column])
+                             for column in SEGMENT_COLUMNS})
+        return seen.groupby(SEGMENT_COLUMNS, observed=True).size().rename('CUSTOMERS')
+
+    def segment_table(self):
+        """Tidy table with the section VII metrics (Tables 3-6) for every segment."""
+        table = self.segment_totals
+        if table is None:
+            # No chunk folded yet
+            table = pd.DataFrame(columns=['TRANSACTIONS', 'SALES', 'TOTAL_QTY'], dtype='float64',
+                                 index=pd.MultiIndex.from_arrays([[], []], names=SEGMENT_COLUMNS))
+        # Folding with fill_value turns the integer counts into floats
+        table = table.astype({'TOTAL_QTY': 'int64', 'TRANSACTIONS': 'int64'})
+        table['SALES'] = table['SALES'].round(2)
+        table = table.join(self.customers_by_segment())
+        return add_derived_metrics(table).reset_index()
+
+    def daily_series(self):
+        """The daily transaction counts as a :class:`qvi.timeseries.DailySeries`."""
+        return DailySeries.from_dates(self.daily_counts.index.to_numpy(),
+                                      weights=self.daily_counts.to_numpy(dtype='float64'))
+
+    def transactions_by_day(self):
+        """Daily transaction counts over the whole span, missing days included (``DATE``, ``N``)."""
+        return self.daily_series().to_frame().reset_index(drop=True)
+
+
+def stream_aggregates(transaction_path=TRANSACTION_FILE, customer_path=CUSTOMER_FILE,
+                      chunksize=DEFAULT_CHUNKSIZE, outlier_customer_ids=None, outlier_rules=None,
+                      product_rules=None):
+    """Stream ``transaction_path`` chunk by chunk and return its :class:`StreamingAggregates`.
+
+    Unless ``outlier_customer_ids`` is given, the file is read twice: once to
+    detect the outlier cards (see :func:`scan_outliers`) and once to aggregate.
+    The audit table is kept as the ``outlier_audit`` attribute.  Every chunk
+    is cleaned with ``product_rules`` (the default rules when ``None``).
+    """
+    aggregates = StreamingAggregates(load_customers(customer_path), product_rules)
+    if outlier_customer_ids is None:
+        aggregates.outlier_audit = scan_outliers(transaction_path, chunksize, outlier_rules, product_rules)
+        outlier_customer_ids = aggregates.outlier_audit['LYLTY_CARD_NBR'].to_numpy()
+    for raw_chunk in iter_transaction_chunks(transaction_path, chunksize):
+        aggregates.add_chunk(raw_chunk, outlier_customer_ids)
+    return aggregates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream the QVI transactions in bounded-size chunks "
+                                                 "and print the segment aggregates.")
+    parser.add_argument('transactions', nargs='?', default=TRANSACTION_FILE)
+    parser.add_argument('customers', nargs='?', default=CUSTOMER_FILE)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--product-rules', default=None, metavar='PATH',
+                        help="JSON file of product exclusion, brand alias and pack size rules")
+    args = parser.parse_args(argv)
+
+    aggregates = stream_aggregates(args.transactions, args.customers, args.chunksize,
+                                   product_rules=load_product_rules(args.product_rules))
+    print(f"Rows read: {aggregates.rows_read}, rows kept after cleaning: {aggregates.rows_kept}")
+    print(f"Rows without customer information: {aggregates.unmatched_rows}")
+    print("\n--- Outlier cards removed ---")
+    print(aggregates.outlier_audit.to_string(index=False))
+    print("\n--- Segment metrics (Tables 3-6) ---")
+    print(aggregates.segment_table().sort_values(by='SALES', ascending=False).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Synthetic QVI-shaped transaction and customer data at any scale.
+
+Scale 1 matches the size of the real extract (about 265k transactions,
+72.6k customers, 272 stores, one year of days); every count grows linearly
+with the scale.  The distributions mimic the real data: segment shares of
+the customer file, a skewed number of purchases per customer, baskets of
+one to a few rows sharing a ``TXN_ID``, mostly 2-packet purchases,
+per-product unit prices, Christmas Day closed, and a few bulk-buying
+outlier cards.  Transactions are generated and written in
+chunks, so 100M+ row files never have to fit in memory.
+
+Usage::
+
+    python -m qvi.synthetic --scale 10 --out synthetic
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Size of the real extract, i.e. of scale 1
+TRANSACTIONS_PER_SCALE = 264_836
+CUSTOMERS_PER_SCALE = 72_637
+STORES = 272
+
+FIRST_DAY = np.datetime64('2018-07-01')
+DAYS = 365
+CLOSED_DAYS = (np.datetime64('2018-12-25'),)
+EXCEL_EPOCH_DAY = np.datetime64('1899-12-30')
+
+# Share of customers in each LIFESTAGE x PREMIUM_CUSTOMER segment (real customer file)
+SEGMENT_SHARES = {
+    ('MIDAGE SINGLES/COUPLES', 'Budget'): 0.0207, ('MIDAGE SINGLES/COUPLES', 'Mainstream'): 0.0460,
+    ('MIDAGE SINGLES/COUPLES', 'Premium'): 0.0335, ('NEW FAMILIES', 'Budget'): 0.0153,
+    ('NEW FAMILIES', 'Mainstream'): 0.0117, ('NEW FAMILIES', 'Premium'): 0.0081,
+    ('OLDER FAMILIES', 'Budget'): 0.0644, ('OLDER FAMILIES', 'Mainstream'): 0.0390,
+    ('OLDER FAMILIES', 'Premium'): 0.0313, ('OLDER SINGLES/COUPLES', 'Budget'): 0.0679,
+    ('OLDER SINGLES/COUPLES', 'Mainstream'): 0.0679, ('OLDER SINGLES/COUPLES', 'Premium'): 0.0654,
+    ('RETIREES', 'Budget'): 0.0613, ('RETIREES', 'Mainstream'): 0.0892, ('RETIREES', 'Premium'): 0.0533,
+    ('YOUNG FAMILIES', 'Budget'): 0.0553, ('YOUNG FAMILIES', 'Mainstream'): 0.0376,
+    ('YOUNG FAMILIES', 'Premium'): 0.0335, ('YOUNG SINGLES/COUPLES', 'Budget'): 0.0520,
+    ('YOUNG SINGLES/COUPLES', 'Mainstream'): 0.1113, ('YOUNG SINGLES/COUPLES', 'Premium'): 0.0354,
+}
+
+# PROD_NBR -> (PROD_NAME, price per packet); names keep the raw extract's spacing
+PRODUCTS = {
+    1: ("Smiths Crinkle Cut  Chips Barbecue 170g", 2.9),
+    2: ("Cobs Popd Sour Crm  &Chives Chips 110g", 3.8),
+    3: ("Kettle Tortilla ChpsHny&Jlpno Chili 150g", 4.6),
+    4: ("Dorito Corn Chp     Supreme 380g", 6.5),
+    5: ("Natural Chip        Compny SeaSalt175g", 3.0),
+    6: ("RRD Lime & Pepper   165g", 3.0),
+    7: ("Smiths Crinkle      Original 330g", 5.7),
+    8: ("Smiths Chip Thinly  Cut Original 175g", 3.0),
+    9: ("Kettle Tortilla ChpsBtroot&Ricotta 150g", 4.6),
+    10: ("RRD SR Slow Rst     Pork Belly 150g", 2.7),
+    11: ("WW Original Stacked Chips 160g", 1.9),
+    12: ("Natural Chip Co     Tmato Hrb&Spce 175g", 3.0),
+    13: ("Red Rock Deli Thai  Chilli&Lime 150g", 2.7),
+    14: ("Smiths Crnkle Chip  Orgnl Big Bag 380g", 5.9),
+    15: ("Twisties Cheese     270g", 4.6),
+    16: ("Smiths Crinkle Chips Salt & Vinegar 330g", 5.7),
+    17: ("Kettle Sensations   BBQ&Maple 150g", 4.6),
+    18: ("Cheetos Chs & Bacon Balls 190g", 3.3),
+    19: ("Old El Paso Salsa   Dip Tomato Mild 300g", 5.1),
+    20: ("Doritos Corn Chip Southern Chicken 150g", 3.9),
+    21: ("Grain Waves Sour    Cream&Chives 210G", 3.6),
+    22: ("Infzns Crn Crnchers Tangy Gcamole 110g", 3.8),
+    23: ("Tyrrells Crisps     Ched & Chives 165g", 4.2),
+    24: ("Snbts Whlgrn Crisps Cheddr&Mstrd 90g", 1.7),
+    25: ("CCs Nacho Cheese    175g", 2.1),
+    26: ("Thins Chips Light&  Tangy 175g", 3.3),
+    27: ("Woolworths Mild     Salsa 300g", 1.5),
+    28: ("Pringles Sthrn FriedChicken 134g", 3.7),
+    29: ("French Fries Potato Chips 175g", 3.0),
+    30: ("Burger Rings 220g", 2.3),
+}
+
+# Rows per basket (one TXN_ID, card and day) and their probabilities
+BASKET_SIZES = (1, 2, 3, 4)
+BASKET_SIZE_PROBABILITIES = (0.70, 0.20, 0.07, 0.03)
+
+# Packets per transaction and their probabilities (PROD_QTY 200 only for outliers)
+QUANTITIES = (1, 2, 3, 4, 5)
+QUANTITY_PROBABILITIES = (0.10, 0.87, 0.015, 0.01, 0.005)
+
+# Price multiplier per premium segment, so the section VII.E test has an effect to find
+PREMIUM_PRICE_FACTOR = {'Budget': 0.98, 'Mainstream': 1.03, 'Premium': 0.99}
+
+# Bulk-buying cards per unit of scale, each with two transactions of OUTLIER_QTY packets
+OUTLIERS_PER_SCALE = 1
+OUTLIER_QTY = 200
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+
+def card_block(scale):
+    """Card numbers of store ``s`` are ``s * card_block + k`` (1000 at scale 1, as in the real file)."""
+    return 1000 * max(1, int(np.ceil(scale)))
+
+
+def generate_customers(scale=1.0, seed=0):
+    """The customer table (``LYLTY_CARD_NBR``, ``LIFESTAGE``, ``PREMIUM_CUSTOMER``) at ``scale``."""
+    rng = np.random.default_rng(seed)
+    n_customers = max(1, int(round(CUSTOMERS_PER_SCALE * scale)))
+    stores = np.sort(rng.integers(1, STORES + 1, n_customers))
+    # Position of each customer within its store
+    first_of_store = np.searchsorted(stores, stores, side='left')
+    cards = stores.astype(np.int64) * card_block(scale) + (np.arange(n_customers) - first_of_store)
+
+    segments = list(SEGMENT_SHARES)
+    shares = np.array(list(SEGMENT_SHARES.values()))
+    chosen = rng.choice(len(segments), n_customers, p=shares / shares.sum())
+    lifestages, premiums = zip(*segments)
+    return pd.DataFrame({
+        'LYLTY_CARD_NBR': cards,
+        'LIFESTAGE': np.asarray(lifestages, dtype=object)[chosen],
+        'PREMIUM_CUSTOMER': np.asarray(premiums, dtype=object)[chosen],
+    })
+
+
+def iter_transactions(customers, scale=1.0, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield the raw transaction table at ``scale`` in chunks of ``chunksize`` rows.
+
+    Chunks use the raw layout of the workbook (``DATE`` as Excel serial
+    days).  Each chunk has its own random stream, so the output only depends
+    on ``seed`` and ``chunksize``.
+    """
+    n_rows = max(1, int(round(TRANSACTIONS_PER_SCALE * scale)))
+    rng = np.random.default_rng(seed)
+    # Purchase frequency per customer: skewed, as in the real data
+    activity = rng.gamma(shape=1.5, scale=1.0, size=len(customers))
+    activity_cdf = np.cumsum(activity / activity.sum())
+    cards = customers['LYLTY_CARD_NBR'].to_numpy()
+    price_factor = customers['PREMIUM_CUSTOMER'].map(PREMIUM_PRICE_FACTOR).to_numpy()
+
+    open_days = FIRST_DAY + np.arange(DAYS)
+    open_days = open_days[~np.isin(open_days, np.array(CLOSED_DAYS))]
+    serial_days = (open_days - EXCEL_EPOCH_DAY).astype(np.int64)
+
+    prod_nbrs = np.array(list(PRODUCTS))
+    prod_names = np.array([name for name, _ in PRODUCTS.values()], dtype=object)
+    prices = np.array([price for _, price in PRODUCTS.values()])
+    popularity = rng.dirichlet(np.full(len(PRODUCTS), 4.0))
+
+    outlier_cards = rng.choice(cards, max(1, int(round(OUTLIERS_PER_SCALE * scale))), replace=False)
+    n_outlier_rows = 2 * len(outlier_cards)
+
+    for chunk_number, start in enumerate(range(0, n_rows, chunksize)):
+        size = min(chunksize, n_rows - start)
+        chunk_rng = np.random.default_rng([seed, chunk_number])
+        basket_sizes = chunk_rng.choice(BASKET_SIZES, size, p=BASKET_SIZE_PROBABILITIES)
+        count = min(n_outlier_rows, size) if chunk_number == 0 else 0
+        # The outliers' bulk purchases are baskets of their own
+        basket_sizes[:count] = 1
+        n_baskets = int(np.searchsorted(np.cumsum(basket_sizes), size)) + 1
+        basket = np.repeat(np.arange(n_baskets), basket_sizes[:n_baskets])[:size]
+        # The rows of a basket share its customer and day
+        customer = np.minimum(np.searchsorted(activity_cdf, chunk_rng.random(n_baskets)), len(cards) - 1)[basket]
+        day = chunk_rng.choice(serial_days, n_baskets)[basket]
+        product = chunk_rng.choice(len(PRODUCTS), size, p=popularity)
+        qty = chunk_rng.choice(QUANTITIES, size, p=QUANTITY_PROBABILITIES)
+        card = cards[customer]
+        # The outliers' bulk purchases open the file, like card 226000 in the real extract
+        card[:count] = np.repeat(outlier_cards, 2)[:count]
+        qty[:count] = OUTLIER_QTY
+        unit_price = prices[product] * price_factor[customer] * chunk_rng.uniform(0.95, 1.05, size)
+        yield pd.DataFrame({
+            'DATE': day,
+            'STORE_NBR': card // card_block(scale),
+            'LYLTY_CARD_NBR': card,
+            # A chunk has at most as many baskets as rows, so the ids stay unique across chunks
+            'TXN_ID': start + 1 + basket,
+            'PROD_NBR': prod_nbrs[product],
+            'PROD_NAME': prod_names[product],
+            'PROD_QTY': qty,
+            'TOT_SALES': np.round(qty * unit_price, 2),
+        })
+
+
+def write_dataset(out_dir, scale=1.0, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """Write ``transactions.parquet`` and ``customers.csv`` at ``scale`` to ``out_dir``.
+
+    Returns the two paths.  The transactions are streamed to Parquet one
+    chunk (row group) at a time.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(out_dir, exist_ok=True)
+    customers = generate_customers(scale, seed)
+    customer_path = os.path.join(out_dir, 'customers.csv')
+    customers.to_csv(customer_path, index=False)
+
+    transaction_path = os.path.join(out_dir, 'transactions.parquet')
+    partial_path = transaction_path + '.tmp'
+    writer = None
+    try:
+        for chunk in iter_transactions(customers, scale, seed, chunksize):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(partial_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(partial_path, transaction_path)
+    return transaction_path, customer_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic QVI-shaped dataset.")
+    parser.add_argument('--scale', type=float, default=1.0, help="1 = the size of the real extract")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--out', default='synthetic')
+    args = parser.parse_args(argv)
+
+    transaction_path, customer_path = write_dataset(args.out, args.scale, args.seed, args.chunksize)
+    print(f"Wrote {transaction_path} and {customer_path}")
+
+
+if __name__ == '__main__':
+    main()
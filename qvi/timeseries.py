@@ -0,0 +1,193 @@
+"""Dense daily time series over the actual date span of the data (section III.D).
+
+A :class:`DailySeries` holds one value per day (or one column of days per
+key, e.g. per segment or per store) in a NumPy array addressed by day
+offset from the first date, together with a calendar computed once for the
+span.  Gap detection, month slices and rolling windows are integer offset
+operations on these arrays instead of date-range merges and ``.dt``
+accessors.
+"""
+import numpy as np
+import pandas as pd
+
+from qvi.schema import TRANSACTION_SCHEMA
+
+# Fixed-date Australian national public holidays, (month, day) -> name
+FIXED_HOLIDAYS = {
+    (1, 1): "New Year's Day",
+    (1, 26): "Australia Day",
+    (4, 25): "Anzac Day",
+    (12, 25): "Christmas Day",
+    (12, 26): "Boxing Day",
+}
+
+_DAY = np.timedelta64(1, 'D')
+
+
+def easter_sunday(year):
+    """Date of Easter Sunday in ``year`` (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    j = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * j) // 451
+    month, day = divmod(h + j - 7 * m + 114, 31)
+    return np.datetime64(f'{year:04d}-{month:02d}-{day + 1:02d}')
+
+
+def build_calendar(start, n_days):
+    """Calendar of ``n_days`` days from ``start``: one row per day offset.
+
+    Columns: ``DATE``, ``YEAR``, ``MONTH``, ``DAY``, ``WEEK`` (ISO week),
+    ``DAY_OF_WEEK`` (Monday = 0) and ``HOLIDAY`` (name, empty when none).
+    """
+    days = np.datetime64(start, 'D') + np.arange(n_days) * _DAY
+    dates = pd.DatetimeIndex(days).astype(TRANSACTION_SCHEMA['DATE'])
+    calendar = pd.DataFrame({
+        'DATE': dates,
+        'YEAR': dates.year.to_numpy(dtype='int16'),
+        'MONTH': dates.month.to_numpy(dtype='int8'),
+        'DAY': dates.day.to_numpy(dtype='int8'),
+        'WEEK': dates.isocalendar()['week'].to_numpy(dtype='int8'),
+        'DAY_OF_WEEK': dates.dayofweek.to_numpy(dtype='int8'),
+    })
+    holidays = np.full(n_days, '', dtype=object)
+    for (month, day), name in FIXED_HOLIDAYS.items():
+        holidays[(calendar['MONTH'].to_numpy() == month) & (calendar['DAY'].to_numpy() == day)] = name
+    for year in np.unique(calendar['YEAR']):
+        easter = easter_sunday(int(year))
+        for offset_from_easter, name in ((-2, "Good Friday"), (1, "Easter Monday")):
+            offset = int((easter + offset_from_easter * _DAY - np.datetime64(start, 'D')) // _DAY)
+            if 0 <= offset < n_days:
+                holidays[offset] = name
+    calendar['HOLIDAY'] = holidays
+    return calendar
+
+
+class DailySeries:
+    """Dense per-day values from ``start``, one column per key.
+
+    ``values`` has shape ``(n_days, n_keys)``; row ``i`` is the day
+    ``start + i``.  ``keys`` labels the columns (a single unnamed key for an
+    overall series).
+    """
+
+    def __init__(self, start, values, keys=None):
+        self.start = np.datetime64(start, 'D')
+        values = np.asarray(values)
+        # Not reshape(len, -1), which cannot infer the key count of an empty series
+        self.values = values.reshape(len(values), int(np.prod(values.shape[1:])))
+        self.keys = pd.RangeIndex(self.values.shape[1]) if keys is None else keys
+        self._calendar = None
+
+    @classmethod
+    def from_dates(cls, dates, codes=None, keys=None, weights=None, start=None, end=None):
+        """Count (or sum ``weights``) per day, and per key when ``codes`` is given.
+
+        The span is the actual span of ``dates`` unless ``start``/``end``
+        widen it.  ``codes`` are integer key positions (0 .. len(keys) - 1).
+        Without dates the span is only ``start``/``end``, and the series is
+        empty when neither is given.
+        """
+        days = np.asarray(dates, dtype='datetime64[D]')
+        n_keys = 1 if codes is None else len(keys)
+        if len(days):
+            first, last = days.min(), days.max()
+        elif start is None and end is None:
+            return cls(np.datetime64('NaT', 'D'),
+                       np.zeros((0, n_keys), dtype=np.int64 if weights is None else np.float64), keys)
+        else:
+            first = last = np.datetime64(start if start is not None else end, 'D')
+        if start is not None:
+            first = min(first, np.datetime64(start, 'D'))
+        if end is not None:
+            last = max(last, np.datetime64(end, 'D'))
+        n_days = int((last - first) // _DAY) + 1
+        offsets = ((days - first) // _DAY).astype(np.int64)
+        if codes is not None:
+            offsets = offsets * n_keys + np.asarray(codes, dtype=np.int64)
+        counts = np.bincount(offsets, weights=weights, minlength=n_days * n_keys)
+        return cls(first, counts.reshape(n_days, n_keys), keys)
+
+    @classmethod
+    def from_frame(cls, frame, by=None, weights=None, date_column='DATE'):
+        """Daily counts of ``frame`` rows (or sums of column ``weights``), per ``by`` group.
+
+        ``by`` is a column or list of columns, e.g. ``'STORE_NBR'`` or
+        ``['LIFESTAGE', 'PREMIUM_CUSTOMER']``; rows with a missing key are
+        ignored.
+        """
+        weight_values = None if weights is None else frame[weights].to_numpy(dtype='float64')
+        if by is None:
+            return cls.from_dates(frame[date_column].to_numpy(), weights=weight_values)
+        groups = frame.groupby(by, observed=True, sort=True)
+        codes = groups.ngroup().to_numpy()
+        keep = codes >= 0
+        return cls.from_dates(frame[date_column].to_numpy()[keep], codes[keep],
+                              groups.size().index, None if weight_values is None else weight_values[keep])
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def end(self):
+        return self.start + (len(self) - 1) * _DAY
+
+    @property
+    def calendar(self):
+        """The :func:`build_calendar` of the span, built on first use."""
+        if self._calendar is None:
+            self._calendar = build_calendar(self.start, len(self))
+        return self._calendar
+
+    @property
+    def totals(self):
+        """Per-day values summed over all keys."""
+        return self.values.sum(axis=1)
+
+    def offset(self, date):
+        """Row of ``date``; raises ``KeyError`` outside the span."""
+        offset = int((np.datetime64(date, 'D') - self.start) // _DAY)
+        if not 0 <= offset < len(self):
+            raise KeyError(f"{date} is outside {self.start} .. {self.end}")
+        return offset
+
+    def date(self, offset):
+        return pd.Timestamp(self.start + int(offset) * _DAY)
+
+    def gap_offsets(self, key=None):
+        """Offsets of the days without any value (for ``key``, or over all keys)."""
+        values = self.totals if key is None else self.values[:, self.keys.get_loc(key)]
+        return np.flatnonzero(values == 0)
+
+    def month_offsets(self, month, year=None):
+        """Offsets of the days of ``month`` (of every year in the span unless ``year``)."""
+        selected = self.calendar['MONTH'].to_numpy() == month
+        if year is not None:
+            selected &= self.calendar['YEAR'].to_numpy() == year
+        return np.flatnonzero(selected)
+
+    def rolling_sum(self, window):
+        """Trailing ``window``-day sums per key; the first ``window - 1`` rows are partial."""
+        if window < 1:
+            raise ValueError(f"The rolling window must be at least one day, got {window}")
+        cumulative = np.cumsum(self.values, axis=0, dtype='float64')
+        shifted = np.zeros_like(cumulative)
+        shifted[window:] = cumulative[:-window]
+        return cumulative - shifted
+
+    def to_frame(self, offsets=None, name='N'):
+        """``DATE`` / ``name`` table of the day totals, indexed by day offset."""
+        offsets = np.arange(len(self)) if offsets is None else np.asarray(offsets)
+        totals = self.totals[offsets]
+        if np.issubdtype(totals.dtype, np.floating) and np.all(totals == np.round(totals)):
+            totals = totals.astype('int64')
+        return pd.DataFrame({'DATE': self.calendar['DATE'].to_numpy()[offsets], name: totals},
+                            index=offsets)
+
+    def gaps(self):
+        """Rows of :meth:`to_frame` for the days without transactions, with their holiday."""
+        offsets = self.gap_offsets()
+        return self.to_frame(offsets).assign(HOLIDAY=self.calendar['HOLIDAY'].to_numpy()[offsets])
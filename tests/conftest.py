@@ -0,0 +1,51 @@
+"""Small fixed transaction and customer frames shared by the tests."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from qvi.schema import CUSTOMER_SCHEMA
+
+PRODUCT_NAMES = {
+    1: 'Smiths Crinkle Cut  Chips Original 170g',
+    2: 'Kettle Sensations   Camembert & Fig 150g',
+    3: 'Natural Chip        Compny SeaSalt175g',
+    4: 'Doritos Corn Chip Supreme 380g',
+    5: 'Old El Paso Salsa   Dip Tomato Mild 300g',
+}
+LIFESTAGES = ['YOUNG SINGLES/COUPLES', 'OLDER FAMILIES', 'RETIREES']
+PREMIUM = ['Mainstream', 'Budget', 'Premium']
+
+FIRST_DAY = 43282  # 2018-07-01 as an Excel serial day
+DAYS = 4
+CARDS = np.arange(1000, 1300)
+# Buys one ordinary pack on the first day and 200 packs on the third
+OUTLIER_CARD = 1007
+
+
+@pytest.fixture
+def customers():
+    return pd.DataFrame({
+        'LYLTY_CARD_NBR': CARDS,
+        'LIFESTAGE': [LIFESTAGES[card % 3] for card in CARDS],
+        'PREMIUM_CUSTOMER': [PREMIUM[card // 3 % 3] for card in CARDS],
+    }).astype(CUSTOMER_SCHEMA)
+
+
+@pytest.fixture
+def transactions():
+    """Raw transactions in the workbook layout: 1-2 rows per basket, one outlier card."""
+    rng = np.random.default_rng(0)
+    rows = []
+    txn_id = 0
+    for day in range(DAYS):
+        for card in rng.choice(CARDS[CARDS != OUTLIER_CARD], 120, replace=False):
+            txn_id += 1
+            for product in rng.choice(list(PRODUCT_NAMES), rng.integers(1, 3), replace=False):
+                qty = int(rng.integers(1, 3))
+                rows.append((FIRST_DAY + day, card // 10, card, txn_id, product, qty, round(qty * 3.9, 2)))
+    rows.append((FIRST_DAY, OUTLIER_CARD // 10, OUTLIER_CARD, txn_id + 1, 1, 1, 2.9))
+    rows.append((FIRST_DAY + 2, OUTLIER_CARD // 10, OUTLIER_CARD, txn_id + 2, 3, 200, 650.0))
+    frame = pd.DataFrame(rows, columns=['DATE', 'STORE_NBR', 'LYLTY_CARD_NBR', 'TXN_ID', 'PROD_NBR',
+                                        'PROD_QTY', 'TOT_SALES'])
+    frame.insert(5, 'PROD_NAME', frame['PROD_NBR'].map(PRODUCT_NAMES))
+    return frame
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from qvi import pipeline
+from qvi.affinity import affinity_table, segment_affinities, select_segment
+from qvi.cleaning import clean_transactions
+
+from conftest import LIFESTAGES, PREMIUM
+
+
+def _plain_affinity(merged_data, dimension, lifestage, premium_customer):
+    """The notebook formulation: filter the target segment, then divide the two shares."""
+    target = (merged_data['LIFESTAGE'] == lifestage) & (merged_data['PREMIUM_CUSTOMER'] == premium_customer)
+    target_share = merged_data[target].groupby(dimension, observed=True)['PROD_QTY'].sum()
+    other_share = merged_data[~target].groupby(dimension, observed=True)['PROD_QTY'].sum()
+    table = pd.concat([target_share / target_share.sum(), other_share / other_share.sum()], axis=1,
+                      keys=['targetSegment', 'other']).fillna(0)
+    table['affinity'] = table['targetSegment'] / table['other']
+    return table[np.isfinite(table['affinity'])]
+
+
+@pytest.mark.parametrize('dimension', ['BRAND', 'PACK_SIZE'])
+def test_affinities_match_the_per_segment_formulation(transactions, customers, dimension):
+    merged_data = pipeline.merge_stage(clean_transactions(transactions), customers)
+    affinities = segment_affinities(merged_data, dimension)
+    for lifestage in LIFESTAGES:
+        for premium_customer in PREMIUM:
+            table = select_segment(affinities, lifestage, premium_customer)
+            expected = _plain_affinity(merged_data, dimension, lifestage, premium_customer)
+            assert table.iloc[:, -1].is_monotonic_decreasing
+            np.testing.assert_allclose(table.sort_index().to_numpy(dtype='float64'),
+                                       expected.sort_index().to_numpy(dtype='float64'), rtol=1e-12)
+    pd.testing.assert_frame_equal(affinity_table(merged_data, dimension, LIFESTAGES[0], PREMIUM[0]),
+                                  select_segment(affinities, LIFESTAGES[0], PREMIUM[0]))
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from qvi.backends import BACKENDS, Backend, check_backends, compare_results, get_backend
+from qvi.loader import prepare_transactions
+
+from conftest import OUTLIER_CARD
+
+ENGINES = [name for name in BACKENDS if name != 'pandas']
+
+
+@pytest.fixture
+def loaded(transactions, customers):
+    return prepare_transactions(transactions), customers
+
+
+@pytest.mark.parametrize('name', ENGINES)
+def test_backend_matches_pandas_with_dtypes_and_categories(name, loaded):
+    pytest.importorskip(BACKENDS[name].module)
+    reference = get_backend('pandas').run(*loaded)
+    result = get_backend(name).run(*loaded)
+    assert reference['outliers']['LYLTY_CARD_NBR'].tolist() == [OUTLIER_CARD]
+    for table in ('cleaned', 'outliers', 'segment_table'):
+        pd.testing.assert_frame_equal(result[table].reset_index(drop=True),
+                                      reference[table].reset_index(drop=True), rtol=1e-9)
+    cleaned = result['cleaned']
+    for column in ('PROD_NAME', 'BRAND'):
+        assert cleaned[column].cat.categories.equals(reference['cleaned'][column].cat.categories)
+
+
+@pytest.mark.parametrize('name', ENGINES)
+def test_backend_clean_without_customers(name, loaded):
+    pytest.importorskip(BACKENDS[name].module)
+    transaction_data, _ = loaded
+    pd.testing.assert_frame_equal(get_backend(name).clean(transaction_data).reset_index(drop=True),
+                                  get_backend('pandas').clean(transaction_data).reset_index(drop=True))
+
+
+def test_check_backends_reports_parity(loaded):
+    for name in ENGINES:
+        pytest.importorskip(BACKENDS[name].module)
+    parity = check_backends(*loaded)
+    assert all(all(tables.values()) for tables in parity.values())
+
+
+def test_compare_results_checks_dtypes(loaded):
+    reference = get_backend('pandas').run(*loaded)
+    changed = dict(reference, outliers=reference['outliers'].astype({'TRANSACTIONS': 'uint32'}))
+    assert compare_results(changed, reference) == {'cleaned': True, 'outliers': False, 'segment_table': True}
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        Backend()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from qvi import pipeline
+from qvi.baskets import co_purchases, segment_co_purchases
+from qvi.cleaning import clean_transactions
+
+
+def _plain_pairs(transactions, item):
+    """Self-join of the distinct (basket, item) rows, then count baskets per pair and per item."""
+    rows = transactions[['LYLTY_CARD_NBR', 'TXN_ID', item]].astype({item: object}).drop_duplicates()
+    n_baskets = len(rows[['LYLTY_CARD_NBR', 'TXN_ID']].drop_duplicates())
+    item_baskets = rows[item].value_counts()
+    pairs = rows.merge(rows, on=['LYLTY_CARD_NBR', 'TXN_ID'], suffixes=('_A', '_B'))
+    pairs = pairs[pairs[f'{item}_A'].astype(str) < pairs[f'{item}_B'].astype(str)]
+    table = pairs.groupby([f'{item}_A', f'{item}_B']).size().rename('BASKETS').reset_index()
+    table.columns = ['ITEM_A', 'ITEM_B', 'BASKETS']
+    count_a = item_baskets.loc[table['ITEM_A']].to_numpy()
+    count_b = item_baskets.loc[table['ITEM_B']].to_numpy()
+    table['SUPPORT'] = table['BASKETS'] / n_baskets
+    table['CONFIDENCE_A_B'] = table['BASKETS'] / count_a
+    table['CONFIDENCE_B_A'] = table['BASKETS'] / count_b
+    table['LIFT'] = table['SUPPORT'] / (count_a / n_baskets * count_b / n_baskets)
+    return table
+
+
+def _normalized(table):
+    """Pairs as (smaller, larger) item names, so both orders of a pair compare equal."""
+    table = table.astype({'ITEM_A': str, 'ITEM_B': str})
+    swapped = table['ITEM_A'] > table['ITEM_B']
+    table.loc[swapped, ['ITEM_A', 'ITEM_B', 'CONFIDENCE_A_B', 'CONFIDENCE_B_A']] = (
+        table.loc[swapped, ['ITEM_B', 'ITEM_A', 'CONFIDENCE_B_A', 'CONFIDENCE_A_B']].to_numpy())
+    columns = ['ITEM_A', 'ITEM_B', 'BASKETS', 'SUPPORT', 'CONFIDENCE_A_B', 'CONFIDENCE_B_A', 'LIFT']
+    return table[columns].sort_values(['ITEM_A', 'ITEM_B']).reset_index(drop=True).astype(
+        {'BASKETS': 'int64', 'SUPPORT': 'float64', 'CONFIDENCE_A_B': 'float64', 'CONFIDENCE_B_A': 'float64'})
+
+
+@pytest.mark.parametrize('item', ['BRAND', 'PROD_NBR'])
+def test_co_purchases_match_a_self_join(transactions, customers, item):
+    merged_data = pipeline.merge_stage(clean_transactions(transactions), customers)
+    table = co_purchases(merged_data, item, min_baskets=1)
+    assert not table.empty and table['LIFT'].is_monotonic_decreasing
+    pd.testing.assert_frame_equal(_normalized(table), _normalized(_plain_pairs(merged_data, item)))
+
+    by_segment = segment_co_purchases(merged_data, item, min_baskets=1)
+    for (lifestage, premium), rows in merged_data.groupby(['LIFESTAGE', 'PREMIUM_CUSTOMER'], observed=True):
+        segment = by_segment[(by_segment['LIFESTAGE'] == lifestage) & (by_segment['PREMIUM_CUSTOMER'] == premium)]
+        pd.testing.assert_frame_equal(_normalized(segment), _normalized(_plain_pairs(rows, item)))
+    assert np.all(co_purchases(merged_data, item)['BASKETS'] >= 2)
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from qvi import pipeline
+from qvi.cube import CUBE_DIMENSIONS, Cube, build_cube, check_tables
+from qvi.loader import prepare_transactions
+from qvi.segments import SEGMENT_COLUMNS
+
+MEASURES = dict(TRANSACTIONS=('TXN_ID', 'size'), SALES=('TOT_SALES', 'sum'), TOTAL_QTY=('PROD_QTY', 'sum'),
+                CUSTOMERS=('LYLTY_CARD_NBR', 'nunique'))
+
+
+@pytest.fixture
+def merged_data(transactions, customers):
+    # Spread the four days over three months
+    transactions = transactions.assign(DATE=transactions['DATE'] + 40 * (transactions['TXN_ID'] % 3))
+    transaction_data = pipeline.feature_stage(pipeline.clean_stage(prepare_transactions(transactions)))
+    return pipeline.merge_stage(transaction_data, customers)
+
+
+def _expected(merged_data, by):
+    keys = [merged_data['DATE'].dt.month.rename('MONTH') if name == 'MONTH' else name for name in by]
+    table = merged_data.groupby(keys, observed=True).agg(**MEASURES).reset_index()
+    return table.astype({name: object for name in by}).sort_values(by).reset_index(drop=True)
+
+
+def _sorted(table, by):
+    return table.astype({name: object for name in by}).sort_values(by).reset_index(drop=True)
+
+
+def test_cube_reproduces_tables_3_to_9(merged_data):
+    assert check_tables(build_cube(merged_data), merged_data) == {
+        'segment_table': True, 'moments': True, 'BRAND': True, 'PACK_SIZE': True, 'ttest': True}
+
+
+def test_multi_dimension_roll_up_matches_groupby(merged_data):
+    cube = build_cube(merged_data)
+    by = ['STORE_NBR', 'LIFESTAGE', 'PREMIUM_CUSTOMER', 'BRAND', 'MONTH']
+    table = cube.query(by, where={'PACK_SIZE': [150, 170]})
+    expected = _expected(merged_data[merged_data['PACK_SIZE'].isin([150, 170])], by)
+    assert 'CUSTOMERS' not in table.columns
+    pd.testing.assert_frame_equal(_sorted(table, by), expected.drop(columns='CUSTOMERS'), check_dtype=False)
+    assert len(cube.query(CUBE_DIMENSIONS)) == len(cube)
+
+
+def test_distinct_customers_by_segment_and_month(tmp_path, merged_data):
+    cube = build_cube(merged_data)
+    cube.save(str(tmp_path / 'cube'))
+    cube = Cube.load(str(tmp_path / 'cube'))
+    by = SEGMENT_COLUMNS + ['MONTH']
+    table = cube.query(by, where={'LIFESTAGE': 'RETIREES'}, start='2018-08-01')
+    rows = merged_data[(merged_data['LIFESTAGE'] == 'RETIREES') & (merged_data['DATE'] >= '2018-08-01')]
+    pd.testing.assert_frame_equal(_sorted(table, by), _expected(rows, by), check_dtype=False)
+    assert cube.query([])['CUSTOMERS'].item() == merged_data['LYLTY_CARD_NBR'].nunique()
+
+
+def test_distinct_customers_need_whole_months_of_segments(merged_data):
+    cube = build_cube(merged_data)
+    assert 'CUSTOMERS' not in cube.query(SEGMENT_COLUMNS, start='2018-07-02').columns
+    with pytest.raises(ValueError):
+        cube.query(['BRAND'], customers=True)
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from qvi.cleaning import clean_transactions
+from qvi.lookup import CustomerIndex
+from qvi.segments import SEGMENT_COLUMNS
+
+
+@pytest.mark.parametrize('direct_address_limit', [10 ** 6, 0])
+def test_attach_matches_a_left_merge(transactions, customers, direct_address_limit):
+    # Shuffled customer rows, and every tenth card missing from the customer data
+    customers = customers[customers['LYLTY_CARD_NBR'] % 10 != 3].sample(frac=1, random_state=0)
+    cleaned = clean_transactions(transactions)
+    index = CustomerIndex(customers, direct_address_limit)
+    assert index.direct_address == (direct_address_limit > 0)
+
+    attached = index.attach(cleaned)
+    expected = cleaned.merge(customers, on='LYLTY_CARD_NBR', how='left')
+    pd.testing.assert_frame_equal(attached.astype({column: object for column in SEGMENT_COLUMNS}),
+                                  expected.astype({column: object for column in SEGMENT_COLUMNS}))
+
+    unmatched = expected[expected['LIFESTAGE'].isna()].groupby('LYLTY_CARD_NBR').size()
+    pd.testing.assert_frame_equal(index.unmatched(cleaned),
+                                  unmatched.rename('TRANSACTIONS').reset_index(), check_dtype=False)
+    with pytest.raises(ValueError):
+        CustomerIndex(pd.concat([customers, customers.head(1)]))
@@ -0,0 +1,35 @@
+from qvi.loader import prepare_transactions
+from qvi.parallel import check_parity, parallel_aggregates
+from qvi.product_rules import ProductRules
+
+from conftest import PRODUCT_NAMES
+
+
+def test_parallel_aggregates_match_the_pipeline(transactions, customers):
+    transaction_data = prepare_transactions(transactions)
+    result = parallel_aggregates(transaction_data, customers, workers=1, partitions=3)
+    assert all(check_parity(result, transaction_data, customers).values())
+
+
+def test_parallel_aggregates_when_every_row_is_excluded(transactions, customers):
+    salsa = transactions.assign(PROD_NBR=5, PROD_NAME=PRODUCT_NAMES[5])
+    result = parallel_aggregates(prepare_transactions(salsa), customers, workers=1)
+    assert result['rows_kept'] == 0
+    assert len(result['daily']) == 0
+    assert result['segment_table'].empty
+
+
+def test_parallel_aggregates_with_product_rules(transactions, customers):
+    rules = ProductRules(exclude={'SALSA': ['salsa'], 'KETTLE': ['kettle']})
+    transaction_data = prepare_transactions(transactions)
+    result = parallel_aggregates(transaction_data, customers, workers=1, product_rules=rules)
+    assert result['rows_kept'] < parallel_aggregates(transaction_data, customers, workers=1)['rows_kept']
+    assert all(check_parity(result, transaction_data, customers, rules).values())
+
+
+def test_parallel_aggregates_of_no_transactions(transactions, customers):
+    result = parallel_aggregates(prepare_transactions(transactions).iloc[:0], customers, workers=1)
+    assert result['rows_kept'] == 0
+    assert len(result['daily']) == 0
+    assert result['segment_table'].empty and result['moments'].empty
+    assert result['outlier_audit'].empty
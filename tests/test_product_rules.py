@@ -0,0 +1,52 @@
+import json
+
+import pandas as pd
+import pytest
+
+from qvi.product_rules import BRAND_CLEANING_MAP, ProductRules, load_product_rules
+from qvi.products import build_product_dimension
+
+from conftest import PRODUCT_NAMES
+
+
+def test_first_exclusion_in_the_name_fires_before_the_pack_size():
+    rules = ProductRules(exclude={'SALSA': ['salsa'], 'DIP': ['dip'], 'SODA': ['7up']})
+    table = rules.apply(pd.Series(['Old El Paso Salsa   Dip Tomato Mild 300g', 'Dip Salsa 150g',
+                                   '7up Chips 175g', 'Kettle Chips 0g']))
+    assert table['EXCLUDE_RULE'].tolist() == ['SALSA', 'DIP', 'SODA', None]
+    assert table['EXCLUDED'].tolist() == [True, True, True, False]
+    # Digits inside an exclusion keyword are not read as the pack size
+    assert table['PACK_SIZE'].tolist() == [300, 150, 175, 0]
+
+
+def test_brand_alias_records_the_rule_that_fired():
+    table = ProductRules().apply(pd.Series(['Red Rock Deli Chikn&Garlic Aioli 150g', 'Kettle Original 175g']))
+    assert table['BRAND'].tolist() == ['RRD', 'KETTLE']
+    assert table['BRAND_RULE'].tolist() == ['RED', None]
+
+
+def test_load_product_rules_from_json(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'exclude': {'SALSA': ['salsa'], 'DORITOS': 'doritos'},
+                                'pack_size': r'\d+(?=g)'}), encoding='utf-8')
+    rules = load_product_rules(str(path))
+    # Missing sections keep their default
+    assert rules.config == {'exclude': {'SALSA': ['salsa'], 'DORITOS': ['doritos']},
+                            'brand_aliases': BRAND_CLEANING_MAP, 'pack_size': r'\d+(?=g)'}
+    assert load_product_rules().config == ProductRules().config
+
+    products = build_product_dimension(pd.Series(list(PRODUCT_NAMES.values())), rules=rules)
+    assert products.set_index('PROD_NAME')['EXCLUDE_RULE'].dropna().to_dict() == {
+        PRODUCT_NAMES[4]: 'DORITOS', PRODUCT_NAMES[5]: 'SALSA'}
+    assert products['PACK_SIZE'].tolist() == [170, 150, 175, 380, 300]
+
+
+def test_invalid_product_rules(tmp_path):
+    with pytest.raises(ValueError):
+        ProductRules.from_config({'brands': {}})
+    with pytest.raises(ValueError):
+        ProductRules(pack_size='(')
+    path = tmp_path / 'rules.json'
+    path.write_text('{"exclude": ', encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_product_rules(str(path))
@@ -0,0 +1,21 @@
+import os
+
+from qvi.loader import file_fingerprint
+from qvi.result_cache import input_fingerprint
+
+
+def test_input_fingerprint_hashes_only_changed_files(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    path.write_text('a,b\n1,2\n')
+    first = input_fingerprint(str(path), str(tmp_path / 'cache'))
+    assert first == {'size': 8, 'sha256': file_fingerprint(str(path))['sha256']}
+
+    # Same size and mtime: the recorded hash is reused without reading the file
+    stat = os.stat(path)
+    path.write_text('a,b\n3,4\n')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert input_fingerprint(str(path), str(tmp_path / 'cache')) == first
+
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    changed = input_fingerprint(str(path), str(tmp_path / 'cache'))
+    assert changed['sha256'] == file_fingerprint(str(path))['sha256'] != first['sha256']
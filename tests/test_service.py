@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from qvi.service import QueryService
+
+from conftest import DAYS
+
+
+@pytest.fixture
+def paths(tmp_path, transactions, customers):
+    transaction_path, customer_path = str(tmp_path / 'transactions.csv'), str(tmp_path / 'customers.csv')
+    transactions.to_csv(transaction_path, index=False)
+    customers.to_csv(customer_path, index=False)
+    return transaction_path, customer_path
+
+
+def _service(paths, **kwargs):
+    service = QueryService(*paths, use_cache=False, reload_interval=0.05, **kwargs)
+    service.load()
+    return service
+
+
+def _json(answer):
+    status, body = answer
+    return status, json.loads(body)
+
+
+async def _get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_routing(paths, transactions):
+    service = _service(paths)
+    status, body = _json(service.answer('/segments', {}))
+    assert status == 200 and len(body['segments']) == 9
+    status, body = _json(service.answer('/query', {'by': ['BRAND'], 'LIFESTAGE': ['RETIREES']}))
+    assert status == 200
+    assert sum(row['TRANSACTIONS'] for row in body['rows']) == service.snapshot.cube.query(
+        [], {'LIFESTAGE': 'RETIREES'})['TRANSACTIONS'].item()
+    assert _json(service.answer('/affinity', {'dimension': ['COLOUR']}))[0] == 400
+    assert _json(service.answer('/unknown', {}))[0] == 404
+    status, body = _json(service.answer('/status', {}))
+    assert status == 200 and body['generation'] == 1 and body['rows'] < len(transactions)
+
+
+def test_lru_eviction(paths):
+    service = _service(paths, cache_entries=2)
+    assert len(service._cache) == 2
+    queries = [{'by': [dimension]} for dimension in ('BRAND', 'PACK_SIZE', 'STORE_NBR')]
+    service.answer('/query', queries[0])
+    service.answer('/query', queries[1])
+    service.answer('/query', queries[0])  # hit: now the most recently used
+    service.answer('/query', queries[2])  # evicts queries[1]
+    assert (service.hits, service.misses) == (1, 3)
+    service.answer('/query', queries[0])
+    service.answer('/query', queries[1])
+    assert (service.hits, service.misses) == (2, 4)
+    assert len(service._cache) == 2
+
+
+def test_cache_misses_are_computed_off_the_loop(paths):
+    service = _service(paths)
+    threads = []
+    compute = service._compute
+
+    def recording_compute(*args):
+        threads.append(threading.get_ident())
+        return compute(*args)
+
+    service._compute = recording_compute
+
+    async def scenario():
+        await service.answer_async('/query', {'by': ['BRAND']})
+        await service.answer_async('/query', {'by': ['BRAND']})
+
+    asyncio.run(scenario())
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+    assert service.hits == 1
+
+
+def test_hot_reload(paths, transactions):
+    service = _service(paths)
+
+    async def scenario():
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        watcher = asyncio.create_task(service.watch())
+        try:
+            before = await _get(port, '/status')
+            later = transactions.assign(DATE=transactions['DATE'] + DAYS, TXN_ID=transactions['TXN_ID'] + 10 ** 6)
+            pd.concat([transactions, later]).to_csv(paths[0], index=False)
+            stat = os.stat(paths[0])
+            os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            for _ in range(200):
+                if service.generation > 1:
+                    break
+                await asyncio.sleep(0.05)
+            after = await _get(port, '/status')
+            daily = await _get(port, '/daily')
+        finally:
+            watcher.cancel()
+            server.close()
+            await server.wait_closed()
+        return before, after, daily
+
+    before, after, daily = asyncio.run(scenario())
+    assert before[0] == after[0] == daily[0] == 200
+    assert after[1]['generation'] == 2 and after[1]['reload_error'] is None
+    assert after[1]['rows'] > before[1]['rows']
+    assert len(daily[1]['daily']) == 2 * DAYS
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from qvi import pipeline
+from qvi.cleaning import clean_transactions
+from qvi.segments import SEGMENT_COLUMNS
+from qvi.significance import (adjust_p_values, bootstrap_mean_ci, pairwise_welch, price_per_unit,
+                              price_per_unit_ttest, segment_moments)
+
+
+@pytest.fixture
+def merged_data(transactions, customers):
+    merged = pipeline.merge_stage(clean_transactions(transactions), customers)
+    # Varied prices per unit, so every segment has a variance
+    rng = np.random.default_rng(1)
+    return merged.assign(TOT_SALES=(merged['PROD_QTY'] * rng.uniform(2.0, 6.0, len(merged))).round(2))
+
+
+def _prices(merged_data, **segment):
+    selected = np.ones(len(merged_data), dtype=bool)
+    for column, values in segment.items():
+        selected &= merged_data[column].isin(values).to_numpy()
+    return price_per_unit(merged_data)[selected]
+
+
+def test_segment_moments_match_groupby(merged_data):
+    moments = segment_moments(merged_data).astype({column: object for column in SEGMENT_COLUMNS})
+    expected = (merged_data.assign(PRICE=price_per_unit(merged_data))
+                .groupby(SEGMENT_COLUMNS, observed=True)['PRICE'].agg(N='size', MEAN='mean', VAR='var')
+                .reset_index().astype({column: object for column in SEGMENT_COLUMNS}))
+    pd.testing.assert_frame_equal(moments.sort_values(SEGMENT_COLUMNS).reset_index(drop=True),
+                                  expected.sort_values(SEGMENT_COLUMNS).reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-9)
+
+
+def test_welch_from_pooled_moments_matches_the_rows(merged_data):
+    lifestages = ['YOUNG SINGLES/COUPLES', 'RETIREES']
+    result = price_per_unit_ttest(merged_data, lifestages=lifestages)
+    group = _prices(merged_data, LIFESTAGE=lifestages, PREMIUM_CUSTOMER=['Mainstream'])
+    other = _prices(merged_data, LIFESTAGE=lifestages, PREMIUM_CUSTOMER=['Budget', 'Premium'])
+    expected = stats.ttest_ind(group, other, equal_var=False, alternative='greater')
+    assert result['t_stat'] == pytest.approx(expected.statistic, rel=1e-9)
+    assert result['p_value'] == pytest.approx(expected.pvalue, rel=1e-9)
+    assert (result['n_group'], result['n_other']) == (len(group), len(other))
+    assert result['mean_group'] == pytest.approx(group.mean(), rel=1e-12)
+
+
+def test_pairwise_welch_matches_the_rows(merged_data):
+    table = pairwise_welch(segment_moments(merged_data), correction='fdr_bh')
+    assert len(table) == 9 * 8 // 2
+    for row in table.itertuples():
+        expected = stats.ttest_ind(
+            _prices(merged_data, LIFESTAGE=[row.LIFESTAGE_A], PREMIUM_CUSTOMER=[row.PREMIUM_CUSTOMER_A]),
+            _prices(merged_data, LIFESTAGE=[row.LIFESTAGE_B], PREMIUM_CUSTOMER=[row.PREMIUM_CUSTOMER_B]),
+            equal_var=False)
+        assert row.T_STAT == pytest.approx(expected.statistic, rel=1e-9)
+        assert row.P_VALUE == pytest.approx(expected.pvalue, rel=1e-9)
+    np.testing.assert_allclose(table['P_ADJUSTED'], adjust_p_values(table['P_VALUE'], 'fdr_bh'))
+
+
+def test_adjust_p_values_on_a_fixed_vector():
+    p_values = [0.01, 0.04, 0.03, 0.005]
+    np.testing.assert_allclose(adjust_p_values(p_values, 'bonferroni'), [0.04, 0.16, 0.12, 0.02])
+    np.testing.assert_allclose(adjust_p_values(p_values, 'holm'), [0.03, 0.06, 0.06, 0.02])
+    np.testing.assert_allclose(adjust_p_values(p_values, 'fdr_bh'), [0.02, 0.04, 0.04, 0.02])
+    np.testing.assert_allclose(adjust_p_values(p_values, 'none'), p_values)
+    np.testing.assert_allclose(adjust_p_values([0.3, 0.6], 'bonferroni'), [0.6, 1.0])
+    with pytest.raises(ValueError):
+        adjust_p_values(p_values, 'sidak')
+
+
+def test_bootstrap_mean_ci(merged_data):
+    table = bootstrap_mean_ci(merged_data, n_resamples=500, seed=0)
+    moments = segment_moments(merged_data)
+    assert table['N'].tolist() == moments['N'].tolist()
+    np.testing.assert_allclose(table['MEAN'], moments['MEAN'], rtol=1e-9)
+    assert ((table['CI_LOW'] < table['MEAN']) & (table['MEAN'] < table['CI_HIGH'])).all()
+    pd.testing.assert_frame_equal(table, bootstrap_mean_ci(merged_data, n_resamples=500, seed=0))
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from qvi.cleaning import clean_transactions
+from qvi.customer_features import CustomerFeatureStore, customer_features
+from qvi.lookup import CustomerIndex
+from qvi.segments import SEGMENT_COLUMNS, segment_metrics
+from qvi.store import AggregateStore
+
+from conftest import OUTLIER_CARD
+
+
+def _daily_batches(transactions):
+    """Cleaned transactions one day at a time, outlier cards still in."""
+    cleaned = clean_transactions(transactions, outlier_customer_ids=[])
+    return [batch for _, batch in cleaned.groupby('DATE')]
+
+
+def test_aggregate_store_detects_outliers_over_all_days(tmp_path, transactions, customers):
+    index = CustomerIndex(customers)
+    store = AggregateStore(str(tmp_path))
+    for batch in _daily_batches(transactions):
+        store.absorb(index.attach(batch))
+
+    merged = index.attach(clean_transactions(transactions))
+    assert OUTLIER_CARD not in merged['LYLTY_CARD_NBR'].to_numpy()
+    assert store.excluded.tolist() == [OUTLIER_CARD]
+    expected = segment_metrics(merged).astype({column: str for column in SEGMENT_COLUMNS})
+    expected = expected.set_index(SEGMENT_COLUMNS).sort_index()
+    table = store.segment_table().set_index(SEGMENT_COLUMNS).sort_index()
+    columns = ['TRANSACTIONS', 'SALES', 'TOTAL_QTY', 'CUSTOMERS']
+    pd.testing.assert_frame_equal(table[columns], expected[columns], check_dtype=False)
+
+
+def test_aggregate_store_keeps_days_absorbed_before_a_card_is_flagged(tmp_path, transactions, customers):
+    # Documented limitation: the partitions hold no per-card rows, so the
+    # outlier's first-day pack stays in the daily counts
+    index = CustomerIndex(customers)
+    store = AggregateStore(str(tmp_path))
+    for batch in _daily_batches(transactions):
+        store.absorb(index.attach(batch))
+
+    expected = clean_transactions(transactions).groupby('DATE').size()
+    counts = store.transactions_by_day().set_index('DATE')['N']
+    assert (counts - expected).tolist() == [1, 0, 0, 0]
+
+
+def test_customer_feature_store_matches_a_full_recompute(tmp_path, transactions, customers):
+    store = CustomerFeatureStore(str(tmp_path))
+    for batch in _daily_batches(transactions):
+        store.absorb(batch, customers)
+
+    expected = customer_features(clean_transactions(transactions), customers)
+    pd.testing.assert_frame_equal(store.features()[expected.columns].reset_index(drop=True),
+                                  expected.reset_index(drop=True), check_dtype=False)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from qvi.cleaning import clean_transactions
+from qvi.store_matching import (MATCH_METRICS, best_controls, monthly_store_metrics, score_controls,
+                                store_month_matrices)
+
+TRIAL_START = '2018-10'
+
+
+def _cleaned(transactions):
+    # Spread the four days over four months: three pre-trial months and the trial month
+    return clean_transactions(transactions.assign(DATE=transactions['DATE'] + 31 * (transactions['TXN_ID'] % 4)))
+
+
+def _plain_scores(monthly, trial_store):
+    """Per control store: correlation and scaled distance of the pre-trial monthly series, one loop per store."""
+    pre_trial = monthly[monthly['MONTH'] < pd.Period(TRIAL_START, freq='M')]
+    months = pre_trial['MONTH'].nunique()
+    candidates = pre_trial.groupby('STORE_NBR').filter(lambda store: len(store) == months)
+    scores = {}
+    for metric in MATCH_METRICS:
+        wide = candidates.pivot(index='STORE_NBR', columns='MONTH', values=metric).astype('float64')
+        distances = (wide - wide.loc[trial_store]).abs()
+        scaled = 1 - (distances - distances.min()) / (distances.max() - distances.min())
+        for store in wide.index.drop(trial_store):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                # Constant series have no correlation (NaN), as in correlation_matrix
+                correlation = np.corrcoef(wide.loc[trial_store], wide.loc[store])[0, 1]
+            score = 0.5 * correlation + 0.5 * scaled.loc[store].mean()
+            scores[store] = scores.get(store, 0) + score / len(MATCH_METRICS)
+    return pd.Series(scores, name='SCORE')
+
+
+def test_control_scores_match_the_per_store_formulation(transactions):
+    cleaned = _cleaned(transactions)
+    monthly = monthly_store_metrics(cleaned)
+    expected_monthly = (cleaned.assign(MONTH=cleaned['DATE'].dt.to_period('M'))
+                        .groupby(['STORE_NBR', 'MONTH'])
+                        .agg(SALES=('TOT_SALES', 'sum'), CUSTOMERS=('LYLTY_CARD_NBR', 'nunique'),
+                             TRANSACTIONS=('TXN_ID', 'nunique')).reset_index())
+    pd.testing.assert_frame_equal(monthly[expected_monthly.columns], expected_monthly, check_dtype=False)
+
+    trial_stores = [101, 115]
+    scores = score_controls(*store_month_matrices(cleaned), trial_stores=trial_stores, trial_start=TRIAL_START)
+    for trial_store in trial_stores:
+        expected = _plain_scores(monthly, trial_store).sort_index()
+        actual = scores[scores['TRIAL_STORE'] == trial_store].set_index('CONTROL_STORE')['SCORE'].sort_index()
+        np.testing.assert_array_equal(actual.index, expected.index)
+        np.testing.assert_allclose(actual, expected, rtol=1e-12)
+        assert actual.notna().sum() > len(actual) // 2
+    assert best_controls(scores)['CONTROL_STORE'].tolist() == [
+        _plain_scores(monthly, store).idxmax() for store in trial_stores]
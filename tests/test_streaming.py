@@ -0,0 +1,58 @@
+import json
+
+import pandas as pd
+
+from qvi import cli, pipeline
+from qvi.cleaning import clean_transactions, remove_salsa
+from qvi.outliers import card_statistics, detect_outliers
+from qvi.product_rules import load_product_rules
+from qvi.segments import segment_metrics
+from qvi.streaming import scan_outliers, stream_aggregates
+
+from conftest import OUTLIER_CARD
+
+
+def test_scan_outliers_matches_one_pass_detection(tmp_path, transactions):
+    path = tmp_path / 'transactions.csv'
+    transactions.to_csv(path, index=False)
+    audit = scan_outliers(str(path), chunksize=20)
+    expected = detect_outliers(card_statistics(remove_salsa(transactions)))
+    assert audit['LYLTY_CARD_NBR'].tolist() == [OUTLIER_CARD]
+    pd.testing.assert_frame_equal(audit, expected)
+
+
+def test_scan_outliers_of_an_empty_file(tmp_path, transactions):
+    path = tmp_path / 'transactions.csv'
+    transactions.head(0).to_csv(path, index=False)
+    audit = scan_outliers(str(path))
+    assert audit.empty
+    assert 'LYLTY_CARD_NBR' in audit.columns and 'RULES' in audit.columns
+
+
+def test_stream_cleans_with_the_product_rules(tmp_path, capsys, transactions, customers):
+    transaction_path, customer_path, rules_path = (str(tmp_path / name) for name in
+                                                   ('transactions.csv', 'customers.csv', 'rules.json'))
+    transactions.to_csv(transaction_path, index=False)
+    customers.to_csv(customer_path, index=False)
+    with open(rules_path, 'w', encoding='utf-8') as handle:
+        json.dump({'exclude': {'SALSA': ['salsa'], 'DORITOS': ['doritos']}}, handle)
+    rules = load_product_rules(rules_path)
+
+    aggregates = stream_aggregates(transaction_path, customer_path, chunksize=50, product_rules=rules)
+    expected = clean_transactions(transactions, product_rules=rules)
+    assert aggregates.rows_kept == len(expected) < len(clean_transactions(transactions))
+    assert 'DORITOS' not in expected['BRAND'].astype(str).unique()
+
+    cli.main(['--product-rules', rules_path, 'stream', transaction_path, customer_path])
+    assert f"rows kept after cleaning: {len(expected)}" in capsys.readouterr().out
+
+
+def test_segment_table_of_an_empty_file(tmp_path, transactions, customers):
+    transaction_path, customer_path = str(tmp_path / 'transactions.csv'), str(tmp_path / 'customers.csv')
+    transactions.head(0).to_csv(transaction_path, index=False)
+    customers.to_csv(customer_path, index=False)
+    aggregates = stream_aggregates(transaction_path, customer_path)
+    expected = segment_metrics(pipeline.merge_stage(clean_transactions(transactions), customers))
+    table = aggregates.segment_table()
+    assert table.empty
+    assert table.columns.tolist() == expected.columns.tolist()
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from qvi.synthetic import OUTLIER_QTY, generate_customers, iter_transactions
+
+
+def test_synthetic_baskets_share_card_day_and_txn_id():
+    customers = generate_customers(scale=0.05)
+    transactions = pd.concat(iter_transactions(customers, scale=0.05, chunksize=3000), ignore_index=True)
+    assert len(transactions) == round(264_836 * 0.05)
+
+    baskets = transactions.groupby('TXN_ID').agg(ROWS=('DATE', 'size'), CARDS=('LYLTY_CARD_NBR', 'nunique'),
+                                                 DAYS=('DATE', 'nunique'))
+    assert (baskets['CARDS'] == 1).all() and (baskets['DAYS'] == 1).all()
+    assert baskets['ROWS'].max() > 1 and (baskets['ROWS'] == 1).any()
+    assert transactions['LYLTY_CARD_NBR'].isin(customers['LYLTY_CARD_NBR']).all()
+
+    bulk = transactions[transactions['PROD_QTY'] == OUTLIER_QTY]
+    assert len(bulk) == 2 and (baskets.loc[bulk['TXN_ID'], 'ROWS'] == 1).all()
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from qvi.timeseries import DailySeries
+
+
+def test_daily_series_counts_and_fills_missing_days():
+    dates = pd.to_datetime(['2018-07-01', '2018-07-01', '2018-07-03'])
+    series = DailySeries.from_dates(dates, end='2018-07-04')
+    frame = series.to_frame()
+    assert frame['N'].tolist() == [2, 0, 1, 0]
+    assert series.gaps()['DATE'].dt.day.tolist() == [2, 4]
+
+
+def test_daily_series_of_no_dates():
+    empty = DailySeries.from_frame(pd.DataFrame({'DATE': pd.to_datetime([])}))
+    assert len(empty) == 0
+    assert empty.to_frame().empty
+
+    widened = DailySeries.from_dates(np.array([], dtype='datetime64[D]'), start='2018-07-01', end='2018-07-03')
+    assert widened.to_frame()['N'].tolist() == [0, 0, 0]
+
+
+def test_rolling_sum():
+    series = DailySeries.from_dates(pd.to_datetime(['2018-07-01', '2018-07-01', '2018-07-03', '2018-07-04']))
+    assert series.rolling_sum(2).ravel().tolist() == [2, 2, 1, 2]
+    assert series.rolling_sum(10).ravel().tolist() == [2, 2, 3, 4]
+    with pytest.raises(ValueError):
+        series.rolling_sum(0)